@@ -1 +1,2 @@
-from .analyzer import *
\ No newline at end of file
+from .analyzer import *
+from .typeInference import *
\ No newline at end of file
@@ -1,4 +1,5 @@
 from Compiler.utils import *
+from .typeInference import TypeInference
 import re
 
 class SemanticAnalyzer:
@@ -11,6 +12,7 @@ class SemanticAnalyzer:
         self.func_name = None
         self.func_params = None
         self.func_return_type = None
+        self.func_scope = None
         self.inLoopBlock = None
 
     def analyze(self):
@@ -25,6 +27,9 @@ class SemanticAnalyzer:
             
         except Exception as e:
             throw(SemanticError(e))
+
+        # make int/double conversions explicit now that every variable's type is known
+        TypeInference(self.ast).infer()
         
         return self.symbolTable
         
@@ -47,6 +52,7 @@ class SemanticAnalyzer:
     
     def visit_block(self, node):
         self.symbolTable.createScope()
+        node.scope = self.symbolTable.current_scope_index
         for statement in node.statements:
             if statement is not None:
                 statement.accept(self)
@@ -73,32 +79,33 @@ class SemanticAnalyzer:
                         throw(TypeError(f"Variable '{str(node.name)}' expects type '{str(node.annotation)}' but got expression: '{str(node.value)}' of type '{str(data_type)}'"),line=node.line)
                         return
             
-            self.symbolTable.add(
+            node.symbol = self.symbolTable.add(
                 name=node.name,
                 symbolType='variable',
-                variableData={
-                    'value': node.value,
-                    'data_type':data_type,
-                    'isStatic': self.isStaticEvaluable(node.value),
-                    'annotated': True if node.annotation is not None else False
-                }
+                value=node.value,
+                dataType=data_type,
+                isStatic=self.isStaticEvaluable(node.value),
+                annotated=True if node.annotation is not None else False
             )
 
         elif isinstance(node, VariableUpdated):
             var = self.symbolTable.lookup(node.name)
             if var is None:
                 throw(ReferenceError(f"Variable '{str(node.name)}' does not exist in this scope"),line=node.line) 
+            # functions only get their own stack frame, a variable declared outside of them can't be assigned there
+            if self.func_scope is not None and var.symbol_type in ('variable', 'parameter') and var.scope < self.func_scope:
+                throw(ReferenceError(f"The function '{self.func_name}' can not assign to '{str(node.name)}' on line {node.line}, it is declared outside of the function. Pass it in and return the new value instead"),line=node.line)
+            node.symbol = var
             
             node.value.accept(self)
             data_type = node.evaluateType()
             if data_type == 'invalid': 
                 throw(TypeError(f"Could not statically infer the type of variable '{str(node.name)}'. If possible, try adding type hints - you are using glitchy, this is your fault not mine."),line=node.line)
             try:
-                symbolTy =  var.get('symbol_type')
+                symbolTy = var.symbol_type
                 if symbolTy == 'variable':
-                    var_data = var.get('variable_data')
-                    if var_data.get('annotated') is True:
-                        expected_type = var_data.get('data_type') 
+                    if var.annotated is True:
+                        expected_type = var.data_type
                         if expected_type != data_type:
                             throw(TypeError(f"(update) Variable '{str(node.name)}' expects type '{str(expected_type)}' but got expression: '{str(node.value)}' of type '{str(data_type)}'"))
                             return
@@ -106,11 +113,10 @@ class SemanticAnalyzer:
                     if self.isStaticEvaluable(node.value):
                         self.symbolTable.update(node.name, data_type, node.value)
                     else:
-                        var_data['isStatic'] = False
+                        var.isStatic = False
                         self.symbolTable.update(node.name, data_type, None)  
                 elif symbolTy == 'parameter':
-                    parm_data = var.get('parameter_data')
-                    expected_type = parm_data.get('data_type')
+                    expected_type = var.data_type
                     if expected_type != data_type:
                         throw(TypeError(f"Parameter '{str(node.name)}' expects type '{str(expected_type)}' but got expression of type '{str(data_type)}'"))
                     
@@ -121,14 +127,13 @@ class SemanticAnalyzer:
             symbol = self.symbolTable.lookup(node.name)               
             if symbol is None:
                 throw(ReferenceError(f"Variable '{str(node.name)}' on line {node.line} has not been defined")) 
+            node.symbol = symbol
             # set type tag so that expression types can be inferred directly without having to lookup value
-            if symbol.get('symbol_type') == 'variable':
-                var_data = symbol.get('variable_data')
-                node.type = var_data.get('data_type','invalid')
-                node.value = var_data.get('value', None)
-            elif symbol.get('symbol_type') == 'parameter':
-                type_str = symbol.get('parameter_data').get('data_type','invalid')
-                node.type = type_str
+            if symbol.symbol_type == 'variable':
+                node.type = symbol.data_type or 'invalid'
+                node.value = symbol.value
+            elif symbol.symbol_type == 'parameter':
+                node.type = symbol.data_type or 'invalid'
         
     def visit_if(self, node):
         node.comparison.accept(self)
@@ -185,29 +190,28 @@ class SemanticAnalyzer:
         
         self.symbolTable.add(
             name=node.name, 
-            symbolType="function", 
-            functionData={
-                "parameters": node.parameters,
-                "arity": node.arity, 
-                "return_type": node.return_type
-            }
+            symbolType="function",
+            parameters=node.parameters,
+            arity=node.arity,
+            dataType=node.return_type
         )
         
         self.symbolTable.createScope()
+        node.scope = self.symbolTable.current_scope_index
         
         for parameter in node.parameters:
-            self.symbolTable.add(
+            parameter.symbol = self.symbolTable.add(
                 name = parameter.name,
                 symbolType = 'parameter',
-                parameterData = {
-                    'data_type': parameter.type,
-                    'function_name': node.name
-                }
+                dataType = parameter.type,
+                functionName = node.name
             )
             
+        previous_scope = self.func_scope
         self.func_name = node.name
         self.func_params = node.parameters
         self.func_return_type = node.return_type
+        self.func_scope = node.scope
 
         # validate returns and visit stmts
         has_return_statement = self.check_and_visit_statements(node.block)
@@ -220,15 +224,18 @@ class SemanticAnalyzer:
         self.func_name = None
         self.func_params = None
         self.func_return_type = None
+        self.func_scope = previous_scope
         
-    def check_and_visit_statements(self, block):
+    def check_and_visit_statements(self, block, visit=True):
         """
         This function traverses the block of statements once, performing both the visiting of each node (via accept)
-        and ensuring return statements are correctly placed.
+        and ensuring return statements are correctly placed. Nested if blocks have already been visited through
+        their If node so they are only checked (visit=False).
         """
         has_return = False
         for stmt in block.statements:
-            stmt.accept(self)  
+            if visit:
+                stmt.accept(self)  
             if isinstance(stmt, Return):
                 has_return = True
             elif isinstance(stmt, If):
@@ -243,11 +250,11 @@ class SemanticAnalyzer:
         """
         Checks if an `if-elif-else` statement ensures all paths have a return statement.
         """
-        if_block_has_return = self.check_and_visit_statements(node.block)
-        elif_blocks_have_return = all(self.check_and_visit_statements(elif_block_node) for _, elif_block_node in node.elifNodes)
+        if_block_has_return = self.check_and_visit_statements(node.block, visit=False)
+        elif_blocks_have_return = all(self.check_and_visit_statements(elif_block_node, visit=False) for _, elif_block_node in node.elifNodes)
 
         if node.elseBlock is not None:
-            else_block_has_return = self.check_and_visit_statements(node.elseBlock)
+            else_block_has_return = self.check_and_visit_statements(node.elseBlock, visit=False)
         else:
             else_block_has_return = False  
             
@@ -282,15 +289,15 @@ class SemanticAnalyzer:
             return self.evalTypeOf(node)
         symbol = self.symbolTable.lookup(func_name)
         
-        if symbol and 'function_data' in symbol:
-            function = symbol['function_data']
+        if symbol and symbol.symbol_type == 'function':
+            function = symbol
         else:
             throw(ReferenceError(f"Incorrect Function Call on line {node.line}. A function with name '{str(node.name)}' does not exists."))
         
-        if node.arity != function.get('arity'):
-            throw(ArgumentError(f"Function '{func_name}' expects {function['arity']} arguments but received {node.arity} arguments"),line=node.line)
+        if node.arity != function.arity:
+            throw(ArgumentError(f"Function '{func_name}' expects {function.arity} arguments but received {node.arity} arguments"),line=node.line)
         
-        for received_arg, expected_arg in zip(node.args, function.get('parameters')):
+        for received_arg, expected_arg in zip(node.args, function.parameters):
             received_arg.accept(self)
             
             if expected_arg.type != 'any': 
@@ -300,16 +307,15 @@ class SemanticAnalyzer:
                         int_ = received_arg.value
                         received_arg.value = Double(float(int_.value))
                         received_arg.cached_type = None
-                    elif isinstance(received_arg.value, VariableReference):
-                        var = received_arg.value
-                        received_arg.value = Double(float(var.value)) 
-                        received_arg.cached_type = 'double' 
+                    else:
+                        received_arg.value = TypeCast(received_arg.value, 'double')
+                        received_arg.cached_type = None
                 
                 received_arg_type = received_arg.evaluateType() 
                 if received_arg_type != expected_arg.type:
                     throw(TypeError(f"Incorrect Function Call on line {node.line}. Expected type '{expected_arg.type}' for parameter '{expected_arg.name}' got type '{received_arg_type}'"))
                     
-        node.type = function.get('return_type', None)
+        node.type = function.return_type
 
     
     def visit_comparison(self, node):
@@ -319,10 +325,10 @@ class SemanticAnalyzer:
         self.validateOperation(node)
     
     def visit_binary_op(self, node):
-        self.promoteExprInts(node)
-        isStringCat= self.checkStrcat(node)
-        if isStringCat:  # no need to continue 
+        if node.operator == '+':
+            self.analyzeAddition(node)
             return
+        self.promoteExprInts(node)
         node.left.accept(self)
         node.right.accept(self)
         self.validateOperation(node)
@@ -336,6 +342,9 @@ class SemanticAnalyzer:
     def visit_unary_op(self, node):
         node.left.accept(self)
         self.validateUnary(node.left, node.operator)
+
+    def visit_type_cast(self, node):
+        node.value.accept(self)
     
     def visit_string_cat(self, node):
         self.evalStrCat(node)
@@ -373,10 +382,6 @@ class SemanticAnalyzer:
         if operator in ['/', '*', '-', '+', '%', '^']:
             if left_type not in ['integer', 'double'] or right_type not in ['integer', 'double']:
                 throw(TypeError(f"Illegal Binary operation on line {left.line}.\n'{str(node)}' with types: '{left_type}' '{operator}' '{right_type}'"))
-                
-            if operator == '^':
-                if left_type != 'double' or right_type != 'double':
-                    self.promotePowInts(node)
         
         # Comparisons
         elif operator in ['==', '!=', '<', '<=', '>', '>=']:
@@ -407,12 +412,10 @@ class SemanticAnalyzer:
     def declareBuiltIns(self):
         for func in BuiltInFunctions.getAll():
             self.symbolTable.addGlobalFunction(
-                name=func['name'],  
-                functionData={
-                    'parameters': func['parameters'],  
-                    'arity': func['arity'],  
-                    'return_type': func['return_type']  
-                }
+                name=func['name'],
+                parameters=func['parameters'],
+                arity=func['arity'],
+                returnType=func['return_type']
             )
 
     def isStaticEvaluable(self, value):
@@ -439,15 +442,13 @@ class SemanticAnalyzer:
 
         if isinstance(value, VariableReference):
             symbol = self.symbolTable.lookup(value.name)
-            ty =  symbol.get('symbol_type',None)
-            if symbol is None or ty is None:
+            if symbol is None or symbol.symbol_type is None:
                 return False
             
-            if ty in ['parameter', 'function']:
+            if symbol.symbol_type in ['parameter', 'function']:
                 return False
-            else:                
-                var_data = symbol.get('variable_data', {})
-                return var_data.get('isStatic', False)
+            else:
+                return symbol.isStatic
         
         elif isinstance(value, Expression):
             if isinstance(value, UnaryOp):
@@ -471,26 +472,34 @@ class SemanticAnalyzer:
         else:
             throw(SemanticError(f"Invalid Unary Operation on {left.line}: '{str(operator)+str(left)}' Invalid operator: '{operator}'" ))
 
-    def checkStrcat(self, node):
-        """ Transforms BinaryOp to a StringCat node if it is a string operation"""
-        left, right, operator = node.left, node.right, node.operator
-        
-        # we dont want to accept binaryOps since that will start processing as an Arithmetic op
-        if isinstance(node.left, BinaryOp) is False:
-            left.accept(self)
-        if isinstance(node.right, BinaryOp) is False:
-            right.accept(self)
-            
-        left_type = left.evaluateType()
-        right_type = right.evaluateType()
-        
-        if left_type == 'string' or right_type == 'string':
+    def analyzeAddition(self, node):
+        """
+        Analyzes a chain of '+' operations bottom up without recursing, so 'a + b + c + ...' with thousands of
+        operands doesn't run into the recursion limit. Every operand is visited exactly once. A chain that
+        evaluates to a string is turned into a single StringCat node.
+        """
+        stack = [(node, False)]
+        while stack:
+            current, operandsDone = stack.pop()
+            if operandsDone:
+                # operand types are cached by now, so this doesn't recurse
+                if current.evaluateType() != 'string':
+                    self.promoteExprInts(current)
+                    self.validateOperation(current)
+            elif self.isAddition(current):
+                stack.append((current, True))
+                stack.append((current.right, False))
+                stack.append((current.left, False))
+            else:
+                current.accept(self)
+
+        if node.evaluateType() == 'string':
             if node.parent is None:
                 throw(CompilationError(f"AST node for String concatenation:\n{str(node)}\nhas no parent attr. cannot continue"))
-            strcat_node = self.transformStrcat(node)
-            if isinstance(strcat_node, StringCat):
-                return True
-        return False
+            self.transformStrcat(node)
+
+    def isAddition(self, node):
+        return isinstance(node, BinaryOp) and node.operator == '+'
             
     def transformStrcat(self, node):
         """
@@ -513,26 +522,24 @@ class SemanticAnalyzer:
 
     def _collectStrings(self, node):
         """
-        Recursively collect all string literals and static variables for concatenation
-        from a BinaryOp tree into a single list. If we find a value that is non-static we defer to runtime
+        Collects the operands of an analyzed string concatenation, left to right, into a single list.
+        Nested string additions are flattened; everything else is one operand, evaluated in evalStrCat
+        or deferred to runtime
         """
         strings = []
-
-        def collect(node):
-            is_string_cat = isinstance(node, BinaryOp) and node.operator == '+' and node.evaluateType() == 'string'
-            if not is_string_cat:   
-                node.accept(self)
-            if is_string_cat:
-                collect(node.left)
-                collect(node.right)
-            elif node.evaluateType() in ['string','integer','double','boolean','null']:
-                if isinstance(node, VariableReference):
-                    node.scope = self.symbolTable.scopeOf(node.name)  
-                strings.append(node)
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if self.isAddition(current) and current.evaluateType() == 'string':
+                stack.append(current.right)
+                stack.append(current.left)
+            elif current.evaluateType() in ['string','integer','double','boolean','null']:
+                if isinstance(current, VariableReference):
+                    current.scope = self.symbolTable.scopeOf(current.name)  
+                strings.append(current)
             else:
-                throw(TypeError(f"Illegal Expression in String concatenation: {node}  with types:'{node.evaluateType()}' '+' '{node.evaluateType()}'"))
+                throw(TypeError(f"Illegal Expression in String concatenation: {current}  with types:'{current.evaluateType()}' '+' '{current.evaluateType()}'"))
 
-        collect(node)
         return strings
     
     def evalStrCat(self, node):
@@ -707,45 +714,17 @@ class SemanticAnalyzer:
             if left_type == 'integer':
                 if isinstance(node.left, Integer):
                     node.left = Double(float(node.left.value))
-                else:
+                elif isinstance(node.left, BinaryOp):
                     self.promoteExprInts(node.left, expr_type)  
                 node.cached_type = None
 
             if right_type == 'integer':
                 if isinstance(node.right, Integer):
                     node.right = Double(float(node.right.value))
-                else:
+                elif isinstance(node.right, BinaryOp):
                     self.promoteExprInts(node.right, expr_type)  
                 node.cached_type = None
     
-    def promotePowInts(self, node, expr_type=None):
-        """Promotes all ints to doubles in exponentiation ('^') exprs. V """
-        
-        if expr_type == 'double' or isinstance(node, VariableReference):
-            return
-        
-        expr_type = expr_type or node.evaluateType()
-        left_type = node.left.evaluateType()
-        right_type = node.right.evaluateType()
-
-        if expr_type == 'integer':
-            if isinstance(node, BinaryOp):
-                if left_type == 'integer':
-                    if isinstance(node.left, Integer):
-                        node.left = Double(float(node.left.value))
-                    else:
-                        self.promotePowInts(node.left, expr_type)  
-                    node.cached_type = None
-                    
-                if right_type == 'integer':
-                    if isinstance(node.right, Integer):
-                        node.right = Double(float(node.right.value))
-                    else:
-                        self.promotePowInts(node.right, expr_type)  
-                    node.cached_type = None
-        else:
-            throw(TypeError(f"Invalid type in exponentiation on line {node.line}: '{str(node)}' with types'{left_type}' '^' '{right_type}'"))
-    
     def validateTyStr(self, type_string):
         """
         When given the first three chars (or more) of a type string will return the full form. 
@@ -0,0 +1,172 @@
+from Compiler.utils import *
+
+NUMERIC_TYPES = ['integer', 'double']
+
+class TypeInference:
+    """
+    Runs after semantic analysis and makes every int <-> double conversion explicit, so the generator never
+    has to guess at runtime whether a value is an int or a double.
+
+    A variable keeps the type of its initial value for its whole lifetime (it has a single stack slot).
+    The AST is rewritten so that integer operands mixed with doubles, integers stored in doubles, passed
+    to double parameters or returned from double functions are wrapped in a TypeCast (or turned into a
+    Double literal). Doubles that have to become integers, such as 'x = x + 2.5' on an integer 'x', are
+    truncated with a warning. Exponentiation is always done on doubles and gives a double.
+    """
+    def __init__(self, ast):
+        self.ast = ast
+        self.functions = {}         # name -> FunctionDeclaration
+        self.function = None        # function whose body is being rewritten
+
+    def infer(self):
+        if has_error_occurred() or self.ast is None:
+            return
+        try:
+            for node in walk(self.ast):
+                if isinstance(node, FunctionDeclaration):
+                    self.functions[node.name] = node
+            self.ast.accept(self)
+        except ExitSignal:
+            pass
+        except Exception as e:
+            throw(CompilationError(f"An error occurred during type inference: {e}"), exit=False)
+
+    # ------------ Rewriting ----------------- #
+    # Every visit returns the node that should take its place
+
+    def coerce(self, node, type_, variable=None):
+        """ Converts a numeric expression to the given numeric type, 'variable' is the declaration or update it is stored by """
+        node_type = node.evaluateType()
+        if node_type == type_ or node_type not in NUMERIC_TYPES or type_ not in NUMERIC_TYPES:
+            return node
+        if type_ == 'double':
+            if isinstance(node, Integer):
+                return Double(float(node.value), node.line)
+            return TypeCast(node, 'double')
+        if variable is not None:
+            report(f"Precision loss. Truncating double to int for Variable '{variable.name}'.", "Warning", error=False, line=variable.line)
+        else:
+            report(f"Precision loss. Truncating double to int: '{str(node)}'", "Warning", error=False, line=getattr(node, 'line', None))
+        return TypeCast(node, 'integer')
+
+    def visitStatements(self, statements):
+        return [statement.accept(self) if statement is not None else None for statement in statements]
+
+    def visit_program(self, node):
+        node.statements = self.visitStatements(node.statements)
+        return node
+
+    def visit_block(self, node):
+        node.statements = self.visitStatements(node.statements)
+        return node
+
+    def visit_function_declaration(self, node):
+        previous_function = self.function
+        self.function = node
+        node.block.statements = self.visitStatements(node.block.statements)
+        self.function = previous_function
+        return node
+
+    def visit_variable(self, node):
+        if isinstance(node, (VariableDeclaration, VariableUpdated)):
+            node.value = node.value.accept(self)
+            if node.symbol is not None:
+                node.value = self.coerce(node.value, node.symbol.data_type, node)
+        return node
+
+    def visit_if(self, node):
+        node.comparison = node.comparison.accept(self)
+        node.block.accept(self)
+        # never mutate elifNodes in place, the parser's default list is shared
+        node.elifNodes = [(comparison.accept(self), block.accept(self)) for comparison, block in node.elifNodes]
+        if node.elseBlock is not None:
+            node.elseBlock.accept(self)
+        return node
+
+    def visit_while(self, node):
+        node.comparison = node.comparison.accept(self)
+        node.block.accept(self)
+        return node
+
+    def visit_break(self, node):
+        return node
+
+    def visit_return(self, node):
+        node.value = node.value.accept(self)
+        if self.function is not None:
+            node.value = self.coerce(node.value, self.function.return_type)
+        return node
+
+    def visit_function_call(self, node):
+        node.args = [arg.accept(self) for arg in node.args]
+        function = self.functions.get(node.name)
+        if function is not None:
+            for arg, param in zip(node.args, function.parameters):
+                if isinstance(arg, Argument):
+                    arg.value = self.coerce(arg.value, param.type)
+        return node
+
+    def visit_method_call(self, node):
+        node.receiver = node.receiver.accept(self)
+        node.args = [arg.accept(self) for arg in node.args]
+        return node
+
+    def visit_argument(self, node):
+        node.value = node.value.accept(self)
+        return node
+
+    def visit_parameter(self, node):
+        return node
+
+    def visit_string_cat(self, node):
+        node.strings = [value.accept(self) if isinstance(value, ASTNode) else value for value in node.strings]
+        return node
+
+    def visit_binary_op(self, node):
+        node.left = node.left.accept(self)
+        node.right = node.right.accept(self)
+        left_type, right_type = node.left.evaluateType(), node.right.evaluateType()
+        if left_type not in NUMERIC_TYPES or right_type not in NUMERIC_TYPES:
+            return node
+
+        if left_type != right_type or node.operator == '^':
+            node.left, node.right = self.coerce(node.left, 'double'), self.coerce(node.right, 'double')
+            node.cached_type = None
+        return node
+
+    def visit_comparison(self, node):
+        node.left = node.left.accept(self)
+        node.right = node.right.accept(self)
+        types = [node.left.evaluateType(), node.right.evaluateType()]
+        if types[0] != types[1] and all(type_ in NUMERIC_TYPES for type_ in types):
+            node.left, node.right = self.coerce(node.left, 'double'), self.coerce(node.right, 'double')
+        return node
+
+    def visit_logical_op(self, node):
+        node.left = node.left.accept(self)
+        node.right = node.right.accept(self)
+        return node
+
+    def visit_unary_op(self, node):
+        node.left = node.left.accept(self)
+        node._cached_type = None
+        return node
+
+    def visit_type_cast(self, node):
+        node.value = node.value.accept(self)
+        return node
+
+    def visit_integer(self, node):
+        return node
+
+    def visit_double(self, node):
+        return node
+
+    def visit_boolean(self, node):
+        return node
+
+    def visit_string(self, node):
+        return node
+
+    def visit_null(self, node):
+        return node
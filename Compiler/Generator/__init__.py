@@ -1 +1,3 @@
-from .generator import *
\ No newline at end of file
+from .generator import *
+from .memoTable import *
+from .pipeline import *
\ No newline at end of file
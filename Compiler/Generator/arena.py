@@ -0,0 +1,229 @@
+import llvmlite.ir as ir
+from .libc import declareLibc
+
+class StringArena:
+    """
+    Emits the runtime every string is allocated from: a bump allocator over a list of chunks.
+
+        %Arena = { i8* head, i8* chunk, i8* cur, i8* end }
+        chunk  = [ i8* next | i64 size | size bytes of data ]
+
+    Allocating moves 'cur' forward and only falls back to a call when the current chunk is full.
+    Chunks are never freed, a region that is reset hands its chunks to whatever is allocated next.
+    The arena ('scratch') is reset by the generator when a function returns or a loop iteration ends
+    (see mark/reset).
+
+    A string that has to outlive the region it was built in is promoted: copied into a block of its own
+    from malloc, which the variable holding it frees once it is overwritten or goes out of scope.
+    """
+    CHUNK_SIZE = 1 << 20
+    HEADER_SIZE = 16
+
+    def __init__(self, module):
+        self.module = module
+        self.i8_ptr = ir.IntType(8).as_pointer()
+        self.i64 = ir.IntType(64)
+        self.arena_type = ir.LiteralStructType([self.i8_ptr] * 4)
+
+        self.scratch = self.declareArena("glitchy.scratch")
+        self.malloc = declareLibc(self.module, "malloc")
+        self.free = declareLibc(self.module, "free")
+        self.memmove = declareLibc(self.module, "memmove")
+        self.memcpy = declareLibc(self.module, "memcpy")
+        self.strlen = declareLibc(self.module, "strlen")
+
+        self.grow_fn = self.emitGrow()
+        self.alloc_fn = self.emitAlloc()
+        self.reset_fn = self.emitReset()
+        self.copy_fn = self.emitCopy()
+        self.promote_fn = self.emitPromote()
+
+    # ------------ Used by the generator ----------------- #
+
+    def alloc(self, builder, size):
+        """ Reserves 'size' bytes in the scratch arena """
+        return builder.call(self.alloc_fn, [self.scratch, size])
+
+    def copy(self, builder, string):
+        """ Copies a string into the scratch arena """
+        return builder.call(self.copy_fn, [self.scratch, string])
+
+    def promote(self, builder, string):
+        """ Copies a string into a block of its own, where no reset reaches it. It lives until it is freed """
+        return builder.call(self.promote_fn, [string])
+
+    def discard(self, builder, string):
+        """ Frees a string promote() returned, or does nothing for null """
+        builder.call(self.free, [string])
+
+    def mark(self, builder):
+        """ Remembers how far the scratch arena is filled, the region that starts here ends at reset() """
+        return (builder.load(self.field(builder, self.scratch, 1), name="mark.chunk"),
+                builder.load(self.field(builder, self.scratch, 2), name="mark.cur"))
+
+    def reset(self, builder, mark):
+        """ Frees everything allocated in the scratch arena since 'mark' """
+        builder.call(self.reset_fn, [self.scratch, mark[0], mark[1]])
+
+    def release(self, builder, mark, string):
+        """
+        Resets to 'mark' but keeps one string, which is moved down to the start of the freed region.
+        This is how a function returns a string into its caller's region.
+        """
+        self.reset(builder, mark)
+        return self.copy(builder, string)
+
+    # ------------ Runtime ----------------- #
+
+    def declareArena(self, name):
+        arena = ir.GlobalVariable(self.module, self.arena_type, name=name)
+        arena.linkage = 'internal'
+        arena.initializer = ir.Constant(self.arena_type, None)
+        return arena
+
+    def field(self, builder, arena, index):
+        i32 = ir.IntType(32)
+        return builder.gep(arena, [ir.Constant(i32, 0), ir.Constant(i32, index)], inbounds=True)
+
+    def chunkSize(self, builder, chunk):
+        size_ptr = builder.bitcast(builder.gep(chunk, [ir.Constant(self.i64, 8)]), self.i64.as_pointer())
+        return builder.load(size_ptr, name="size")
+
+    def chunkNext(self, builder, chunk):
+        return builder.bitcast(chunk, self.i8_ptr.as_pointer())
+
+    def newFunction(self, name, return_type, args):
+        function = ir.Function(self.module, ir.FunctionType(return_type, args), name=name)
+        function.linkage = 'internal'
+        return function, ir.IRBuilder(function.append_basic_block(name="entry"))
+
+    def emitAlloc(self):
+        function, builder = self.newFunction("glitchy.alloc", self.i8_ptr, [self.arena_type.as_pointer(), self.i64])
+        arena, size = function.args
+        cur = builder.load(self.field(builder, arena, 2), name="cur")
+        end = builder.load(self.field(builder, arena, 3), name="end")
+        room = builder.sub(builder.ptrtoint(end, self.i64), builder.ptrtoint(cur, self.i64), name="room")
+
+        fast = function.append_basic_block(name="fast")
+        slow = function.append_basic_block(name="slow")
+        builder.cbranch(builder.icmp_unsigned('<=', size, room), fast, slow)
+
+        builder.position_at_end(fast)
+        builder.store(builder.gep(cur, [size]), self.field(builder, arena, 2))
+        builder.ret(cur)
+
+        builder.position_at_end(slow)
+        builder.ret(builder.call(self.grow_fn, [arena, size]))
+        return function
+
+    def emitGrow(self):
+        """ Moves on to the next chunk that is big enough, inserting a new one when there is none """
+        function, builder = self.newFunction("glitchy.grow", self.i8_ptr, [self.arena_type.as_pointer(), self.i64])
+        arena, size = function.args
+        null = ir.Constant(self.i8_ptr, None)
+        chunk = builder.load(self.field(builder, arena, 1), name="chunk")
+        has_chunk = builder.icmp_unsigned('!=', chunk, null)
+
+        # the chunk after the current one, the first one when nothing was allocated yet
+        after_block = function.append_basic_block(name="after")
+        first_block = function.append_basic_block(name="first")
+        check_block = function.append_basic_block(name="check")
+        builder.cbranch(has_chunk, after_block, first_block)
+        builder.position_at_end(after_block)
+        after = builder.load(self.chunkNext(builder, chunk))
+        builder.branch(check_block)
+        builder.position_at_end(first_block)
+        first = builder.load(self.field(builder, arena, 0))
+        builder.branch(check_block)
+
+        builder.position_at_end(check_block)
+        next_chunk = builder.phi(self.i8_ptr, name="next")
+        next_chunk.add_incoming(after, after_block)
+        next_chunk.add_incoming(first, first_block)
+        reuse_block = function.append_basic_block(name="reuse")
+        size_block = function.append_basic_block(name="size")
+        new_block = function.append_basic_block(name="new")
+        use_block = function.append_basic_block(name="use")
+        builder.cbranch(builder.icmp_unsigned('!=', next_chunk, null), size_block, new_block)
+
+        builder.position_at_end(size_block)
+        builder.cbranch(builder.icmp_unsigned('<=', size, self.chunkSize(builder, next_chunk)), reuse_block, new_block)
+
+        builder.position_at_end(reuse_block)
+        builder.branch(use_block)
+
+        builder.position_at_end(new_block)
+        chunk_size = ir.Constant(self.i64, self.CHUNK_SIZE)
+        data_size = builder.select(builder.icmp_unsigned('>', size, chunk_size), size, chunk_size)
+        new_chunk = builder.call(self.malloc, [builder.add(data_size, ir.Constant(self.i64, self.HEADER_SIZE))])
+        builder.store(next_chunk, self.chunkNext(builder, new_chunk))
+        size_ptr = builder.bitcast(builder.gep(new_chunk, [ir.Constant(self.i64, 8)]), self.i64.as_pointer())
+        builder.store(data_size, size_ptr)
+        link_block = function.append_basic_block(name="link")
+        head_block = function.append_basic_block(name="head")
+        builder.cbranch(has_chunk, link_block, head_block)
+        builder.position_at_end(link_block)
+        builder.store(new_chunk, self.chunkNext(builder, chunk))
+        builder.branch(use_block)
+        builder.position_at_end(head_block)
+        builder.store(new_chunk, self.field(builder, arena, 0))
+        builder.branch(use_block)
+
+        builder.position_at_end(use_block)
+        use = builder.phi(self.i8_ptr, name="use")
+        use.add_incoming(next_chunk, reuse_block)
+        use.add_incoming(new_chunk, link_block)
+        use.add_incoming(new_chunk, head_block)
+        data = builder.gep(use, [ir.Constant(self.i64, self.HEADER_SIZE)], name="data")
+        builder.store(use, self.field(builder, arena, 1))
+        builder.store(builder.gep(data, [size]), self.field(builder, arena, 2))
+        builder.store(builder.gep(data, [self.chunkSize(builder, use)]), self.field(builder, arena, 3))
+        builder.ret(data)
+        return function
+
+    def emitReset(self):
+        function, builder = self.newFunction("glitchy.reset", ir.VoidType(), [self.arena_type.as_pointer(), self.i8_ptr, self.i8_ptr])
+        arena, chunk, cur = function.args
+        builder.store(chunk, self.field(builder, arena, 1))
+        builder.store(cur, self.field(builder, arena, 2))
+
+        # before the first chunk there is no room at all, so the next allocation grows
+        has_chunk = builder.icmp_unsigned('!=', chunk, ir.Constant(self.i8_ptr, None))
+        end_block = function.append_basic_block(name="end")
+        empty_block = function.append_basic_block(name="empty")
+        builder.cbranch(has_chunk, end_block, empty_block)
+
+        builder.position_at_end(end_block)
+        data = builder.gep(chunk, [ir.Constant(self.i64, self.HEADER_SIZE)])
+        builder.store(builder.gep(data, [self.chunkSize(builder, chunk)]), self.field(builder, arena, 3))
+        builder.ret_void()
+
+        builder.position_at_end(empty_block)
+        builder.store(ir.Constant(self.i8_ptr, None), self.field(builder, arena, 3))
+        builder.ret_void()
+        return function
+
+    def emitCopy(self):
+        # memmove, the string may overlap its new place when a region is released
+        function, builder = self.newFunction("glitchy.copy", self.i8_ptr, [self.arena_type.as_pointer(), self.i8_ptr])
+        arena, string = function.args
+        size = builder.add(builder.call(self.strlen, [string]), ir.Constant(self.i64, 1))
+        copy = builder.call(self.alloc_fn, [arena, size])
+        builder.call(self.memmove, [copy, string, size])
+        builder.ret(copy)
+        return function
+
+    def emitPromote(self):
+        function, builder = self.newFunction("glitchy.promote", self.i8_ptr, [self.i8_ptr])
+        string = function.args[0]
+        size = builder.add(builder.call(self.strlen, [string]), ir.Constant(self.i64, 1))
+        copy = builder.call(self.malloc, [size])
+        builder.call(self.memcpy, [copy, string, size])
+        builder.ret(copy)
+        return function
+
+class Region:
+    """ Code whose scratch allocations are all freed together: a function call or a loop iteration """
+    def __init__(self, mark=None):
+        self.mark = mark    # None when nothing in the region allocates, then it is never reset
+        self.owners = []    # slots holding the promoted string of each variable declared in the region, or null
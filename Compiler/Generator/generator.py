@@ -1,17 +1,55 @@
 from Compiler.utils import *
+from .memoTable import MemoTable
+from .arena import Region
+from .numbers import MAX_INT_LENGTH, MAX_DOUBLE_LENGTH
+from .runtime import Runtime
+from .libc import declareLibc
+from .lowering import MIRLowering
+from Compiler.MIR import MIRBuilder
 import llvmlite.ir as ir
 import llvmlite.binding as llvm
 
+class FunctionAttributes(ir.values.FunctionAttributes):
+    """ llvmlite's function attribute set, which doesn't know 'willreturn' yet """
+    _known = ir.values.FunctionAttributes._known | {'willreturn'}
 
 class LLVMCodeGenerator:
-    def __init__(self, symbol_table):
+    """
+    Generates the program from its AST, except for the user functions its MIR models completely: those are
+    lowered from the MIR (see MIRLowering), which is in SSA form already.
+
+    With 'ssa' set, variables are kept in registers while the generator walks the program: every assignment
+    just becomes the variable's current value, and where control flow joins (after an if, at the top of a
+    loop, after a loop) a phi picks the value of the edge that was taken. Otherwise every variable gets a
+    stack slot and mem2reg is left to do the same. Variables another function reads stay in a slot either way.
+
+    'line_buffered' flushes the output after every printed line instead of only when the buffer is full.
+    """
+    def __init__(self, symbol_table, ssa=False, line_buffered=False):
         self.symbol_table = symbol_table
+        self.ssa = ssa
+        self.line_buffered = line_buffered
         self.module = ir.Module(name="module")
         self.module.globals = {}
         self.builder = None
         self.function = None
-        self.string_counter = 0
+        self.string_pool = {}       # text -> private constant holding it, shared by every use of the literal
         self.current_after_while_block = None
+        self.break_edges = None     # (block, definitions) of every break out of the current loop
+        self.definitions = {}       # id(symbol) -> current value of each variable kept in a register
+        self.memory_symbols = set() # id(symbol) of variables that have to stay in a stack slot
+        self.tail_loop = None   # (function name, loop block, parameter allocas or phis) used by self tail calls
+        self.function_bodies = {}   # id(FunctionDeclaration) -> ir.Function its body is generated into
+        self.mir_functions = {}     # id(FunctionDeclaration) -> its MIR function, see MIRLowering
+        self.string_arena = None
+        self.output = None
+        self.formatter = None
+        self.reader = None
+        self.regions = []           # regions of the function being generated, outermost first
+        self.symbol_regions = {}    # id(symbol) -> Region the variable was declared in
+        self.promotable = set()     # id(symbol) of string variables a loop assigns that they are declared outside of
+        self.owner_slots = {}       # id(symbol) -> slot holding the promoted string the variable owns, or null
+        self.entry_allocas = {}     # ir.Function -> number of allocas at the top of its entry block
         self.builtin_dispatcher = {
             'input': self.input_builtin,
             'print': self.print_builtin,
@@ -25,12 +63,24 @@ class LLVMCodeGenerator:
         self.function = ir.Function(self.module, func_type, name="main")
         block = self.function.append_basic_block(name="entry")
         self.builder = ir.IRBuilder(block)
+        self.regions = [Region()]
+        self.promotable = self.promotableSymbols(node)
+        self.ownPromoted(self.regions[0], node)
         
         try:
+            mir = MIRBuilder(node).build()
+            if mir is None:
+                return None
+            self.mir_functions = {id(function.node): function for function in mir.functions if function.node is not None}
+            self.declareFunctions(node)
+            if self.ssa:
+                self.memory_symbols = self.sharedSymbols(node)
             node.accept(self)
         except ExitSignal:
             return
         if not self.builder.block.is_terminated:
+            if self.output is not None:
+                self.output.flush(self.builder)
             self.builder.ret_void()
 
         return self.module
@@ -45,33 +95,34 @@ class LLVMCodeGenerator:
             throw(CompilationError(f"An unknown error occurred during code generation. {e}"))
 
     def visit_block(self, node):
-        self.symbol_table.enterScope()
         for statement in node.statements:
             statement.accept(self)
-        self.symbol_table.exitScope()
 
     def visit_variable(self, node):
+        # the analyzer resolved every name to its symbol, which holds the alloca once it is declared
+        symbol = self.resolve(node)
         if isinstance(node, VariableDeclaration):
-            mangled_name = self.symbol_table.getMangledName(node.name)
-            if mangled_name is None:
-                mangled_name = node.name
             value = node.value.accept(self)
             var_type = value.type
+            if var_type == ir.PointerType(ir.IntType(8)):
+                value = self.unaliased(node.value, value)
+
+            self.symbol_regions[id(symbol)] = self.regions[-1]
+            if self.inRegister(symbol):
+                self.definitions[id(symbol)] = value
+                return
 
             # Allocate space for the variable within the current function
-            local_var = self.builder.alloca(var_type, name=mangled_name)
+            local_var = self.entryAlloca(var_type, name=symbol.mangled_name or node.name)
             self.builder.store(value, local_var)
-            self.symbol_table.setReference(node.name, local_var)
+            symbol.ref = local_var
 
         elif isinstance(node, VariableUpdated):
-            mangled_name = self.symbol_table.getMangledName(node.name)
-            if mangled_name is None:
-                raise Error(f"Could not retrieve mangled name for '{node.name}' from symbol table")
             value = node.value.accept(self)
-            expected_type = self.getIrType(self.symbol_table.getType(node.name))
-            local_var = self.symbol_table.getReference(node.name)
+            expected_type = self.getIrType(symbol.data_type)
+            local_var = symbol.ref
 
-            if local_var is None:
+            if local_var is None and id(symbol) not in self.definitions:
                 raise Error(f"Variable '{node.name}' referenced before declaration or update")
             if value.type != expected_type:
                 if value.type == ir.DoubleType() and expected_type == ir.IntType(64):
@@ -79,14 +130,25 @@ class LLVMCodeGenerator:
                     value = self.builder.fptosi(value, ir.IntType(64))
                 else:
                     throw(TypeError(f"Invalid assignment for symbol '{node.name}'. expected '{expected_type}', got: '{value.type} '"))
-            self.builder.store(value, local_var)
+            if value.type == ir.PointerType(ir.IntType(8)) and self.escapes(symbol):
+                # the variable owns the promoted copy, the one it held before can't be reached anymore
+                value = self.stringArena().promote(self.builder, value)
+                owner = self.owner_slots.get(id(symbol))
+                if owner is not None:
+                    self.stringArena().discard(self.builder, self.builder.load(owner))
+                    self.builder.store(value, owner)
+            elif value.type == ir.PointerType(ir.IntType(8)):
+                value = self.unaliased(node.value, value)
+            if id(symbol) in self.definitions:
+                self.definitions[id(symbol)] = value
+            else:
+                self.builder.store(value, local_var)
 
         elif isinstance(node, VariableReference):
-            mangled_name = self.symbol_table.getMangledName(node.name)
-            if mangled_name is None:  # If no mangled name, assume it's a function parameter
-                mangled_name = node.name
-
-            reference = self.symbol_table.getReference(node.name)
+            mangled_name = symbol.mangled_name or node.name     # parameters have no mangled name
+            if id(symbol) in self.definitions:
+                return self.definitions[id(symbol)]
+            reference = symbol.ref
             if reference is None:
                 throw(Error(f"Variable '{node.name}' referenced before declaration"))
 
@@ -104,21 +166,17 @@ class LLVMCodeGenerator:
 
         needs_merge_block = False  # Track if we need a merge block
         merge_block = None  # Define merge block only when needed
+        before = self.definitions
+        edges = []  # (block, definitions) of every branch that falls through to the merge block
 
         self.builder.cbranch(cond_val, if_true_block, if_false_block)
 
-        def insertNop():
-            if self.builder.block.is_terminated and len(self.builder.block.instructions) == 1:
-                self.builder.comment("Nop")
-                zero = ir.Constant(ir.IntType(64), 0)
-                self.builder.position_before(self.builder.block.instructions[0])
-                self.builder.add(zero, zero)
-
         # True Branch
         self.builder.position_at_end(if_true_block)
+        self.definitions = dict(before)
         node.block.accept(self)
-        insertNop()
         if not self.builder.block.is_terminated:
+            edges.append((self.builder.block, self.definitions))
             needs_merge_block = True
             if not merge_block:
                 merge_block = self.builder.append_basic_block(name="if_merge")
@@ -126,6 +184,7 @@ class LLVMCodeGenerator:
 
         # False Branch / Elif / Else Handling
         self.builder.position_at_end(if_false_block)
+        self.definitions = dict(before)
 
         if len(node.elifNodes) > 0:
             for i, elif_node in enumerate(node.elifNodes):
@@ -137,28 +196,30 @@ class LLVMCodeGenerator:
                 self.builder.cbranch(elif_cond_val, elif_true_block, elif_false_block)
 
                 self.builder.position_at_end(elif_true_block)
+                self.definitions = dict(before)
                 elif_node[1].accept(self)
-                insertNop()
                 if not self.builder.block.is_terminated:
+                    edges.append((self.builder.block, self.definitions))
                     needs_merge_block = True
                     if not merge_block:
                         merge_block = self.builder.append_basic_block(name="if_merge")
                     self.builder.branch(merge_block)
 
                 self.builder.position_at_end(elif_false_block)
+                self.definitions = dict(before)
 
             # Handle the final `else` block if it exists
             if node.elseBlock is not None:
                 node.elseBlock.accept(self)
-                insertNop()
                 if not self.builder.block.is_terminated:
+                    edges.append((self.builder.block, self.definitions))
                     needs_merge_block = True
                     if not merge_block:
                         merge_block = self.builder.append_basic_block(name="if_merge")
                     self.builder.branch(merge_block)
             else:
-                insertNop()
                 if not self.builder.block.is_terminated:
+                    edges.append((self.builder.block, self.definitions))
                     needs_merge_block = True
                     if not merge_block:
                         merge_block = self.builder.append_basic_block(name="if_merge")
@@ -167,23 +228,25 @@ class LLVMCodeGenerator:
         elif node.elseBlock is not None:
             # Directly handle the else block if there are no elifs
             node.elseBlock.accept(self)
-            insertNop()
             if not self.builder.block.is_terminated:
+                edges.append((self.builder.block, self.definitions))
                 needs_merge_block = True
                 if not merge_block:
                     merge_block = self.builder.append_basic_block(name="if_merge")
                 self.builder.branch(merge_block)
         else:
-            insertNop()
             if not self.builder.block.is_terminated:
+                edges.append((self.builder.block, self.definitions))
                 needs_merge_block = True
                 if not merge_block:
                     merge_block = self.builder.append_basic_block(name="if_merge")
                 self.builder.branch(merge_block)
 
         # Final Merge Block
+        self.definitions = before
         if needs_merge_block:
             self.builder.position_at_end(merge_block)
+            self.definitions = self.mergeDefinitions(before, edges)
 
     def visit_while(self, node):
         while_cond_block = self.builder.append_basic_block(name="while_cond")
@@ -192,73 +255,179 @@ class LLVMCodeGenerator:
 
         # for break statements
         previous_after_while_block = self.current_after_while_block
+        previous_break_edges = self.break_edges
         self.current_after_while_block = after_while_block
+        self.break_edges = []
 
+        # strings built by an iteration (condition included) are freed before the next one
+        region = self.enterRegion(node.comparison, node.block)
         self.builder.branch(while_cond_block)
+        entry_block = self.builder.block
 
+        # variables the body assigns get a phi at the top, the back edge is only known after the body
         self.builder.position_at_end(while_cond_block)
+        loop_phis = self.loopPhis(node.block, entry_block)
+        header = self.definitions
         cond_val = node.comparison.accept(self)
+        exit_edge = (self.builder.block, header)
         self.builder.cbranch(cond_val, while_body_block, after_while_block)
 
         self.builder.position_at_end(while_body_block)
+        self.definitions = dict(header)
         node.block.accept(self)
 
         if not self.builder.block.is_terminated:
+            self.resetRegion(region)
+            self.freePromoted(region)
+            for key, phi in loop_phis.items():
+                phi.add_incoming(self.definitions[key], self.builder.block)
             self.builder.branch(while_cond_block)  # Recheck the condition after each loop
 
+        # reached when the condition fails or on break
         self.builder.position_at_end(after_while_block)
+        self.definitions = self.mergeDefinitions(header, [exit_edge] + self.break_edges)
+        self.resetRegion(region)
+        self.freePromoted(region)
+        self.regions.pop()
         self.current_after_while_block = previous_after_while_block
+        self.break_edges = previous_break_edges
 
     def visit_break(self, node):
         after_while_block = self.current_after_while_block
+        self.break_edges.append((self.builder.block, self.definitions))
         self.builder.branch(after_while_block)
 
-    def visit_function_declaration(self, function):
+    def declareFunctions(self, node):
+        """ Declares every user function up front, so a call never depends on where its callee is declared """
+        for function in walk(node):
+            if isinstance(function, FunctionDeclaration):
+                self.declareFunction(function)
+
+    def declareFunction(self, function):
         return_type = self.getIrType(function.return_type)
         param_types = [self.getIrType(param.type) for param in function.parameters]
         func_type = ir.FunctionType(return_type, param_types)
 
-        func = ir.Function(self.module, func_type, name=function.name)
+        if function.memoize:
+            # callers go through the memo table, the body is generated into the function behind it
+            memo_table = MemoTable(self.module, function.name, func_type)
+            memo_table.emit()
+            func = memo_table.impl
+            functions = [memo_table.wrapper, func]
+        else:
+            # only main is called from outside, so LLVM is free to drop, specialize and rearrange user functions
+            func = ir.Function(self.module, func_type, name=function.name)
+            func.linkage = 'internal'
+            func.calling_convention = 'fastcc'
+            functions = [func]
+        for declared in functions:
+            declared.attributes = FunctionAttributes(self.effectAttributes(function))
+        self.function_bodies[id(function)] = func
+        return func
+
+    def effectAttributes(self, function):
+        """ What the optimizer found out about a function, as attributes that let LLVM reuse, move and drop calls to it """
+        attributes = ['nounwind']   # nothing the generated code calls can throw
+        if not function.recursive:
+            attributes.append('norecurse')
+        if function.terminates:
+            attributes.append('willreturn')
+        if function.memory == 'none':
+            attributes.append('readnone')
+        elif function.memory == 'read':
+            attributes.append('readonly')
+        return attributes
+
+    def visit_function_declaration(self, function):
+        func = self.function_bodies.get(id(function))
+        if func is None:
+            func = self.declareFunction(function)
+        mir_function = self.mir_functions.get(id(function))
+        if mir_function is not None and MIRLowering.lowerable(mir_function):
+            MIRLowering(self, mir_function, func).lower()
+            return
+
         entry_block = func.append_basic_block(name="entry")
+        previous_builder = self.builder
+        previous_tail_loop = self.tail_loop
+        previous_regions = self.regions
+        previous_definitions = self.definitions
         self.builder = ir.IRBuilder(entry_block)
+        self.regions = []
+        self.definitions = {}
 
-        self.symbol_table.enterScope()
-
+        param_slots = []
         for i, param in enumerate(function.parameters):
             param_value = func.args[i]
             param_value.name = param.name
-            param_alloca = self.builder.alloca(self.getIrType(param.type), name=param.name)
+            if self.inRegister(param.symbol):
+                self.definitions[id(param.symbol)] = param_value
+                param_slots.append(param.symbol)
+                continue
+            param_alloca = self.entryAlloca(self.getIrType(param.type), name=param.name)
             self.builder.store(param_value, param_alloca)
-            self.symbol_table.setReference(param.name, param_alloca)
+            param.symbol.ref = param_alloca
+            param_slots.append(param_alloca)
 
         self.builder.position_at_end(entry_block)
+        # a returned string is always moved into the caller's region, even one that wasn't built here
+        region = self.enterRegion(*function.parameters, function.block, always=function.return_type == 'string')
+        for param in function.parameters:
+            self.symbol_regions[id(param.symbol)] = region
+
+        # Self tail calls store their arguments into the parameters and jump back here
+        self.tail_loop = None
+        if function.tailRecursive:
+            loop_block = func.append_basic_block(name="tail_recurse")
+            before_loop = self.builder.block
+            self.builder.branch(loop_block)
+            self.builder.position_at_end(loop_block)
+            for index, slot in enumerate(param_slots):
+                if not isinstance(slot, ir.AllocaInstr):
+                    # a parameter kept in a register: the jump back brings its new value along
+                    phi = self.builder.phi(func.args[index].type, name=func.args[index].name)
+                    phi.add_incoming(self.definitions[id(slot)], before_loop)
+                    self.definitions[id(slot)] = phi
+                    param_slots[index] = phi
+            self.tail_loop = (function.name, loop_block, param_slots)
 
         for statement in function.block.statements:
             statement.accept(self)
 
         if not self.builder.block.is_terminated:
             if func.ftype.return_type == ir.VoidType():
+                self.resetRegion(region)
+                self.freePromoted(region)
                 self.builder.ret_void()
             else:
                 throw(ReturnError(f"The function '{function.name}' expects a return type of '{function.return_type}'. Please ensure the function is properly terminated. "))
-        self.symbol_table.exitScope()
 
-        # reset builders pointer to main function
-        if 'main' in self.module.globals:
-            main_func = self.module.get_global("main")
-            main_block = main_func.entry_basic_block
-            self.builder = ir.IRBuilder(main_block)
+        # resume wherever we were before the declaration (usually main)
+        self.builder = previous_builder
+        self.tail_loop = previous_tail_loop
+        self.regions = previous_regions
+        self.definitions = previous_definitions
 
     def visit_return(self, node):
         if not isinstance(node.value, Null):
             return_value = node.value.accept(self)
-            if not isinstance(return_value, ir.Instruction) and return_value.is_pointer:
+            if self.builder.block.is_terminated:
+                return  # a tail call already returned or jumped back to the top of the function
+            if not isinstance(return_value, (ir.Instruction, ir.Constant, ir.Argument)) and return_value.is_pointer:
                 return_value = self.builder.load(return_value)
 
             if not self.builder.block.is_terminated:
+                mark = self.regions[0].mark
+                if mark is not None and return_value.type == ir.PointerType(ir.IntType(8)):
+                    return_value = self.stringArena().release(self.builder, mark, return_value)
+                else:
+                    self.resetRegion(self.regions[0])
+                self.freePromoted(*self.regions)
                 self.builder.ret(return_value)
         else:
             if not self.builder.block.is_terminated:
+                self.resetRegion(self.regions[0])
+                self.freePromoted(*self.regions)
                 self.builder.ret_void()
 
     def visit_function_call(self, node):
@@ -267,17 +436,64 @@ class LLVMCodeGenerator:
 
         func = self.module.get_global(node.name)
         args = [arg.value.accept(self) for arg in node.args]
-        call_result = self.builder.call(func, args)
 
-        return_type_str = self.symbol_table.getFunctionType(node.name)
-        return_type = self.getIrType(return_type_str)
+        if node.tail is not None:
+            return self.tail_call(node, func, args)
+
+        call_result = self.builder.call(func, args)
 
-        if return_type != ir.VoidType():
+        if func.function_type.return_type != ir.VoidType():
             return call_result
         else:
             return None
 
+    def tail_call(self, node, func, args):
+        """
+        Emits a call in tail position. Calls to the current function become a jump back to its top,
+        other calls are marked 'tail' (or 'musttail' when both functions have the same signature) and return right away.
+        """
+        if self.tail_loop is not None and node.name == self.tail_loop[0]:
+            _, loop_block, param_slots = self.tail_loop
+            # all arguments were evaluated above, before any parameter is overwritten
+            args = [self.unaliased(arg.value, value) for arg, value in zip(node.args, args)]
+            self.freePromoted(*self.regions)
+            for value, slot in zip(args, param_slots):
+                if isinstance(slot, ir.PhiInstr):
+                    slot.add_incoming(value, self.builder.block)
+                else:
+                    self.builder.store(value, slot)
+            self.builder.branch(loop_block)
+            return None
+
+        # The tail marker promises the callee never touches our stack, so pointer (string) arguments rule it out
+        tail = False
+        if all(not isinstance(arg.type, ir.PointerType) for arg in args):
+            caller = self.builder.function
+            tail = 'musttail' if caller.function_type == func.function_type else 'tail'
+        if tail:
+            # nothing of our region is needed anymore, and a string the callee returns lands in our caller's region
+            self.resetRegion(self.regions[0])
+            self.freePromoted(*self.regions)
+        call_result = self.builder.call(func, args, tail=tail)
+
+        if node.tail == 'void':
+            if not tail:
+                self.resetRegion(self.regions[0])
+                self.freePromoted(*self.regions)
+            self.builder.ret_void()
+            return None
+        if tail:
+            # returned right here, nothing may come between the call and the return
+            self.builder.ret(call_result)
+        return call_result  # returned by visit_return straight after the call
+
     def visit_method_call(self, node):
+        if self.isFusedInput(node):
+            # the number is parsed straight out of the input buffer, no string is made for it
+            if node.name == 'toInteger':
+                return self.inputReader().integer(self.builder)
+            return self.inputReader().double(self.builder)
+
         if isinstance(node.receiver, MethodCall):
             result = self.visit_method_call(node.receiver)
         else:
@@ -294,8 +510,10 @@ class LLVMCodeGenerator:
             throw(NotImplementedError(f"Method '{method_name}' is not implemented in the generator."))
 
     def visit_binary_op(self, node):
-        left = node.left.accept(self)
-        right = node.right.accept(self)
+        return self.emitBinaryOp(node, node.left.accept(self), node.right.accept(self))
+
+    def emitBinaryOp(self, node, left, right):
+        """ The operation of 'node' on operands that were already generated (from the AST or the MIR) """
         left_type = left.type
         right_type = right.type
 
@@ -312,13 +530,8 @@ class LLVMCodeGenerator:
                 result = self.builder.sdiv(left, right)
             elif node.operator == '%':
                 result = self.builder.srem(left, right)
-            elif node.operator == '^':
-                self.declareGlobal('pow')
-                pow_ = self.module.get_global('pow')
-                left = self.builder.sitofp(left, ir.DoubleType())
-                right = self.builder.sitofp(right, ir.DoubleType())
-                result = self.builder.call(pow_, [left, right])
             else:
+                # integer '^' is rewritten to a double pow by type inference
                 throw(CompilationError(f"Unknown operator for integers: {node.operator}"))
 
         elif left_type == ir.DoubleType() and right_type == ir.DoubleType():
@@ -333,44 +546,20 @@ class LLVMCodeGenerator:
             elif node.operator == '%':
                 result = self.builder.frem(left, right)
             elif node.operator == '^':
-                self.declareGlobal('pow')
-                pow_ = self.module.get_global('pow')
-                result = self.builder.call(pow_, [left, right])
+                result = self.builder.call(declareLibc(self.module, 'pow'), [left, right])
             else:
                 throw(CompilationError(f"Unknown operator for doubles: {node.operator}"))
 
-        elif (left_type == ir.IntType(64) and right_type == ir.DoubleType()) or (left_type == ir.DoubleType() and right_type == ir.IntType(64)):
-            # most type promotions are done in the analyzer. this is for values that are unknown until runtime
-            if left_type == ir.IntType(64):
-                left = self.builder.sitofp(left, ir.DoubleType())
-            elif right_type == ir.IntType(64):
-                right = self.builder.sitofp(right, ir.DoubleType())
-
-            if node.operator == '+':
-                result = self.builder.fadd(left, right)
-            elif node.operator == '-':
-                result = self.builder.fsub(left, right)
-            elif node.operator == '*':
-                result = self.builder.fmul(left, right)
-            elif node.operator == '/':
-                result = self.builder.fdiv(left, right)
-            elif node.operator == '%':
-                result = self.builder.frem(left, right)
-            elif node.operator == '^':
-                self.declareGlobal('pow')
-                pow_ = self.module.get_global('pow')
-                result = self.builder.call(pow_, [left, right])
-            else:
-                throw(CompilationError(f"Unknown operator for mixed types: {node.operator}"))
-
         else:
+            # operands of differing numeric types were given explicit TypeCasts during type inference
             throw(CompilationError(f"Illegal Binary Operation on line {node.line}: \n\t{str(node)}\nCannot perform binary operations on differing or unsupported types: {left_type} and {right_type}"))
 
         return result
 
     def visit_unary_op(self, node):
-        operand = node.left.accept(self)
+        return self.emitUnaryOp(node, node.left.accept(self))
 
+    def emitUnaryOp(self, node, operand):
         if node.operator == '-':
             if operand.type == ir.DoubleType():
                 result = self.builder.fneg(operand)
@@ -388,17 +577,16 @@ class LLVMCodeGenerator:
         return result
 
     def visit_comparison(self, node):
-        left = node.left.accept(self)
-        right = node.right.accept(self)
+        return self.emitComparison(node, node.left.accept(self), node.right.accept(self))
+
+    def emitComparison(self, node, left, right):
         left_type = left.type
         right_type = right.type
 
         # String comparisons
         if node.left.evaluateType() == 'string' and node.operator == '==':
-            self.declareGlobal('strcmp')
-            strcmp_func = self.module.globals['strcmp']
-            strcmp_result = self.builder.call(strcmp_func, [left, right])
-            result = self.builder.icmp_signed('==', strcmp_result, ir.Constant(ir.IntType(64), 0))  # strcmp returns 0 if strings are equal
+            strcmp_result = self.builder.call(declareLibc(self.module, 'strcmp'), [left, right])
+            result = self.builder.icmp_signed('==', strcmp_result, ir.Constant(ir.IntType(32), 0))  # strcmp returns 0 if strings are equal
             return result
 
         if left_type == ir.IntType(64) and right_type == ir.IntType(64):
@@ -449,35 +637,24 @@ class LLVMCodeGenerator:
             else:
                 throw(ValueError(f"Unknown operator: {node.operator}"))
 
-        elif (left_type == ir.IntType(64) and right_type == ir.DoubleType()) or (left_type == ir.DoubleType() and right_type == ir.IntType(64)):
-            if left_type == ir.IntType(64):
-                left = self.builder.sitofp(left, ir.DoubleType())
-            elif right_type == ir.IntType(64):
-                right = self.builder.sitofp(right, ir.DoubleType())
-
-            if node.operator == '==':
-                result = self.builder.fcmp_ordered('==', left, right)
-            elif node.operator == '!=':
-                result = self.builder.fcmp_ordered('!=', left, right)
-            elif node.operator == '<':
-                result = self.builder.fcmp_ordered('<', left, right)
-            elif node.operator == '<=':
-                result = self.builder.fcmp_ordered('<=', left, right)
-            elif node.operator == '>':
-                result = self.builder.fcmp_ordered('>', left, right)
-            elif node.operator == '>=':
-                result = self.builder.fcmp_ordered('>=', left, right)
-            else:
-                throw(ValueError(f"Unknown operator: {node.operator}"))
-
         else:
             throw(CompilationError(f"Cannot perform operation on differing or unsupported types on line {node.line}: {str(node)} with types '{node.left.evaluateType()}' '{node.operator}' '{node.evaluateType()}'"))
         return result
 
+    def visit_type_cast(self, node):
+        return self.emitTypeCast(node, node.value.accept(self))
+
+    def emitTypeCast(self, node, value):
+        if node.type == 'double' and value.type == ir.IntType(64):
+            return self.builder.sitofp(value, ir.DoubleType())
+        if node.type == 'integer' and value.type == ir.DoubleType():
+            return self.builder.fptosi(value, ir.IntType(64))
+        return value
+
     def visit_logical_op(self, node):
-        left = node.left.accept(self)
-        right = node.right.accept(self)
+        return self.emitLogicalOp(node, node.left.accept(self), node.right.accept(self))
 
+    def emitLogicalOp(self, node, left, right):
         if node.operator == '&&':
             result = self.builder.and_(left, right)
         elif node.operator == '||':
@@ -494,287 +671,73 @@ class LLVMCodeGenerator:
         if len(node.strings) == 0:
             raise CompilationError("No strings to concatenate")
 
-        # Declare global functions
-        self.declareGlobal('strcat')
-        self.declareGlobal('sprintf')
-        self.declareGlobal('strlen')
-        self.declareGlobal('memset')
+        i8_ptr = ir.PointerType(ir.IntType(8))
+        i64 = ir.IntType(64)
 
-        global_buffer = self.module.get_global("global_string_buffer")
-        buffer_ptr = self.builder.bitcast(global_buffer, ir.PointerType(ir.IntType(8)))
-        self.resetBuffer(buffer_ptr, 8192)
+        # Evaluate every piece and work out its length once, numbers get room for their longest text
+        pieces = []
+        total = ir.Constant(i64, 1)     # null terminator
+        for value in node.strings:
+            if isinstance(value, str):
+                value = String(value)
+            piece = value.accept(self)
 
-        result_ptr = buffer_ptr
-        for i in range(len(node.strings)):
-            if isinstance(node.strings[i], str):
-                next_string = String(node.strings[i]).accept(self)
-            else:
-                next_string = node.strings[i].accept(self)
-
-            # Check the type and convert if necessary
-            if not (isinstance(next_string.type, ir.PointerType) and next_string.type.pointee == ir.IntType(8)):
-                if next_string.type is ir.IntType(64):
-                    format_str_int = self.builder.bitcast(self.module.get_global('sprintf_fmt_int'), ir.PointerType(ir.IntType(8)))
-                    buffer_int = self.builder.alloca(ir.ArrayType(ir.IntType(8), 22))
-                    buffer_int_ptr = self.builder.bitcast(buffer_int, ir.PointerType(ir.IntType(8)))
-                    self.builder.call(self.module.get_global('sprintf'), [buffer_int_ptr, format_str_int, next_string])
-                    next_string = buffer_int_ptr
-                elif next_string.type is ir.DoubleType():
-                    format_str_double = self.builder.bitcast(self.module.get_global('sprintf_fmt_double'), ir.PointerType(ir.IntType(8)))
-                    buffer_double = self.builder.alloca(ir.ArrayType(ir.IntType(8), 32))
-                    buffer_double_ptr = self.builder.bitcast(buffer_double, ir.PointerType(ir.IntType(8)))
-                    self.builder.call(self.module.get_global('sprintf'), [buffer_double_ptr, format_str_double, next_string])
-                    next_string = buffer_double_ptr
-                elif next_string.type is ir.IntType(1):  # Boolean type (i1)
-                    true_str = self.builder.global_string_ptr("true", name="bool_true")
-                    false_str = self.builder.global_string_ptr("false", name="bool_false")
-                    next_string = self.builder.select(next_string, true_str, false_str)
+            if isinstance(piece.type, ir.PointerType) and piece.type.pointee == ir.IntType(8):
+                if isinstance(value, String):
+                    length = ir.Constant(i64, len(value.value.encode("utf8")))
                 else:
-                    throw(CompilationError(f"An error occurred during the code generation of the string concatenation: '{str(node)}'"))
-
-            strcat = self.module.get_global('strcat')
-            self.builder.call(strcat, [result_ptr, next_string])
-
-            # Move result_ptr to /00
-            result_ptr = self.builder.gep(result_ptr, [self.builder.call(self.module.get_global('strlen'), [next_string])])
+                    length = self.builder.call(declareLibc(self.module, 'strlen'), [piece])
+            elif piece.type == i64:
+                length = ir.Constant(i64, MAX_INT_LENGTH)
+            elif piece.type == ir.DoubleType():
+                length = ir.Constant(i64, MAX_DOUBLE_LENGTH)
+            elif piece.type == ir.IntType(1):
+                true_str = self.stringConstant("true")
+                false_str = self.stringConstant("false")
+                length = self.builder.select(piece, ir.Constant(i64, 4), ir.Constant(i64, 5))
+                piece = self.builder.select(piece, true_str, false_str)
+            else:
+                throw(CompilationError(f"An error occurred during the code generation of the string concatenation: '{str(node)}'"))
+            pieces.append((piece, length))
+            total = self.builder.add(total, length)
+
+        # Reserve once, then copy (or format) every piece into place
+        result = self.stringArena().alloc(self.builder, total)
+        cursor = result
+        for piece, length in pieces:
+            if piece.type == i64:
+                length = self.numberFormatter().integer(self.builder, cursor, piece)
+            elif piece.type == ir.DoubleType():
+                length = self.numberFormatter().double(self.builder, cursor, piece)
+            else:
+                self.builder.call(declareLibc(self.module, 'memcpy'), [cursor, piece, length])
+            cursor = self.builder.gep(cursor, [length])
+        self.builder.store(ir.Constant(ir.IntType(8), 0), cursor)
 
-        return buffer_ptr
+        return result
 
     def visit_integer(self, node):
-        const_val = ir.Constant(ir.IntType(64), node.value)
-        int_var = self.builder.alloca(const_val.type, name="int_var")
-        self.builder.store(const_val, int_var)
-        return self.builder.load(int_var)
+        return ir.Constant(ir.IntType(64), node.value)
 
     def visit_double(self, node):
-        const_val = ir.Constant(ir.DoubleType(), node.value)
-        node.name = self.builder.alloca(const_val.type, name="node.name")
-        self.builder.store(const_val, node.name)
-        return self.builder.load(node.name)
+        return ir.Constant(ir.DoubleType(), node.value)
 
     def visit_boolean(self, node):
-        const_val = ir.Constant(ir.IntType(1), node.value)
-        bool_var = self.builder.alloca(const_val.type, name="bool_var")
-        self.builder.store(const_val, bool_var)
-        return self.builder.load(bool_var)
+        return ir.Constant(ir.IntType(1), 1 if node.value == 'true' else 0)
 
     def visit_string(self, node):
-        str_val = bytearray(node.value.encode("utf8")) + b"\0"
-        str_constant = ir.Constant(ir.ArrayType(ir.IntType(8), len(str_val)), str_val)
-
-        unique_name = f"str_{self.string_counter}"
-        self.string_counter += 1
-
-        str_var = self.builder.alloca(str_constant.type, name=unique_name)
-        self.builder.store(str_constant, str_var)
-        str_ptr = self.builder.gep(str_var, [ir.Constant(ir.IntType(64), 0), ir.Constant(ir.IntType(64), 0)])
-
-        return self.builder.bitcast(str_ptr, ir.PointerType(ir.IntType(8)))
+        return self.stringConstant(node.value)
 
     def visit_null(self, node):
         return ir.Constant(ir.IntType(64), None)
 
 # --------------------------- Helpers --------------------------- #
 
-    def declareGlobal(self, name):
-        """ Declares a global if it hasn't been declared already """
-
-        format_strings = {
-            "printf": {
-                "print_fmt_int": "%lld\n\00",
-                "print_fmt_double": "%f\n\00",
-                "print_fmt_bool": "%s\n\00",
-                "print_fmt_str": "%s\n\00"
-            },
-            "scanf": {
-                "format_scanf": "%s\00"
-            },
-            "sprintf": {
-                "sprintf_fmt_int": "%lld\00",
-                "sprintf_fmt_double": "%f\00"
-            }
-        }
-
-        if name == "freopen":
-            try:
-                self.module.get_global("freopen")
-            except KeyError:
-                freopen_func_type = ir.FunctionType(
-                    ir.IntType(8).as_pointer(),
-                    [ir.IntType(8).as_pointer(), ir.IntType(8).as_pointer(), ir.IntType(8).as_pointer()]
-                )
-                ir.Function(self.module, freopen_func_type, name="freopen")
-
-                output_file = "output.bsdk"
-                try:
-                    self.module.get_global("file_name")
-                except KeyError:
-                    file_name = ir.GlobalVariable(
-                        self.module,
-                        ir.ArrayType(ir.IntType(8), len(output_file) + 1),
-                        name="file_name"
-                    )
-                    file_name.initializer = ir.Constant(
-                        ir.ArrayType(ir.IntType(8), len(output_file) + 1),
-                        bytearray(output_file.encode('utf-8') + b'\00')
-                    )
-
-                try:
-                    self.module.get_global("mode")
-                except KeyError:
-                    mode = ir.GlobalVariable(
-                        self.module,
-                        ir.ArrayType(ir.IntType(8), 2),
-                        name="mode"
-                    )
-                    mode.initializer = ir.Constant(
-                        ir.ArrayType(ir.IntType(8), 2),
-                        bytearray(b"w\00")
-                    )
-
-                try:
-                    self.module.get_global("stdout")
-                except KeyError:
-                    stdout_var = ir.GlobalVariable(self.module, ir.IntType(8).as_pointer(), name="stdout")
-                    stdout_var.linkage = 'external'
-                    
-        if name == "printf":
-            for fmt_name, fmt in format_strings["printf"].items():
-                try:
-                    self.module.get_global(fmt_name)
-                except KeyError:
-                    c_format_str = ir.Constant(ir.ArrayType(ir.IntType(8), len(fmt)), bytearray(fmt.encode("utf8")))
-                    format_global = ir.GlobalVariable(self.module, c_format_str.type, name=fmt_name)
-                    format_global.global_constant = True
-                    format_global.initializer = c_format_str
-
-            try:
-                self.module.get_global("printf")
-            except KeyError:
-                printf_ty = ir.FunctionType(ir.IntType(64), [ir.PointerType(ir.IntType(8))], var_arg=True)
-                ir.Function(self.module, printf_ty, name="printf")
-            try:
-                self.module.get_global("true_str")
-            except KeyError:
-                true_str_value = bytearray("true".encode("utf8")) + bytearray([0])  # Add null terminator
-                true_str = ir.Constant(ir.ArrayType(ir.IntType(8), len(true_str_value)), true_str_value)
-                true_global = ir.GlobalVariable(self.module, true_str.type, name="true_str")
-                true_global.global_constant = True
-                true_global.initializer = true_str
-            try:
-                self.module.get_global("false_str")
-            except KeyError:
-                false_str_value = bytearray("false".encode("utf8")) + bytearray([0])  # Add null terminator
-                false_str = ir.Constant(ir.ArrayType(ir.IntType(8), len(false_str_value)), false_str_value)
-                false_global = ir.GlobalVariable(self.module, false_str.type, name="false_str")
-                false_global.global_constant = True
-                false_global.initializer = false_str
-
-        elif name == "scanf":
-            format_str_name = "format_scanf"
-            try:
-                self.module.get_global(format_str_name)
-            except KeyError:
-                format_str = format_strings["scanf"][format_str_name]
-                c_format_str = ir.Constant(ir.ArrayType(ir.IntType(8), len(format_str)), bytearray(format_str.encode("utf8")))
-                c_format_str_global = ir.GlobalVariable(self.module, c_format_str.type, name=format_str_name)
-                c_format_str_global.linkage = 'internal'
-                c_format_str_global.global_constant = True
-                c_format_str_global.initializer = c_format_str
-
-            try:
-                self.module.get_global("scanf")
-            except KeyError:
-                scanf_ty = ir.FunctionType(ir.IntType(64), [ir.PointerType(ir.IntType(8))], var_arg=True)
-                ir.Function(self.module, scanf_ty, name="scanf")
-
-            try:
-                self.module.get_global("global_input_buffer")
-            except KeyError:
-                buffer_size = 8192
-                buffer_ty = ir.ArrayType(ir.IntType(8), buffer_size)
-                global_buffer = ir.GlobalVariable(
-                    self.module,
-                    buffer_ty,
-                    name="global_input_buffer"
-                )
-                global_buffer.linkage = 'internal'
-                global_buffer.initializer = ir.Constant(buffer_ty, None)
-
-        elif name == "sprintf":
-            for fmt_name, fmt in format_strings["sprintf"].items():
-                try:
-                    self.module.get_global(fmt_name)
-                except KeyError:
-                    c_format_str = ir.Constant(ir.ArrayType(ir.IntType(8), len(fmt)), bytearray(fmt.encode("utf8")))
-                    format_global = ir.GlobalVariable(self.module, c_format_str.type, name=fmt_name)
-                    format_global.global_constant = True
-                    format_global.initializer = c_format_str
-
-            try:
-                self.module.get_global("sprintf")
-            except KeyError:
-                sprintf_ty = ir.FunctionType(
-                    ir.IntType(64),
-                    [ir.PointerType(ir.IntType(8)), ir.PointerType(ir.IntType(8))],
-                    var_arg=True
-                )
-                ir.Function(self.module, sprintf_ty, name="sprintf")
-
-        elif name == "pow":
-            try:
-                self.module.get_global("pow")
-            except KeyError:
-                pow_ty = ir.FunctionType(ir.DoubleType(), [ir.DoubleType(), ir.DoubleType()])
-                ir.Function(self.module, pow_ty, name="pow")
-
-        elif name == "strlen":
-            try:
-                self.module.get_global("strlen")
-            except KeyError:
-                strlen_ty = ir.FunctionType(ir.IntType(64), [ir.PointerType(ir.IntType(8))])
-                ir.Function(self.module, strlen_ty, name="strlen")
-
-        elif name == "strcmp":
-            try:
-                self.module.get_global("strcmp")
-            except KeyError:
-                strcmp_ty = ir.FunctionType(ir.IntType(64), [ir.PointerType(ir.IntType(8)), ir.PointerType(ir.IntType(8))])
-                ir.Function(self.module, strcmp_ty, name="strcmp")
-
-        elif name == "strcat":
-            try:
-                self.module.get_global("strcat")
-            except KeyError:
-                strcat_ty = ir.FunctionType(ir.PointerType(ir.IntType(8)), [ir.PointerType(ir.IntType(8)), ir.PointerType(ir.IntType(8))])
-                ir.Function(self.module, strcat_ty, name="strcat")
-
-            try:
-                self.module.get_global("global_string_buffer")
-            except KeyError:
-                buffer_size = 8192
-                buffer_ty = ir.ArrayType(ir.IntType(8), buffer_size)
-                global_buffer = ir.GlobalVariable(
-                    self.module,
-                    buffer_ty,
-                    name="global_string_buffer"
-                )
-                global_buffer.linkage = 'internal'
-                global_buffer.initializer = ir.Constant(buffer_ty, None)
-
-        elif name == "atoi":
-            try:
-                self.module.get_global("atoi")
-            except KeyError:
-                atoi_ty = ir.FunctionType(ir.IntType(64), [ir.PointerType(ir.IntType(8))])
-                ir.Function(self.module, atoi_ty, name="atoi")
-
-        elif name == "atof":
-            try:
-                self.module.get_global("atof")
-            except KeyError:
-                atof_ty = ir.FunctionType(ir.DoubleType(), [ir.PointerType(ir.IntType(8))])
-                ir.Function(self.module, atof_ty, name="atof")
+    def resolve(self, node):
+        """ Returns the symbol the analyzer bound to a variable node """
+        if node.symbol is None:
+            throw(CompilationError(f"The name '{node.name}' was never resolved by the semantic analyzer"), line=node.line)
+        return node.symbol
 
     def getIrType(self, type_str):
         if type_str == 'integer':
@@ -790,106 +753,325 @@ class LLVMCodeGenerator:
         else:
             throw(ValueError(f"Unknown type: {type_str}"))
 
-    def resetBuffer(self, buffer_ptr, buffer_size):
-        try:
-            memset = self.module.get_global("memset")
-        except KeyError:
-            memset_ty = ir.FunctionType(ir.PointerType(ir.IntType(8)), [
-                ir.PointerType(ir.IntType(8)),  # dest
-                ir.IntType(8),                 # value
-                ir.IntType(64)                 # size (in bytes), use i32 for consistency
-            ])
-            memset = ir.Function(self.module, memset_ty, name="memset")
-
-        buffer_ptr = self.builder.bitcast(buffer_ptr, ir.PointerType(ir.IntType(8)))
-        zero = ir.Constant(ir.IntType(8), 0)
-        buffer_size_const = ir.Constant(ir.IntType(64), buffer_size)
-        self.builder.call(memset, [buffer_ptr, zero, buffer_size_const])
+    def stringConstant(self, text):
+        """ Pointer to the first byte of a literal. Each distinct text is emitted once, as a private constant """
+        constant = self.string_pool.get(text)
+        if constant is None:
+            data = bytearray(text.encode("utf8")) + b"\0"
+            value = ir.Constant(ir.ArrayType(ir.IntType(8), len(data)), data)
+            constant = ir.GlobalVariable(self.module, value.type, name=f"str.{len(self.string_pool)}")
+            constant.linkage = 'private'
+            constant.unnamed_addr = True
+            constant.global_constant = True
+            constant.initializer = value
+            self.string_pool[text] = constant
+        zero = ir.Constant(ir.IntType(32), 0)
+        return constant.gep([zero, zero])
+
+    def entryAlloca(self, var_type, name=''):
+        """
+        Allocates a stack slot at the top of the current function's entry block, wherever the builder is.
+        A slot declared in a loop body is then reserved once instead of on every iteration, and mem2reg
+        (which only promotes entry block allocas) turns it into a register.
+        """
+        function = self.builder.function
+        entry = function.entry_basic_block
+        count = self.entry_allocas.get(function, 0)
+        builder = ir.IRBuilder(entry)
+        if count < len(entry.instructions):
+            builder.position_before(entry.instructions[count])
+        slot = builder.alloca(var_type, name=name)
+        self.entry_allocas[function] = count + 1
+        if self.builder.block is entry:
+            # the generator always appends, the slot went in above the point it was appending at
+            self.builder.position_at_end(entry)
+        return slot
+
+    def inRegister(self, symbol):
+        return self.ssa and id(symbol) not in self.memory_symbols
+
+    def sharedSymbols(self, node):
+        """ Variables a function reads or writes but doesn't declare, those need a slot the function can reach """
+        shared = set()
+        for function in walk(node):
+            if not isinstance(function, FunctionDeclaration):
+                continue
+            declared = {id(param.symbol) for param in function.parameters}
+            used = []
+            for child in walk(function.block):
+                if isinstance(child, VariableDeclaration):
+                    declared.add(id(child.symbol))
+                elif isinstance(child, (VariableReference, VariableUpdated)) and child.symbol is not None:
+                    used.append(id(child.symbol))
+            shared.update(symbol for symbol in used if symbol not in declared)
+        return shared
+
+    def promotableSymbols(self, node):
+        """
+        String variables assigned inside a loop they are declared outside of. Only those can be assigned a
+        string that has to outlive the loop iteration it was built in (see escapes), so only they get promoted
+        """
+        depths = {}     # id(symbol) -> number of loops around the declaration
+        assigned = []   # (id(symbol), number of loops around the assignment)
+        stack = [(node, 0)]
+        while stack:
+            child, depth = stack.pop()
+            if not isinstance(child, ASTNode):
+                continue
+            if isinstance(child, (VariableDeclaration, Parameter)) and child.symbol is not None:
+                depths[id(child.symbol)] = depth
+            elif isinstance(child, VariableUpdated) and child.symbol is not None and child.symbol.data_type == 'string':
+                assigned.append((id(child.symbol), depth))
+            depth += isinstance(child, While)
+            stack.extend((grandchild, depth) for grandchild in children(child))
+        return {symbol for symbol, depth in assigned if depth > depths.get(symbol, depth)}
+
+    def declaredIn(self, *nodes):
+        """ Symbols of the variables and parameters declared in the nodes, leaving out nested loops and functions """
+        stack = list(nodes)
+        while stack:
+            child = stack.pop()
+            if isinstance(child, (VariableDeclaration, Parameter)) and child.symbol is not None:
+                yield child.symbol
+            stack.extend(grandchild for grandchild in children(child)
+                         if isinstance(grandchild, ASTNode) and not isinstance(grandchild, (While, FunctionDeclaration)))
+
+    def loopPhis(self, body, entry_block):
+        """ Puts a phi for every register variable the loop body assigns at the top of the loop """
+        phis = {}
+        for child in walk(body):
+            if isinstance(child, VariableUpdated) and id(child.symbol) in self.definitions and id(child.symbol) not in phis:
+                value = self.definitions[id(child.symbol)]
+                phi = self.builder.phi(value.type, name=child.symbol.mangled_name or child.name)
+                phi.add_incoming(value, entry_block)
+                phis[id(child.symbol)] = phi
+        self.definitions = dict(self.definitions)
+        self.definitions.update(phis)
+        return phis
+
+    def mergeDefinitions(self, before, edges):
+        """
+        Values of the variables at a block the edges all jump to. Only the variables of 'before' are still
+        in scope, and one gets a phi when the edges don't agree on its value.
+        """
+        merged = {}
+        for key, value in before.items():
+            incoming = [(definitions[key], block) for block, definitions in edges]
+            if all(other is incoming[0][0] for other, _ in incoming):
+                merged[key] = incoming[0][0] if incoming else value
+                continue
+            phi = self.builder.phi(value.type)
+            for other, block in incoming:
+                phi.add_incoming(other, block)
+            merged[key] = phi
+        return merged
+
+    def outputBuffer(self):
+        if self.output is None:
+            runtime = Runtime.shared()
+            self.output = runtime.bind(runtime.output, self.module, string_constant=self.stringConstant,
+                                       formatter=self.numberFormatter(), line_buffered=self.line_buffered)
+        return self.output
+
+    def numberFormatter(self):
+        if self.formatter is None:
+            runtime = Runtime.shared()
+            self.formatter = runtime.bind(runtime.formatter, self.module)
+        return self.formatter
+
+    def inputReader(self):
+        if self.reader is None:
+            runtime = Runtime.shared()
+            self.reader = runtime.bind(runtime.reader, self.module)
+        return self.reader
+
+    def isFusedInput(self, node):
+        """ input().toInteger() and input().toDouble() """
+        return isinstance(node, MethodCall) and node.name in ('toInteger', 'toDouble') \
+            and isinstance(node.receiver, FunctionCall) and node.receiver.name == 'input'
+
+    def isFusedPrint(self, node):
+        """ print() of a concatenation that is left to runtime """
+        return isinstance(node, FunctionCall) and node.name == 'print' and len(node.args) == 1 \
+            and isinstance(node.args[0].value, StringCat) and node.args[0].value.evaluated is None
+
+    def stringArena(self):
+        if self.string_arena is None:
+            runtime = Runtime.shared()
+            self.string_arena = runtime.bind(runtime.arena, self.module)
+        return self.string_arena
+
+    def linkRuntime(self, llvm_module):
+        """ Links the runtime into the parsed module if the program calls into it """
+        if any(part is not None for part in (self.string_arena, self.output, self.formatter, self.reader)):
+            Runtime.shared().link(llvm_module)
+
+    def enterRegion(self, *nodes, always=False):
+        """ Starts a region at the current position. It only gets a mark if something in it allocates strings """
+        mark = None
+        if always or any(self.allocatesStrings(node) for node in nodes):
+            mark = self.stringArena().mark(self.builder)
+        region = Region(mark)
+        self.regions.append(region)
+        self.ownPromoted(region, *nodes)
+        return region
+
+    def resetRegion(self, region):
+        if region.mark is not None:
+            self.stringArena().reset(self.builder, region.mark)
+
+    def ownPromoted(self, region, *nodes):
+        """ Gives every promotable variable declared in the region a slot for the promoted string it owns, null for now """
+        for symbol in self.declaredIn(*nodes):
+            if id(symbol) in self.promotable:
+                slot = self.entryAlloca(ir.PointerType(ir.IntType(8)), name=f"{symbol.mangled_name or symbol.name}.owned")
+                self.builder.store(ir.Constant(ir.PointerType(ir.IntType(8)), None), slot)
+                self.owner_slots[id(symbol)] = slot
+                region.owners.append(slot)
+
+    def freePromoted(self, *regions):
+        """ Frees the promoted strings the variables of the regions own, they go out of scope here """
+        for region in regions:
+            for slot in region.owners:
+                self.stringArena().discard(self.builder, self.builder.load(slot))
+                self.builder.store(ir.Constant(ir.PointerType(ir.IntType(8)), None), slot)
+
+    def unaliased(self, node, value):
+        """
+        A scratch copy of the string when it is read straight out of a promotable variable, whose promoted
+        string is freed as soon as that variable is assigned in a loop again
+        """
+        if self.readsPromotable(node):
+            return self.stringArena().copy(self.builder, value)
+        return value
+
+    def readsPromotable(self, node):
+        return isinstance(node, VariableReference) and id(node.symbol) in self.promotable
+
+    def allocatesStrings(self, node):
+        fused = set()
+        for child in walk(node):
+            if self.isFusedPrint(child):
+                fused.add(id(child.args[0].value))
+            if isinstance(child, StringCat) and child.evaluated is None and id(child) not in fused:
+                return True
+            if self.isFusedInput(child):
+                fused.add(id(child.receiver))
+            if isinstance(child, (VariableDeclaration, VariableUpdated)) and self.readsPromotable(child.value):
+                return True     # copied out of the variable, see unaliased()
+            if isinstance(child, FunctionCall) and child.tail is not None and \
+                    any(self.readsPromotable(arg.value) for arg in child.args):
+                return True
+            if isinstance(child, FunctionCall):
+                if child.name == 'input' and id(child) not in fused:
+                    return True
+                func = self.module.globals.get(child.name)
+                if isinstance(func, ir.Function) and func.function_type.return_type == ir.PointerType(ir.IntType(8)):
+                    return True
+        return False
+
+    def escapes(self, symbol):
+        """ Whether a string stored into the variable has to outlive a region that is reset before the variable dies """
+        region = self.symbol_regions.get(id(symbol))
+        for index, enclosing in enumerate(self.regions):
+            if enclosing is region:
+                return any(inner.mark is not None for inner in self.regions[index + 1:])
+        return True     # declared outside of this function, there is no telling how long it lives
 
 # --------------------------- Builtin functions--------------------------- #
     def print_builtin(self, node):
-        expr_value = node.args[0].value.accept(self)
-        expr_type = node.args[0].value.evaluateType()
-
-        if expr_value.type == ir.IntType(64):
-            format_str_name = "print_fmt_int"
-        elif expr_value.type == ir.DoubleType():
-            format_str_name = "print_fmt_double"
-        elif expr_value.type == ir.IntType(1):
-            format_str_name = "print_fmt_bool"
-        elif isinstance(expr_value.type, ir.PointerType) and (expr_value.type.pointee == ir.IntType(8) or expr_value.type.pointee == ir.ArrayType(ir.IntType(8), 8192)):
-            format_str_name = "print_fmt_str"
-        else:
-            raise Exception(f"Unsupported expression type: {expr_type}")
-
-        self.declareGlobal('printf')
-        fmt_ptr = self.builder.bitcast(self.module.get_global(format_str_name), ir.PointerType(ir.IntType(8)))
-        printf = self.module.get_global('printf')
-
-        if expr_type in ['integer', 'double']:
-            self.builder.call(printf, [fmt_ptr, expr_value])
-        elif expr_type == 'string':
-            expr_value = self.builder.bitcast(expr_value, ir.PointerType(ir.IntType(8)))
-            self.builder.call(printf, [fmt_ptr, expr_value])
-        elif expr_type == 'boolean':
-            # Runtime mapping of 1 to "true" and 0 to "false"
-            true_str = self.module.get_global("true_str")
-            false_str = self.module.get_global("false_str")
-
-            if_true_block = self.builder.append_basic_block(name="if_true_branch")
-            if_false_block = self.builder.append_basic_block(name="if_false_branch")
-            merge_block = self.builder.append_basic_block(name="if_merge")
-
-            self.builder.cbranch(expr_value, if_true_block, if_false_block)
-
-            self.builder.position_at_end(if_true_block)
-            self.builder.call(printf, [fmt_ptr, self.builder.bitcast(true_str, ir.PointerType(ir.IntType(8)))])  
-            self.builder.branch(merge_block)  
+        argument = node.args[0].value
+        if isinstance(argument, StringCat) and argument.evaluated is not None:
+            argument = argument.evaluated
+        output = self.outputBuffer()
+
+        # a literal goes out with its newline in one piece
+        if isinstance(argument, String):
+            output.line(self.builder, argument.value + "\n")
+            return
 
-            self.builder.position_at_end(if_false_block)
-            self.builder.call(printf, [fmt_ptr, self.builder.bitcast(false_str, ir.PointerType(ir.IntType(8)))])  
+        if self.isFusedPrint(node):
+            self.print_pieces(argument)
+            return
 
-            self.builder.branch(merge_block)  
+        self.printValue(argument.accept(self))
+
+    def printValue(self, value):
+        """ Prints a generated value and a newline """
+        output = self.outputBuffer()
+        if value.type == ir.IntType(64):
+            output.integer(self.builder, value)
+        elif value.type == ir.DoubleType():
+            output.double(self.builder, value)
+        elif value.type == ir.IntType(1):
+            output.boolean(self.builder, value)
+        elif isinstance(value.type, ir.PointerType) and value.type.pointee == ir.IntType(8):
+            output.string(self.builder, value)
+        else:
+            raise Exception(f"Unsupported expression type: {value.type}")
+        output.newline(self.builder)
+
+    def print_pieces(self, node):
+        """ print(a + b + ...) writes the pieces straight into the output, the string is never built """
+        pieces = []
+        for value in node.strings:
+            if isinstance(value, String):
+                value = value.value
+            if isinstance(value, str):
+                pieces.append(value)
+                continue
+            piece = value.accept(self)
+            if piece.type not in (ir.IntType(64), ir.DoubleType(), ir.IntType(1), ir.PointerType(ir.IntType(8))):
+                throw(CompilationError(f"An error occurred during the code generation of the string concatenation: '{str(node)}'"))
+            pieces.append(piece)
+        self.printPieces(pieces)
+
+    def printPieces(self, pieces):
+        """ Prints literal texts and generated values one after the other, then a newline """
+        merged = []
+        for piece in pieces:
+            if isinstance(piece, str) and merged and isinstance(merged[-1], str):
+                merged[-1] += piece
+            else:
+                merged.append(piece)
 
-            self.builder.position_at_end(merge_block)
+        # the newline goes out with the last literal
+        if isinstance(merged[-1], str):
+            merged[-1] += "\n"
         else:
-            raise Exception(f"Unsupported print type: {expr_type}")
+            merged.append("\n")
+        output = self.outputBuffer()
+        output.compose(self.builder, merged)
+        output.endLine(self.builder)
 
     def input_builtin(self, node):
-        self.declareGlobal('scanf')
-        c_format_str_global = self.module.get_global('format_scanf')
-        fmt_ptr = self.builder.bitcast(c_format_str_global, ir.PointerType(ir.IntType(8)))
-
-        # Input Buffer
-        input_buffer = self.module.get_global("global_input_buffer")
-        buffer_ptr = self.builder.bitcast(input_buffer, ir.PointerType(ir.IntType(8)))
-        self.resetBuffer(buffer_ptr, 8192)
+        i64 = ir.IntType(64)
+        start, length = self.inputReader().token(self.builder)
 
-        scanf = self.module.get_global('scanf')
-        self.builder.call(scanf, [fmt_ptr, buffer_ptr])
-        return buffer_ptr
+        # the token is a slice of the input buffer, the string lives in the arena
+        string = self.stringArena().alloc(self.builder, self.builder.add(length, ir.Constant(i64, 1)))
+        self.builder.call(declareLibc(self.module, 'memcpy'), [string, start, length])
+        self.builder.store(ir.Constant(ir.IntType(8), 0), self.builder.gep(string, [length]))
+        return string
 
 # -------------------------- Member methods --------------------------- #
 
     def toInteger_call(self, node, receiver_result):
-        self.declareGlobal('atoi')
-        atoi_func = self.module.globals['atoi']
+        atol_func = declareLibc(self.module, 'atol')
 
         if receiver_result.type != ir.PointerType(ir.IntType(8)):
             throw(TypeError(f"Expected string, got {receiver_result.type} in 'toInteger' call at line {node.line}"))
 
-        result = self.builder.call(atoi_func, [receiver_result])
+        result = self.builder.call(atol_func, [receiver_result])
         return result
 
     def toDouble_call(self, node, receiver_result):
-        self.declareGlobal('atof')
-        atof_func = self.module.globals['atof']
+        atof_func = declareLibc(self.module, 'atof')
         result = self.builder.call(atof_func, [receiver_result])
         return result
 
     def length_call(self, node, receiver_result):
-        self.declareGlobal('strlen')
-        strlen_func = self.module.globals['strlen']
+        strlen_func = declareLibc(self.module, 'strlen')
         strlen_result = self.builder.call(strlen_func, [receiver_result])
         truncated_result = self.builder.trunc(strlen_result, ir.IntType(64))
         return truncated_result
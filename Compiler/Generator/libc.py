@@ -0,0 +1,48 @@
+import llvmlite.ir as ir
+
+i8_ptr = ir.IntType(8).as_pointer()
+i32 = ir.IntType(32)
+i64 = ir.IntType(64)
+double = ir.DoubleType()
+
+# Every C library function the generated code calls, with its C signature and what it does to memory.
+# The attributes are what lets LLVM hoist a strlen out of a loop or reuse the result of a strcmp: a call
+# that only reads what its arguments point to can move anywhere nothing writes to them.
+#
+#   name: (return type, argument types, function attributes, attributes of each argument, attributes of the result)
+#
+# 'willreturn' can't be spelled with llvmlite, LLVM adds it to these once their signatures match C's.
+LIBC = {
+    'strlen':  (i64, [i8_ptr], ['nounwind', 'readonly', 'argmemonly'], [['nocapture']], []),
+    'strcmp':  (i32, [i8_ptr, i8_ptr], ['nounwind', 'readonly', 'argmemonly'], [['nocapture'], ['nocapture']], []),
+    'memcpy':  (i8_ptr, [i8_ptr, i8_ptr, i64], ['nounwind', 'argmemonly'], [['noalias', 'returned'], ['noalias', 'nocapture'], []], []),
+    'memmove': (i8_ptr, [i8_ptr, i8_ptr, i64], ['nounwind', 'argmemonly'], [['returned'], ['nocapture'], []], []),
+    'malloc':  (i8_ptr, [i64], ['nounwind', 'inaccessiblememonly'], [[]], ['noalias']),
+    'free':    (ir.VoidType(), [i8_ptr], ['nounwind', 'inaccessiblemem_or_argmemonly'], [['nocapture']], []),
+    'atol':    (i64, [i8_ptr], ['nounwind', 'readonly'], [['nocapture']], []),
+    'atof':    (double, [i8_ptr], ['nounwind', 'readonly'], [['nocapture']], []),
+    'strtod':  (double, [i8_ptr, i8_ptr.as_pointer()], ['nounwind'], [[], ['nocapture']], []),
+    # errno is never read, so pow depends on nothing but its arguments
+    'pow':     (double, [double, double], ['nounwind', 'readnone'], [[], []], []),
+    'sprintf': (i32, [i8_ptr, i8_ptr], ['nounwind'], [['nocapture'], ['nocapture']], []),
+    'read':    (i64, [i32, i8_ptr, i64], [], [[], ['nocapture'], []], []),
+    'write':   (i64, [i32, i8_ptr, i64], [], [[], ['nocapture'], []], []),
+}
+VAR_ARG = {'sprintf'}
+
+def declareLibc(module, name):
+    """ Declares a function of the C library in 'module' once, with the signature and attributes above """
+    function = module.globals.get(name)
+    if function is not None:
+        return function
+
+    return_type, args, attributes, arg_attributes, return_attributes = LIBC[name]
+    function = ir.Function(module, ir.FunctionType(return_type, args, var_arg=name in VAR_ARG), name=name)
+    for attribute in attributes:
+        function.attributes.add(attribute)
+    for arg, arg_attribute in zip(function.args, arg_attributes):
+        for attribute in arg_attribute:
+            arg.add_attribute(attribute)
+    for attribute in return_attributes:
+        function.return_value.add_attribute(attribute)
+    return function
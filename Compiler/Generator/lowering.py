@@ -0,0 +1,218 @@
+from Compiler.utils import *
+from Compiler.MIR import Constant, Instruction, countUsers
+import llvmlite.ir as ir
+
+# What a function may be made of to be generated from its MIR
+LOWERED_OPS = ['param', 'assign', 'binop', 'cmp', 'and', 'or', 'not', 'neg', 'cast', 'call', 'phi', 'ret', 'br', 'cbranch',
+               'print', 'concat']
+SCALAR_TYPES = ['integer', 'double', 'boolean']
+
+class MIRLowering:
+    """
+    Generates a user function from its MIR instead of its AST. The MIR is in SSA form already, so every
+    instruction becomes at most one LLVM instruction and every phi an LLVM phi: no stack slots, and nothing
+    left for mem2reg. Operators go through the same emitters the AST path uses, so both produce the same code.
+
+    Only functions the MIR models completely are lowered (see lowerable()): numbers and booleans, arithmetic,
+    comparisons, branches, calls to user functions and prints. A concatenation is only lowered as the argument
+    of a print, whose pieces go straight into the output buffer, so no string is ever built. String values,
+    input, memo tables, variables of the enclosing scope and nested functions stay with the AST path, which
+    knows about string regions. Tail calls are generated like the AST path does: a self tail call jumps back to the
+    top of the function, any other one is a 'tail' or 'musttail' call that returns straight away.
+    """
+    def __init__(self, generator, function, func):
+        self.generator = generator
+        self.function = function            # MIR function
+        self.declaration = function.node    # its FunctionDeclaration
+        self.func = func                    # ir.Function the body is generated into
+        self.builder = None
+        self.blocks = {}                    # MIR block -> LLVM block its code starts in
+        self.ends = {}                      # MIR block -> LLVM block its code ends in (a print adds blocks)
+        self.values = {}                    # MIR instruction -> LLVM value
+        self.phis = []                      # (MIR phi, LLVM phi), their incoming values are added last
+        self.tail_loop = None               # (loop block, parameter phis) self tail calls jump back to
+
+    @classmethod
+    def lowerable(cls, function):
+        declaration = function.node
+        if declaration is None or declaration.memoize:
+            return False
+        if any(isinstance(child, FunctionDeclaration) for child in walk(declaration.block)):
+            return False
+        users = countUsers(function)
+        for block in cls.reachable(function):
+            for inst in block.instructions:
+                if inst.op not in LOWERED_OPS:
+                    return False
+                if inst.op == 'concat':
+                    if users.get(inst) != 1 or not all(cls.isPiece(operand) for operand in inst.operands):
+                        return False
+                elif inst.op == 'print':
+                    if not all(cls.isPiece(operand) or cls.isConcat(operand) for operand in inst.operands):
+                        return False
+                elif inst.type not in SCALAR_TYPES + ['void']:
+                    return False
+                # a void operand is a void call being returned
+                elif any(operand.type not in SCALAR_TYPES + ['void'] for operand in inst.operands):
+                    return False
+                elif inst.op == 'call' and inst.attr in BuiltInFunctions.BUILTINS:
+                    return False
+        return True
+
+    @staticmethod
+    def isConcat(operand):
+        return isinstance(operand, Instruction) and operand.op == 'concat'
+
+    @staticmethod
+    def isPiece(operand):
+        """ A number, a boolean or a string literal, what a print can write without building a string """
+        return operand.type in SCALAR_TYPES or (isinstance(operand, Constant) and operand.type == 'string')
+
+    @classmethod
+    def reachable(cls, function):
+        """ Blocks control can reach from the entry, in reverse postorder: definitions come before their uses """
+        order = []
+        seen = {function.entry}
+        stack = [(function.entry, iter(cls.successors(function.entry)))]
+        while stack:
+            block, succs = stack[-1]
+            succ = next((succ for succ in succs if succ not in seen), None)
+            if succ is None:
+                order.append(block)
+                stack.pop()
+            else:
+                seen.add(succ)
+                stack.append((succ, iter(cls.successors(succ))))
+        return order[::-1]
+
+    @classmethod
+    def successors(cls, block):
+        """ Nothing after a tail call runs """
+        return [] if cls.endsWithTailCall(block) else block.succs
+
+    @staticmethod
+    def endsWithTailCall(block):
+        return any(inst.op == 'call' and inst.node.tail is not None for inst in block.instructions)
+
+    def lower(self):
+        previous_builder = self.generator.builder
+        blocks = self.reachable(self.function)
+        params = list(self.func.args)
+        for arg, param in zip(params, self.declaration.parameters):
+            arg.name = param.name
+
+        if self.declaration.tailRecursive:
+            # the MIR's entry becomes the loop, its parameters are phis of the arguments and of every self tail call
+            entry = self.func.append_basic_block(name="entry")
+            loop = self.func.append_basic_block(name="tail_recurse")
+            ir.IRBuilder(entry).branch(loop)
+            loop_builder = ir.IRBuilder(loop)
+            params = [loop_builder.phi(arg.type, name=arg.name) for arg in self.func.args]
+            for phi, arg in zip(params, self.func.args):
+                phi.add_incoming(arg, entry)
+            self.tail_loop = (loop, params)
+            self.blocks[blocks[0]] = loop
+        for block in self.function.blocks:
+            if block in blocks and block not in self.blocks:
+                self.blocks[block] = self.func.append_basic_block(name="entry" if block is blocks[0] else block.name)
+
+        self.builder = self.generator.builder = ir.IRBuilder(self.blocks[blocks[0]])
+        for block in blocks:
+            self.builder.position_at_end(self.blocks[block])
+            for inst in block.instructions:
+                if self.builder.block.is_terminated:
+                    break   # a tail call returned or jumped back already
+                if inst.op == 'param':
+                    self.values[inst] = params[self.function.params.index(inst)]
+                else:
+                    self.values[inst] = self.lowerInstruction(inst, block)
+            self.ends[block] = self.builder.block
+
+        for phi, llvm_phi in self.phis:
+            for operand, pred in zip(phi.operands, phi.block.preds):
+                if pred in self.ends and not self.endsWithTailCall(pred):
+                    llvm_phi.add_incoming(self.value(operand), self.ends[pred])
+
+        self.generator.builder = previous_builder
+
+    def value(self, operand):
+        if isinstance(operand, Constant) and operand.type == 'string':
+            return operand.value     # only ever a piece of a print
+        if isinstance(operand, Constant):
+            value = int(operand.value) if operand.type == 'boolean' else operand.value
+            return ir.Constant(self.generator.getIrType(operand.type), value)
+        return self.values[operand]
+
+    def lowerInstruction(self, inst, block):
+        if inst.op == 'phi':
+            # incoming values can come from blocks that are lowered later
+            phi = self.builder.phi(self.generator.getIrType(inst.type))
+            self.phis.append((inst, phi))
+            return phi
+
+        if inst.op == 'concat':
+            return None     # its print writes the pieces
+
+        operands = [self.value(operand) for operand in inst.operands]
+        if inst.op == 'assign':
+            return operands[0]
+        if inst.op == 'binop':
+            return self.generator.emitBinaryOp(inst.node, *operands)
+        if inst.op == 'cmp':
+            return self.generator.emitComparison(inst.node, *operands)
+        if inst.op in ['and', 'or']:
+            return self.generator.emitLogicalOp(inst.node, *operands)
+        if inst.op in ['not', 'neg']:
+            return self.generator.emitUnaryOp(inst.node, *operands)
+        if inst.op == 'cast':
+            return self.generator.emitTypeCast(inst.node, *operands)
+        if inst.op == 'call':
+            return self.call(inst, operands)
+        if inst.op == 'print':
+            self.print(inst.operands[0], operands[0])
+            return None
+        if inst.op == 'br':
+            self.builder.branch(self.blocks[block.succs[0]])
+        elif inst.op == 'cbranch':
+            self.builder.cbranch(operands[0], self.blocks[block.succs[0]], self.blocks[block.succs[1]])
+        elif inst.op == 'ret':
+            self.ret(inst, operands)
+        return None
+
+    def call(self, inst, args):
+        callee = self.generator.module.get_global(inst.attr)
+        tail = inst.node.tail
+        if tail is None:
+            return self.builder.call(callee, args)
+
+        if self.tail_loop is not None and inst.attr == self.declaration.name:
+            loop, params = self.tail_loop
+            for value, phi in zip(args, params):
+                phi.add_incoming(value, self.builder.block)
+            self.builder.branch(loop)
+            return None
+
+        marker = 'musttail' if self.func.function_type == callee.function_type else 'tail'
+        result = self.builder.call(callee, args, tail=marker)
+        if tail == 'void':
+            self.builder.ret_void()
+        else:
+            self.builder.ret(result)
+        return result
+
+    def print(self, operand, value):
+        if isinstance(operand, Constant) and operand.type == 'string':
+            # a literal goes out with its newline in one piece
+            self.generator.outputBuffer().line(self.builder, value + "\n")
+        elif self.isConcat(operand):
+            self.generator.printPieces([self.value(piece) for piece in operand.operands])
+        else:
+            self.generator.printValue(value)
+
+    def ret(self, inst, operands):
+        if operands and operands[0].type != ir.VoidType():
+            self.builder.ret(operands[0])
+        elif self.func.function_type.return_type == ir.VoidType():
+            self.builder.ret_void()
+        else:
+            throw(ReturnError(f"The function '{self.declaration.name}' expects a return type of '{self.declaration.return_type}'. Please ensure the function is properly terminated. "))
@@ -0,0 +1,110 @@
+import llvmlite.ir as ir
+
+class MemoTable:
+    """
+    Emits a native memo table in front of a function. The table is a fixed size open addressing hash
+    table stored in a zero initialized global:
+
+        [SIZE x { i1 used, [arity x i64] keys, <return type> result }]
+
+    Arguments are turned into i64 keys (doubles by their bits) and hashed to a home slot. Lookups probe
+    PROBES slots after it; on a miss the result goes into the first free slot, or evicts the home slot
+    when all of them are taken.
+
+    The function is split in two: 'name' becomes the caching wrapper that every caller uses, and
+    'name.impl' holds the actual body, so recursive calls inside the body also go through the table.
+    """
+    SIZE = 4096     # must be a power of two
+    PROBES = 4
+
+    def __init__(self, module, name, func_type):
+        self.module = module
+        self.name = name
+        self.func_type = func_type
+        self.arity = len(func_type.args)
+
+        self.wrapper = ir.Function(module, func_type, name=name)
+        self.impl = ir.Function(module, func_type, name=f"{name}.impl")
+        for function in (self.wrapper, self.impl):
+            function.linkage = 'internal'
+            function.calling_convention = 'fastcc'
+
+        self.entry_type = ir.LiteralStructType([
+            ir.IntType(1),
+            ir.ArrayType(ir.IntType(64), self.arity),
+            func_type.return_type,
+        ])
+        self.table = ir.GlobalVariable(module, ir.ArrayType(self.entry_type, self.SIZE), name=f"{name}.memo")
+        self.table.linkage = 'internal'
+        self.table.initializer = ir.Constant(self.table.type.pointee, None)
+
+    def emit(self):
+        """ Fills in the body of the wrapper. The body of impl is generated like any other function """
+        i64 = ir.IntType(64)
+        i32 = ir.IntType(32)
+        zero = ir.Constant(i32, 0)
+        builder = ir.IRBuilder(self.wrapper.append_basic_block(name="entry"))
+
+        keys = [self.toKey(builder, arg) for arg in self.wrapper.args]
+        home = builder.and_(self.hash(builder, keys), ir.Constant(i64, self.SIZE - 1), name="home")
+
+        store_block = self.wrapper.append_basic_block(name="store")
+        hit_block = self.wrapper.append_basic_block(name="hit")
+        with builder.goto_block(store_block):
+            slot_phi = builder.phi(self.entry_type.as_pointer(), name="slot")
+        with builder.goto_block(hit_block):
+            hit_phi = builder.phi(self.entry_type.as_pointer(), name="found")
+
+        for probe in range(self.PROBES):
+            index = builder.and_(builder.add(home, ir.Constant(i64, probe)), ir.Constant(i64, self.SIZE - 1))
+            slot = builder.gep(self.table, [zero, index], inbounds=True)
+            used = builder.load(builder.gep(slot, [zero, zero], inbounds=True), name="used")
+
+            check_block = self.wrapper.append_basic_block(name=f"check{probe}")
+            slot_phi.add_incoming(slot, builder.block)
+            builder.cbranch(used, check_block, store_block)
+
+            builder.position_at_end(check_block)
+            matches = ir.Constant(ir.IntType(1), 1)
+            for position, key in enumerate(keys):
+                stored = builder.load(builder.gep(slot, [zero, ir.Constant(i32, 1), ir.Constant(i32, position)], inbounds=True))
+                matches = builder.and_(matches, builder.icmp_unsigned('==', stored, key))
+            next_block = self.wrapper.append_basic_block(name=f"probe{probe + 1}")
+            hit_phi.add_incoming(slot, builder.block)
+            builder.cbranch(matches, hit_block, next_block)
+            builder.position_at_end(next_block)
+
+        # every probed slot is taken by other arguments, evict the home slot
+        slot_phi.add_incoming(builder.gep(self.table, [zero, home], inbounds=True), builder.block)
+        builder.branch(store_block)
+
+        builder.position_at_end(hit_block)
+        builder.ret(builder.load(builder.gep(hit_phi, [zero, ir.Constant(i32, 2)], inbounds=True)))
+
+        builder.position_at_end(store_block)
+        result = builder.call(self.impl, self.wrapper.args)
+        # the slot is only filled in after the call, so recursive calls that land on it just overwrite it
+        builder.store(ir.Constant(ir.IntType(1), 1), builder.gep(slot_phi, [zero, zero], inbounds=True))
+        for position, key in enumerate(keys):
+            builder.store(key, builder.gep(slot_phi, [zero, ir.Constant(i32, 1), ir.Constant(i32, position)], inbounds=True))
+        builder.store(result, builder.gep(slot_phi, [zero, ir.Constant(i32, 2)], inbounds=True))
+        builder.ret(result)
+
+    # ------------ Helpers ----------------- #
+
+    def toKey(self, builder, arg):
+        if isinstance(arg.type, ir.DoubleType):
+            return builder.bitcast(arg, ir.IntType(64))
+        if arg.type.width < 64:
+            return builder.zext(arg, ir.IntType(64))
+        return arg
+
+    def hash(self, builder, keys):
+        """ FNV style mix of every key followed by a final xor shift so the low bits depend on all of them """
+        i64 = ir.IntType(64)
+        h = ir.Constant(i64, 0xcbf29ce484222325 - (1 << 64))
+        for key in keys:
+            h = builder.mul(builder.xor(h, key), ir.Constant(i64, 0x100000001b3))
+        h = builder.xor(h, builder.lshr(h, ir.Constant(i64, 29)))
+        h = builder.mul(h, ir.Constant(i64, 0xbf58476d1ce4e5b9 - (1 << 64)))
+        return builder.xor(h, builder.lshr(h, ir.Constant(i64, 32)), name="hash")
@@ -0,0 +1,231 @@
+import llvmlite.ir as ir
+from .libc import declareLibc
+
+# Longest text '%lld' and '%f' produce: "-9223372036854775808" and "-" + 309 digits + "." + 6 digits
+MAX_INT_LENGTH = 20
+MAX_DOUBLE_LENGTH = 317
+
+class NumberFormatter:
+    """
+    Emits the routines numbers are turned into text with, replacing sprintf("%lld") and sprintf("%f").
+    Both write the text at 'dst' without a null terminator and return its length.
+
+    Integers are written two digits at a time from a table of the pairs "00" to "99".
+
+    Doubles print exactly like '%f': six decimals, rounded half to even on the exact binary value.
+    A finite double below 2^63 is split into its integer part and the fraction, both exact in 64 and
+    128 bit integers, so no floating point rounding is involved. Anything else (huge numbers, inf and
+    nan) still goes through sprintf.
+    """
+    def __init__(self, module, string_constant):
+        self.module = module
+        self.string_constant = string_constant
+        self.i8 = ir.IntType(8)
+        self.i8_ptr = self.i8.as_pointer()
+        self.i16 = ir.IntType(16)
+        self.i32 = ir.IntType(32)
+        self.i64 = ir.IntType(64)
+        self.i128 = ir.IntType(128)
+
+        pairs = bytearray("".join(f"{n:02}" for n in range(100)).encode("ascii"))
+        self.pairs = self.declareConstant("glitchy.digit_pairs", ir.ArrayType(self.i8, 200), pairs)
+        powers = [self.unsigned(10 ** n) for n in range(20)]
+        self.powers = self.declareConstant("glitchy.powers_of_ten", ir.ArrayType(self.i64, 20), powers)
+        self.sprintf = declareLibc(self.module, "sprintf")
+
+        self.integer_fn = self.emitInteger()
+        self.double_fn = self.emitDouble()
+
+    # ------------ Used by the generator ----------------- #
+
+    def integer(self, builder, dst, value):
+        """ Writes '%lld' of 'value' at 'dst' (at most 20 bytes), returns the length """
+        return builder.call(self.integer_fn, [dst, value])
+
+    def double(self, builder, dst, value):
+        """ Writes '%f' of 'value' at 'dst' (at most 317 bytes, plus a null terminator for sprintf), returns the length """
+        return builder.call(self.double_fn, [dst, value])
+
+    # ------------ Runtime ----------------- #
+
+    def unsigned(self, value):
+        """ llvmlite wants i64 constants in the signed range """
+        return value - (1 << 64) if value >= 1 << 63 else value
+
+    def declareConstant(self, name, type_, value):
+        constant = ir.GlobalVariable(self.module, type_, name=name)
+        constant.linkage = 'private'
+        constant.unnamed_addr = True
+        constant.global_constant = True
+        constant.initializer = ir.Constant(type_, value)
+        return constant
+
+    def newFunction(self, name, return_type, args):
+        function = ir.Function(self.module, ir.FunctionType(return_type, args), name=name)
+        function.linkage = 'internal'
+        return function, ir.IRBuilder(function.append_basic_block(name="entry"))
+
+    def storePair(self, builder, dst, pair):
+        """ Copies the two digits of 'pair' (0 to 99) to 'dst' """
+        zero = ir.Constant(self.i32, 0)
+        source = builder.gep(self.pairs, [zero, builder.add(pair, pair)], inbounds=True)
+        digits = builder.load(builder.bitcast(source, self.i16.as_pointer()), align=1)
+        builder.store(digits, builder.bitcast(dst, self.i16.as_pointer()), align=1)
+
+    def emitInteger(self):
+        function, builder = self.newFunction("glitchy.format.int", self.i64, [self.i8_ptr, self.i64])
+        dst, value = function.args
+        zero = ir.Constant(self.i64, 0)
+        one = ir.Constant(self.i64, 1)
+        ten = ir.Constant(self.i64, 10)
+        hundred = ir.Constant(self.i64, 100)
+
+        # the magnitude is unsigned, so the most negative number works too. The '-' is always written,
+        # the digits cover it up when the number isn't negative
+        negative = builder.icmp_signed('<', value, zero)
+        magnitude = builder.select(negative, builder.sub(zero, value), value, name="magnitude")
+        builder.store(ir.Constant(self.i8, ord('-')), dst)
+        start = builder.gep(dst, [builder.zext(negative, self.i64)], name="start")
+        entry_block = builder.block
+
+        count_block = function.append_basic_block(name="count")
+        more_block = function.append_basic_block(name="more")
+        write_block = function.append_basic_block(name="write")
+        pair_block = function.append_basic_block(name="pair")
+        last_block = function.append_basic_block(name="last")
+        last_pair_block = function.append_basic_block(name="last_pair")
+        last_digit_block = function.append_basic_block(name="last_digit")
+        builder.branch(count_block)
+
+        # number of digits: the first power of ten the magnitude is below
+        builder.position_at_end(count_block)
+        digits = builder.phi(self.i64, name="digits")
+        digits.add_incoming(one, entry_block)
+        in_table = builder.icmp_unsigned('<', digits, ir.Constant(self.i64, 20))
+        builder.cbranch(in_table, more_block, write_block)
+
+        builder.position_at_end(more_block)
+        power = builder.load(builder.gep(self.powers, [ir.Constant(self.i32, 0), digits], inbounds=True))
+        digits.add_incoming(builder.add(digits, one), more_block)
+        builder.cbranch(builder.icmp_unsigned('>=', magnitude, power), count_block, write_block)
+
+        # then the digits from the back, two at a time
+        builder.position_at_end(write_block)
+        length = builder.phi(self.i64, name="length")
+        length.add_incoming(digits, count_block)
+        length.add_incoming(digits, more_block)
+        end = builder.gep(start, [length], name="end")
+        builder.branch(pair_block)
+
+        builder.position_at_end(pair_block)
+        rest = builder.phi(self.i64, name="rest")
+        cursor = builder.phi(self.i8_ptr, name="cursor")
+        rest.add_incoming(magnitude, write_block)
+        cursor.add_incoming(end, write_block)
+        loop_block = function.append_basic_block(name="loop")
+        builder.cbranch(builder.icmp_unsigned('>=', rest, hundred), loop_block, last_block)
+
+        builder.position_at_end(loop_block)
+        quotient = builder.udiv(rest, hundred)
+        pair_cursor = builder.gep(cursor, [ir.Constant(self.i64, -2)])
+        self.storePair(builder, pair_cursor, builder.sub(rest, builder.mul(quotient, hundred)))
+        rest.add_incoming(quotient, loop_block)
+        cursor.add_incoming(pair_cursor, loop_block)
+        builder.branch(pair_block)
+
+        builder.position_at_end(last_block)
+        builder.cbranch(builder.icmp_unsigned('>=', rest, ten), last_pair_block, last_digit_block)
+
+        builder.position_at_end(last_pair_block)
+        self.storePair(builder, start, rest)
+        builder.ret(builder.add(length, builder.zext(negative, self.i64)))
+
+        builder.position_at_end(last_digit_block)
+        builder.store(builder.add(builder.trunc(rest, self.i8), ir.Constant(self.i8, ord('0'))), start)
+        builder.ret(builder.add(length, builder.zext(negative, self.i64)))
+        return function
+
+    def emitDouble(self):
+        function, builder = self.newFunction("glitchy.format.double", self.i64, [self.i8_ptr, ir.DoubleType()])
+        dst, value = function.args
+        zero = ir.Constant(self.i64, 0)
+        one = ir.Constant(self.i64, 1)
+        million = ir.Constant(self.i64, 10 ** 6)
+
+        # value = sign * mantissa * 2^exponent
+        bits = builder.bitcast(value, self.i64)
+        negative = builder.icmp_signed('<', bits, zero)
+        biased = builder.and_(builder.lshr(bits, ir.Constant(self.i64, 52)), ir.Constant(self.i64, 0x7ff), name="biased")
+        fraction_bits = builder.and_(bits, ir.Constant(self.i64, (1 << 52) - 1))
+        subnormal = builder.icmp_unsigned('==', biased, zero)
+        mantissa = builder.select(subnormal, fraction_bits, builder.or_(fraction_bits, ir.Constant(self.i64, 1 << 52)), name="mantissa")
+        exponent = builder.sub(builder.select(subnormal, one, biased), ir.Constant(self.i64, 1075), name="exponent")
+
+        fast_block = function.append_basic_block(name="fast")
+        slow_block = function.append_basic_block(name="slow")
+        whole_block = function.append_basic_block(name="whole")
+        fraction_block = function.append_basic_block(name="fraction")
+        digits_block = function.append_basic_block(name="digits")
+        # below 2^63 the integer part fits an i64, that also rules out inf and nan
+        builder.cbranch(builder.icmp_unsigned('<', biased, ir.Constant(self.i64, 1023 + 63)), fast_block, slow_block)
+
+        builder.position_at_end(slow_block)
+        written = builder.call(self.sprintf, [dst, self.string_constant("%f"), value])
+        builder.ret(builder.sext(written, self.i64))
+
+        builder.position_at_end(fast_block)
+        builder.cbranch(builder.icmp_signed('>=', exponent, zero), whole_block, fraction_block)
+
+        # no bits below the point
+        builder.position_at_end(whole_block)
+        whole = builder.shl(mantissa, exponent)
+        builder.branch(digits_block)
+
+        # 'shift' bits below the point: the integer part is what is above them, and the six decimals
+        # are the rest times 10^6, divided by 2^shift and rounded half to even
+        builder.position_at_end(fraction_block)
+        shift = builder.sub(zero, exponent, name="shift")
+        small = builder.icmp_unsigned('<', shift, ir.Constant(self.i64, 64))
+        clamped = builder.select(small, shift, zero)
+        integer_part = builder.select(small, builder.lshr(mantissa, clamped), zero)
+        below = builder.select(small, builder.and_(mantissa, builder.sub(builder.shl(one, clamped), one)), mantissa)
+
+        # 'below' * 10^6 is under 2^73, from 75 bits down it is less than half and rounds to 0
+        near = builder.icmp_unsigned('<', shift, ir.Constant(self.i64, 75))
+        wide_shift = builder.zext(builder.select(near, shift, one), self.i128)
+        wide_one = ir.Constant(self.i128, 1)
+        scaled = builder.mul(builder.zext(below, self.i128), ir.Constant(self.i128, 10 ** 6))
+        quotient = builder.lshr(scaled, wide_shift)
+        remainder = builder.and_(scaled, builder.sub(builder.shl(wide_one, wide_shift), wide_one))
+        half = builder.shl(wide_one, builder.sub(wide_shift, wide_one))
+        odd = builder.trunc(quotient, ir.IntType(1))
+        round_up = builder.or_(builder.icmp_unsigned('>', remainder, half),
+                               builder.and_(builder.icmp_unsigned('==', remainder, half), odd))
+        rounded = builder.trunc(builder.add(quotient, builder.zext(round_up, self.i128)), self.i64)
+        decimals = builder.select(near, rounded, zero)
+        builder.branch(digits_block)
+
+        builder.position_at_end(digits_block)
+        integer = builder.phi(self.i64, name="integer")
+        integer.add_incoming(whole, whole_block)
+        integer.add_incoming(integer_part, fraction_block)
+        fraction = builder.phi(self.i64, name="decimals")
+        fraction.add_incoming(zero, whole_block)
+        fraction.add_incoming(decimals, fraction_block)
+        # .9999995 and up round into the integer part
+        carry = builder.icmp_unsigned('==', fraction, million)
+        integer = builder.add(integer, builder.zext(carry, self.i64))
+        fraction = builder.select(carry, zero, fraction)
+
+        # '-' even when the value rounds to zero, '%f' prints "-0.000000" too
+        builder.store(ir.Constant(self.i8, ord('-')), dst)
+        sign = builder.zext(negative, self.i64)
+        length = builder.call(self.integer_fn, [builder.gep(dst, [sign]), integer])
+        point = builder.gep(dst, [builder.add(sign, length)])
+        builder.store(ir.Constant(self.i8, ord('.')), point)
+        hundred = ir.Constant(self.i64, 100)
+        for index, divisor in enumerate([10 ** 4, 100, 1]):
+            pair = builder.urem(builder.udiv(fraction, ir.Constant(self.i64, divisor)), hundred)
+            self.storePair(builder, builder.gep(point, [ir.Constant(self.i64, 1 + 2 * index)]), pair)
+        builder.ret(builder.add(builder.add(sign, length), ir.Constant(self.i64, 7)))
+        return function
@@ -0,0 +1,261 @@
+import llvmlite.ir as ir
+from .libc import declareLibc
+from .numbers import MAX_INT_LENGTH, MAX_DOUBLE_LENGTH
+
+class OutputBuffer:
+    """
+    Emits the runtime every print goes through: text is appended to one buffer, which is handed to
+    write(1, ...) in bulk instead of going through stdio on every call.
+
+        glitchy.out     = [SIZE x i8]
+        glitchy.out.len = i64 bytes of it in use
+
+    The buffer is flushed when the next piece doesn't fit, before input() reads (so prompts show up) and
+    when main returns. With 'line_buffered' set it is also flushed after every line, for interactive use.
+    Text longer than the buffer is written straight through.
+
+    Numbers are formatted in place, right at the end of the buffer (see NumberFormatter). Room for a
+    double includes the null terminator sprintf writes after the digits.
+    """
+    SIZE = 1 << 16
+
+    def __init__(self, module, string_constant, formatter, line_buffered=False):
+        self.module = module
+        self.string_constant = string_constant     # the generator's pool of private string constants
+        self.line_buffered = line_buffered
+        self.formatter = formatter
+        self.i8_ptr = ir.IntType(8).as_pointer()
+        self.i64 = ir.IntType(64)
+        self.i32 = ir.IntType(32)
+
+        buffer_type = ir.ArrayType(ir.IntType(8), self.SIZE)
+        self.buffer = self.declareGlobal("glitchy.out", buffer_type)
+        self.length = self.declareGlobal("glitchy.out.len", self.i64)
+        self.write_fn = declareLibc(self.module, "write")
+        self.memcpy = declareLibc(self.module, "memcpy")
+        self.strlen = declareLibc(self.module, "strlen")
+
+        self.write_all_fn = self.emitWriteAll()
+        self.flush_fn = self.emitFlush()
+        self.reserve_fn = self.emitReserve()
+        self.append_fn = self.emitAppend()
+        self.string_fn = self.emitString()
+        self.integer_fn = self.emitNumber("glitchy.print.int", self.i64, formatter.integer, MAX_INT_LENGTH)
+        self.double_fn = self.emitNumber("glitchy.print.double", ir.DoubleType(), formatter.double, MAX_DOUBLE_LENGTH + 1)
+
+    # ------------ Used by the generator ----------------- #
+
+    def write(self, builder, data, size):
+        """ Appends 'size' bytes """
+        builder.call(self.append_fn, [data, size])
+
+    def string(self, builder, string):
+        """ Appends a null terminated string """
+        builder.call(self.string_fn, [string])
+
+    def integer(self, builder, value):
+        builder.call(self.integer_fn, [value])
+
+    def double(self, builder, value):
+        builder.call(self.double_fn, [value])
+
+    def boolean(self, builder, value):
+        text = builder.select(value, self.string_constant("true"), self.string_constant("false"))
+        size = builder.select(value, ir.Constant(self.i64, 4), ir.Constant(self.i64, 5))
+        self.write(builder, text, size)
+
+    def text(self, builder, text):
+        """ Appends text known at compile time """
+        size = ir.Constant(self.i64, len(text.encode("utf8")))
+        self.write(builder, self.string_constant(text), size)
+
+    def line(self, builder, text):
+        """ Appends a whole line known at compile time, 'text' ends in a newline """
+        self.text(builder, text)
+        self.endLine(builder)
+
+    def compose(self, builder, pieces):
+        """
+        Appends 'pieces' one after another, each text known at compile time (a str) or an integer, double,
+        boolean or string value. Room for all of them is reserved at once and they are written straight
+        into it. Only when that is more than the buffer holds (long strings) are they appended one by one.
+        """
+        sizes = []
+        for piece in pieces:
+            if isinstance(piece, str):
+                size = ir.Constant(self.i64, len(piece.encode("utf8")))
+            elif piece.type == self.i64:
+                size = ir.Constant(self.i64, MAX_INT_LENGTH)
+            elif piece.type == ir.DoubleType():
+                size = ir.Constant(self.i64, MAX_DOUBLE_LENGTH + 1)
+            elif piece.type == ir.IntType(1):
+                size = builder.select(piece, ir.Constant(self.i64, 4), ir.Constant(self.i64, 5))
+            else:
+                size = builder.call(self.strlen, [piece])
+            sizes.append(size)
+
+        total = ir.Constant(self.i64, sum(size.constant for size in sizes if isinstance(size, ir.Constant)))
+        for size in sizes:
+            if not isinstance(size, ir.Constant):
+                total = builder.add(total, size)
+        if isinstance(total, ir.Constant) and total.constant > self.SIZE:
+            self.appendEach(builder, pieces, sizes)
+            return
+
+        function = builder.function
+        compose_block = function.append_basic_block(name="compose")
+        each_block = function.append_basic_block(name="append_each")
+        after_block = function.append_basic_block(name="after_compose")
+        fits = builder.icmp_unsigned('<=', total, ir.Constant(self.i64, self.SIZE))
+        builder.cbranch(fits, compose_block, each_block)
+
+        builder.position_at_end(compose_block)
+        start = builder.call(self.reserve_fn, [total])
+        written = ir.Constant(self.i64, 0)
+        for piece, size in zip(pieces, sizes):
+            cursor = builder.gep(start, [written])
+            if isinstance(piece, str):
+                builder.call(self.memcpy, [cursor, self.string_constant(piece), size])
+            elif piece.type == self.i64:
+                size = self.formatter.integer(builder, cursor, piece)
+            elif piece.type == ir.DoubleType():
+                size = self.formatter.double(builder, cursor, piece)
+            elif piece.type == ir.IntType(1):
+                text = builder.select(piece, self.string_constant("true"), self.string_constant("false"))
+                builder.call(self.memcpy, [cursor, text, size])
+            else:
+                builder.call(self.memcpy, [cursor, piece, size])
+            written = builder.add(written, size)
+        builder.store(builder.add(builder.load(self.length), written), self.length)
+        builder.branch(after_block)
+
+        builder.position_at_end(each_block)
+        self.appendEach(builder, pieces, sizes)
+        builder.branch(after_block)
+        builder.position_at_end(after_block)
+
+    def newline(self, builder):
+        self.line(builder, "\n")
+
+    def endLine(self, builder):
+        if self.line_buffered:
+            self.flush(builder)
+
+    def flush(self, builder):
+        builder.call(self.flush_fn, [])
+
+    # ------------ Runtime ----------------- #
+
+    def declareGlobal(self, name, type_):
+        variable = ir.GlobalVariable(self.module, type_, name=name)
+        variable.linkage = 'internal'
+        variable.initializer = ir.Constant(type_, None)
+        return variable
+
+    def newFunction(self, name, return_type, args):
+        function = ir.Function(self.module, ir.FunctionType(return_type, args), name=name)
+        function.linkage = 'internal'
+        return function, ir.IRBuilder(function.append_basic_block(name="entry"))
+
+    def start(self, builder):
+        """ Pointer to the first byte of the buffer """
+        zero = ir.Constant(self.i32, 0)
+        return builder.gep(self.buffer, [zero, zero], inbounds=True)
+
+    def appendEach(self, builder, pieces, sizes):
+        for piece, size in zip(pieces, sizes):
+            if isinstance(piece, str):
+                self.write(builder, self.string_constant(piece), size)
+            elif piece.type == self.i64:
+                self.integer(builder, piece)
+            elif piece.type == ir.DoubleType():
+                self.double(builder, piece)
+            elif piece.type == ir.IntType(1):
+                self.boolean(builder, piece)
+            else:
+                self.write(builder, piece, size)
+
+    def emitWriteAll(self):
+        # write() may take less than it was given, and gives up for good when it returns 0 or an error
+        function, builder = self.newFunction("glitchy.write", ir.VoidType(), [self.i8_ptr, self.i64])
+        data, size = function.args
+        loop_block = function.append_basic_block(name="loop")
+        body_block = function.append_basic_block(name="body")
+        done_block = function.append_basic_block(name="done")
+        entry_block = builder.block
+        builder.branch(loop_block)
+
+        builder.position_at_end(loop_block)
+        offset = builder.phi(self.i64, name="offset")
+        offset.add_incoming(ir.Constant(self.i64, 0), entry_block)
+        builder.cbranch(builder.icmp_signed('<', offset, size), body_block, done_block)
+
+        builder.position_at_end(body_block)
+        written = builder.call(self.write_fn, [ir.Constant(self.i32, 1), builder.gep(data, [offset]), builder.sub(size, offset)])
+        next_offset = builder.add(offset, written)
+        offset.add_incoming(next_offset, body_block)
+        builder.cbranch(builder.icmp_signed('>', written, ir.Constant(self.i64, 0)), loop_block, done_block)
+
+        builder.position_at_end(done_block)
+        builder.ret_void()
+        return function
+
+    def emitFlush(self):
+        function, builder = self.newFunction("glitchy.flush", ir.VoidType(), [])
+        builder.call(self.write_all_fn, [self.start(builder), builder.load(self.length)])
+        builder.store(ir.Constant(self.i64, 0), self.length)
+        builder.ret_void()
+        return function
+
+    def emitReserve(self):
+        """ Makes room for 'size' bytes (at most SIZE) and returns where they go """
+        function, builder = self.newFunction("glitchy.reserve", self.i8_ptr, [self.i64])
+        size, = function.args
+        room = builder.sub(ir.Constant(self.i64, self.SIZE), builder.load(self.length), name="room")
+        flush_block = function.append_basic_block(name="flush")
+        cursor_block = function.append_basic_block(name="cursor")
+        builder.cbranch(builder.icmp_unsigned('>', size, room), flush_block, cursor_block)
+
+        builder.position_at_end(flush_block)
+        builder.call(self.flush_fn, [])
+        builder.branch(cursor_block)
+
+        builder.position_at_end(cursor_block)
+        builder.ret(builder.gep(self.start(builder), [builder.load(self.length)]))
+        return function
+
+    def emitAppend(self):
+        function, builder = self.newFunction("glitchy.append", ir.VoidType(), [self.i8_ptr, self.i64])
+        data, size = function.args
+        copy_block = function.append_basic_block(name="copy")
+        direct_block = function.append_basic_block(name="direct")
+        builder.cbranch(builder.icmp_unsigned('<=', size, ir.Constant(self.i64, self.SIZE)), copy_block, direct_block)
+
+        builder.position_at_end(copy_block)
+        cursor = builder.call(self.reserve_fn, [size])
+        builder.call(self.memcpy, [cursor, data, size])
+        builder.store(builder.add(builder.load(self.length), size), self.length)
+        builder.ret_void()
+
+        # too big for the buffer: whatever is buffered goes first, then the text itself
+        builder.position_at_end(direct_block)
+        builder.call(self.flush_fn, [])
+        builder.call(self.write_all_fn, [data, size])
+        builder.ret_void()
+        return function
+
+    def emitString(self):
+        function, builder = self.newFunction("glitchy.print.str", ir.VoidType(), [self.i8_ptr])
+        string, = function.args
+        builder.call(self.append_fn, [string, builder.call(self.strlen, [string])])
+        builder.ret_void()
+        return function
+
+    def emitNumber(self, name, type_, format_, max_length):
+        function, builder = self.newFunction(name, ir.VoidType(), [type_])
+        value, = function.args
+        cursor = builder.call(self.reserve_fn, [ir.Constant(self.i64, max_length)])
+        written = format_(builder, cursor, value)
+        builder.store(builder.add(builder.load(self.length), written), self.length)
+        builder.ret_void()
+        return function
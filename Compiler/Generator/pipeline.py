@@ -0,0 +1,154 @@
+import time
+import llvmlite.binding as llvm
+
+# -O flags, as (opt level, size level). Like clang, -Os and -Oz are -O2 that also weighs code size
+OPT_LEVELS = {'0': (0, 0), '1': (1, 0), '2': (2, 0), '3': (3, 0), 's': (2, 1), 'z': (2, 2)}
+
+def defaultInlineThreshold(opt_level, size_level):
+    """ The threshold clang picks for an optimization level, None means no inliner at all """
+    if opt_level == 0:
+        return None
+    if opt_level > 2:
+        return 250
+    return {0: 225, 1: 75, 2: 25}[size_level]
+
+class OptimizationPipeline:
+    """
+    The LLVM passes a parsed module goes through before it is compiled to machine code. By default the
+    pass manager builder picks them for the optimization level, as clang does: the function passes run
+    over every function first, then the module passes over the whole program. Vectorizing is on from -O2
+    (except for -Oz) and the inliner uses clang's threshold for the level unless one is given.
+
+    'passes' replaces the builder's choice with an explicit list, run in that order over the module. The
+    names are those of llvmlite's add_<name>_pass methods, e.g. ['sroa', 'instruction_combining', 'gvn'];
+    'function_inlining' uses the inline threshold.
+
+    'time_passes' keeps LLVM's report of the time every pass took (timings), 'stats' counts what the module
+    holds before and after optimizing and how long each step took (print_stats).
+    """
+    def __init__(self, opt_level=3, size_level=0, inline_threshold=None, loop_vectorize=None, slp_vectorize=None,
+                 passes=None, time_passes=False, stats=False):
+        if opt_level not in range(4) or size_level not in range(3):
+            raise ValueError(f"Unknown optimization level -O{opt_level} with size level {size_level}")
+        self.opt_level = opt_level
+        self.size_level = size_level
+        self.inline_threshold = inline_threshold if inline_threshold is not None else defaultInlineThreshold(opt_level, size_level)
+        vectorize = opt_level >= 2 and size_level < 2
+        self.loop_vectorize = loop_vectorize if loop_vectorize is not None else vectorize
+        self.slp_vectorize = slp_vectorize if slp_vectorize is not None else vectorize
+
+        self.passes = None
+        if passes is not None:
+            self.passes = [name.strip().replace('-', '_') for name in passes if name.strip()]
+            unknown = [name for name in self.passes if not hasattr(llvm.ModulePassManager, f"add_{name}_pass")]
+            if unknown:
+                raise ValueError(f"Unknown LLVM pass(es): {', '.join(unknown)}")
+
+        self.time_passes = time_passes
+        self.stats = stats
+        self.timings = None
+        self.before = None
+        self.after = None
+        self.durations = []     # (step, seconds)
+
+    @classmethod
+    def fromFlag(cls, level, **options):
+        """ A pipeline for a -O flag: '0' to '3', 's' or 'z' """
+        opt_level, size_level = OPT_LEVELS[level]
+        return cls(opt_level=opt_level, size_level=size_level, **options)
+
+    def targetMachine(self):
+        """ The machine code generator for this computer, at the same level as the passes """
+        return llvm.Target.from_default_triple().create_target_machine(opt=self.opt_level)
+
+    def run(self, module, target_machine):
+        if self.stats:
+            self.before = self.count(module)
+        if self.time_passes:
+            llvm.set_time_passes(True)
+        try:
+            if self.passes is not None:
+                self.timed("module passes", lambda: self.explicitPasses(target_machine).run(module))
+            else:
+                builder = self.passManagerBuilder()
+                self.timed("function passes", lambda: self.runFunctionPasses(builder, module, target_machine))
+                module_passes = llvm.create_module_pass_manager()
+                target_machine.add_analysis_passes(module_passes)
+                builder.populate(module_passes)
+                self.timed("module passes", lambda: module_passes.run(module))
+        finally:
+            if self.time_passes:
+                self.timings = llvm.report_and_reset_timings()
+                llvm.set_time_passes(False)
+        if self.stats:
+            self.after = self.count(module)
+
+    def description(self):
+        level = {(2, 1): 's', (2, 2): 'z'}.get((self.opt_level, self.size_level), self.opt_level)
+        if self.passes is not None:
+            return f"passes: {', '.join(self.passes) or 'none'}"
+        inliner = f"inline threshold {self.inline_threshold}" if self.inline_threshold is not None else "no inliner"
+        return f"-O{level}, {inliner}, loop vectorize {'on' if self.loop_vectorize else 'off'}, " \
+               f"SLP vectorize {'on' if self.slp_vectorize else 'off'}"
+
+    def print_stats(self):
+        print(f"  {self.description()}")
+        if self.before is not None and self.after is not None:
+            print(f"  {'':<16}{'before':>10}{'after':>10}")
+            for key in self.before:
+                print(f"  {key:<16}{self.before[key]:>10}{self.after[key]:>10}")
+        for step, seconds in self.durations:
+            print(f"  {step:<16}{seconds * 1000:>9.1f}ms")
+
+    # ------------ Helpers ----------------- #
+
+    def passManagerBuilder(self):
+        builder = llvm.create_pass_manager_builder()
+        builder.opt_level = self.opt_level
+        builder.size_level = self.size_level
+        if self.inline_threshold is not None:
+            builder.inlining_threshold = self.inline_threshold
+        builder.loop_vectorize = self.loop_vectorize
+        builder.slp_vectorize = self.slp_vectorize
+        return builder
+
+    def runFunctionPasses(self, builder, module, target_machine):
+        function_passes = llvm.create_function_pass_manager(module)
+        target_machine.add_analysis_passes(function_passes)
+        builder.populate(function_passes)
+        function_passes.initialize()
+        for function in module.functions:
+            if not function.is_declaration:
+                function_passes.run(function)
+        function_passes.finalize()
+
+    def explicitPasses(self, target_machine):
+        pass_manager = llvm.create_module_pass_manager()
+        target_machine.add_analysis_passes(pass_manager)
+        for name in self.passes:
+            add = getattr(pass_manager, f"add_{name}_pass")
+            if name == 'function_inlining':
+                add(self.inline_threshold if self.inline_threshold is not None else defaultInlineThreshold(3, 0))
+            else:
+                add()
+        return pass_manager
+
+    def timed(self, step, action):
+        start = time.perf_counter()
+        action()
+        self.durations.append((step, time.perf_counter() - start))
+
+    def count(self, module):
+        """ How many functions with a body, blocks, instructions and calls the module holds """
+        counts = {'functions': 0, 'blocks': 0, 'instructions': 0, 'calls': 0}
+        for function in module.functions:
+            if function.is_declaration:
+                continue
+            counts['functions'] += 1
+            for block in function.blocks:
+                counts['blocks'] += 1
+                for instruction in block.instructions:
+                    counts['instructions'] += 1
+                    if instruction.opcode == 'call':
+                        counts['calls'] += 1
+        return counts
@@ -0,0 +1,235 @@
+import llvmlite.ir as ir
+from .libc import declareLibc
+
+class InputReader:
+    """
+    Emits the runtime input() reads through: stdin is read in large blocks with read(0, ...) into one
+    buffer, and every input() takes the next whitespace separated token out of it, like scanf("%s") did.
+
+        glitchy.in     = [SIZE + 1 x i8], the byte after the data read so far is always 0
+        glitchy.in.pos = i64 start of what wasn't consumed yet
+        glitchy.in.end = i64 end of the data read so far
+
+    A token is only ever a slice of the buffer: input() copies it into the string arena once, and
+    'input().toInteger()' / 'input().toDouble()' parse the number right where it is, without copying it.
+    A token that runs past the end of the data is moved to the front before the buffer is refilled,
+    so tokens are cut off at SIZE bytes. On end of input the token is empty.
+
+    Everything printed so far is flushed before the reader blocks on stdin, so prompts show up in time.
+    """
+    SIZE = 1 << 16
+
+    def __init__(self, module, flush_fn):
+        self.module = module
+        self.flush_fn = flush_fn
+        self.i8 = ir.IntType(8)
+        self.i8_ptr = self.i8.as_pointer()
+        self.i64 = ir.IntType(64)
+        self.i32 = ir.IntType(32)
+
+        buffer_type = ir.ArrayType(self.i8, self.SIZE + 1)
+        self.buffer = self.declareGlobal("glitchy.in", buffer_type)
+        self.pos = self.declareGlobal("glitchy.in.pos", self.i64)
+        self.end = self.declareGlobal("glitchy.in.end", self.i64)
+        self.read_fn = declareLibc(self.module, "read")
+        self.memmove = declareLibc(self.module, "memmove")
+        self.strtod = declareLibc(self.module, "strtod")
+
+        self.token_type = ir.LiteralStructType([self.i8_ptr, self.i64])
+        self.fill_fn = self.emitFill()
+        self.token_fn = self.emitToken()
+        self.parse_int_fn = self.emitParseInt()
+
+    # ------------ Used by the generator ----------------- #
+
+    def token(self, builder):
+        """ Start and length of the next token, the slice stays valid until the reader refills the buffer """
+        token = builder.call(self.token_fn, [])
+        return builder.extract_value(token, 0), builder.extract_value(token, 1)
+
+    def integer(self, builder):
+        """ input().toInteger(): like atoi, but with the digits read where they are """
+        start, length = self.token(builder)
+        return builder.call(self.parse_int_fn, [start, length])
+
+    def double(self, builder):
+        """ input().toDouble(): the token is followed by whitespace or the 0 after the data, strtod stops there """
+        start, _ = self.token(builder)
+        return builder.call(self.strtod, [start, ir.Constant(self.i8_ptr.as_pointer(), None)])
+
+    # ------------ Runtime ----------------- #
+
+    def declareGlobal(self, name, type_):
+        variable = ir.GlobalVariable(self.module, type_, name=name)
+        variable.linkage = 'internal'
+        variable.initializer = ir.Constant(type_, None)
+        return variable
+
+    def newFunction(self, name, return_type, args):
+        function = ir.Function(self.module, ir.FunctionType(return_type, args), name=name)
+        function.linkage = 'internal'
+        return function, ir.IRBuilder(function.append_basic_block(name="entry"))
+
+    def at(self, builder, index):
+        zero = ir.Constant(self.i32, 0)
+        return builder.gep(self.buffer, [zero, index], inbounds=True)
+
+    def isSpace(self, builder, char):
+        """ ' ', '\\t', '\\n', '\\v', '\\f' and '\\r', the characters scanf("%s") stops at """
+        space = builder.icmp_unsigned('==', char, ir.Constant(self.i8, ord(' ')))
+        control = builder.icmp_unsigned('<=', builder.sub(char, ir.Constant(self.i8, 9)), ir.Constant(self.i8, 4))
+        return builder.or_(space, control)
+
+    def emitFill(self):
+        """ Moves what wasn't consumed to the front and reads more behind it, returns whether anything was read """
+        function, builder = self.newFunction("glitchy.fill", ir.IntType(1), [])
+        builder.call(self.flush_fn, [])
+        pos = builder.load(self.pos)
+        rest = builder.sub(builder.load(self.end), pos, name="rest")
+        zero = ir.Constant(self.i64, 0)
+        builder.call(self.memmove, [self.at(builder, zero), self.at(builder, pos), rest])
+        builder.store(zero, self.pos)
+        builder.store(rest, self.end)
+        builder.store(ir.Constant(self.i8, 0), self.at(builder, rest))
+
+        read_block = function.append_basic_block(name="read")
+        full_block = function.append_basic_block(name="full")
+        room = builder.sub(ir.Constant(self.i64, self.SIZE), rest, name="room")
+        builder.cbranch(builder.icmp_signed('>', room, zero), read_block, full_block)
+
+        builder.position_at_end(full_block)
+        builder.ret(ir.Constant(ir.IntType(1), 0))
+
+        builder.position_at_end(read_block)
+        count = builder.call(self.read_fn, [ir.Constant(self.i32, 0), self.at(builder, rest), room])
+        got_block = function.append_basic_block(name="got")
+        builder.cbranch(builder.icmp_signed('>', count, zero), got_block, full_block)
+
+        builder.position_at_end(got_block)
+        end = builder.add(rest, count)
+        builder.store(end, self.end)
+        builder.store(ir.Constant(self.i8, 0), self.at(builder, end))
+        builder.ret(ir.Constant(ir.IntType(1), 1))
+        return function
+
+    def emitToken(self):
+        function, builder = self.newFunction("glitchy.token", self.token_type, [])
+        one = ir.Constant(self.i64, 1)
+        skip_block = function.append_basic_block(name="skip")
+        refill_block = function.append_basic_block(name="refill")
+        empty_block = function.append_basic_block(name="empty")
+        check_block = function.append_basic_block(name="check")
+        advance_block = function.append_basic_block(name="advance")
+        scan_block = function.append_basic_block(name="scan")
+        look_block = function.append_basic_block(name="look")
+        next_block = function.append_basic_block(name="next")
+        more_block = function.append_basic_block(name="more")
+        done_block = function.append_basic_block(name="done")
+        builder.branch(skip_block)
+
+        # skip the whitespace in front of the token
+        builder.position_at_end(skip_block)
+        pos = builder.load(self.pos, name="pos")
+        builder.cbranch(builder.icmp_signed('<', pos, builder.load(self.end)), check_block, refill_block)
+
+        builder.position_at_end(refill_block)
+        builder.cbranch(builder.call(self.fill_fn, []), skip_block, empty_block)
+
+        builder.position_at_end(empty_block)
+        empty = builder.insert_value(ir.Constant(self.token_type, None), self.at(builder, builder.load(self.pos)), 0)
+        builder.ret(empty)
+
+        builder.position_at_end(check_block)
+        builder.cbranch(self.isSpace(builder, builder.load(self.at(builder, pos))), advance_block, scan_block)
+
+        builder.position_at_end(advance_block)
+        builder.store(builder.add(pos, one), self.pos)
+        builder.branch(skip_block)
+
+        # the token runs up to the next whitespace, or the end of the input
+        builder.position_at_end(scan_block)
+        index = builder.phi(self.i64, name="index")
+        index.add_incoming(pos, check_block)
+        builder.cbranch(builder.icmp_signed('<', index, builder.load(self.end)), look_block, more_block)
+
+        builder.position_at_end(look_block)
+        builder.cbranch(self.isSpace(builder, builder.load(self.at(builder, index))), done_block, next_block)
+
+        builder.position_at_end(next_block)
+        index.add_incoming(builder.add(index, one), next_block)
+        builder.branch(scan_block)
+
+        # refilling moves the token to the front of the buffer
+        builder.position_at_end(more_block)
+        offset = builder.sub(index, builder.load(self.pos), name="offset")
+        more = builder.call(self.fill_fn, [])
+        moved = builder.add(builder.load(self.pos), offset, name="moved")
+        index.add_incoming(moved, more_block)
+        builder.cbranch(more, scan_block, done_block)
+
+        builder.position_at_end(done_block)
+        end = builder.phi(self.i64, name="token_end")
+        end.add_incoming(index, look_block)
+        end.add_incoming(moved, more_block)
+        start = builder.load(self.pos)
+        builder.store(end, self.pos)
+        token = builder.insert_value(ir.Constant(self.token_type, None), self.at(builder, start), 0)
+        builder.ret(builder.insert_value(token, builder.sub(end, start), 1))
+        return function
+
+    def emitParseInt(self):
+        """ Sign and digits up to the first other character, out of range values saturate like strtol """
+        function, builder = self.newFunction("glitchy.parse.int", self.i64, [self.i8_ptr, self.i64])
+        start, length = function.args
+        zero = ir.Constant(self.i64, 0)
+        one = ir.Constant(self.i64, 1)
+        ten = ir.Constant(self.i64, 10)
+        sign_block = function.append_basic_block(name="sign")
+        loop_block = function.append_basic_block(name="loop")
+        digit_block = function.append_basic_block(name="digit")
+        add_block = function.append_basic_block(name="add")
+        finish_block = function.append_basic_block(name="finish")
+        empty_block = function.append_basic_block(name="empty")
+        builder.cbranch(builder.icmp_signed('>', length, zero), sign_block, empty_block)
+
+        builder.position_at_end(empty_block)
+        builder.ret(zero)
+
+        builder.position_at_end(sign_block)
+        first = builder.load(start)
+        negative = builder.icmp_unsigned('==', first, ir.Constant(self.i8, ord('-')))
+        signed = builder.or_(negative, builder.icmp_unsigned('==', first, ir.Constant(self.i8, ord('+'))))
+        # the magnitude is kept unsigned, a negative number may go one further
+        limit = builder.select(negative, ir.Constant(self.i64, 2**63), ir.Constant(self.i64, 2**63 - 1))
+        cutoff = builder.udiv(limit, ten, name="cutoff")
+        cutlim = builder.urem(limit, ten, name="cutlim")
+        first_digit = builder.zext(signed, self.i64)
+        builder.branch(loop_block)
+
+        builder.position_at_end(loop_block)
+        index = builder.phi(self.i64, name="index")
+        value = builder.phi(self.i64, name="value")
+        overflow = builder.phi(ir.IntType(1), name="overflow")
+        index.add_incoming(first_digit, sign_block)
+        value.add_incoming(zero, sign_block)
+        overflow.add_incoming(ir.Constant(ir.IntType(1), 0), sign_block)
+        builder.cbranch(builder.icmp_signed('<', index, length), digit_block, finish_block)
+
+        builder.position_at_end(digit_block)
+        digit = builder.sub(builder.load(builder.gep(start, [index])), ir.Constant(self.i8, ord('0')), name="digit")
+        builder.cbranch(builder.icmp_unsigned('<=', digit, ir.Constant(self.i8, 9)), add_block, finish_block)
+
+        builder.position_at_end(add_block)
+        digit = builder.zext(digit, self.i64)
+        too_big = builder.or_(builder.icmp_unsigned('>', value, cutoff),
+                              builder.and_(builder.icmp_unsigned('==', value, cutoff), builder.icmp_unsigned('>', digit, cutlim)))
+        index.add_incoming(builder.add(index, one), add_block)
+        value.add_incoming(builder.add(builder.mul(value, ten), digit), add_block)
+        overflow.add_incoming(builder.or_(overflow, too_big), add_block)
+        builder.branch(loop_block)
+
+        builder.position_at_end(finish_block)
+        result = builder.select(negative, builder.sub(zero, value), value)
+        saturated = builder.select(negative, ir.Constant(self.i64, -2**63), ir.Constant(self.i64, 2**63 - 1))
+        builder.ret(builder.select(overflow, saturated, result))
+        return function
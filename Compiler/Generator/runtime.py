@@ -0,0 +1,90 @@
+import copy
+import llvmlite.ir as ir
+import llvmlite.binding as llvm
+from .arena import StringArena
+from .numbers import NumberFormatter
+from .output import OutputBuffer
+from .reader import InputReader
+from .libc import declareLibc
+
+class Runtime:
+    """
+    The runtime programs call into (string arena, number formatting, output and input buffers) as a
+    module of its own. It is emitted and parsed once per process (see shared()), instead of being
+    emitted again into every program. Each program it is linked into gets a copy of the parsed module.
+
+    A program's module only declares the parts it calls: bind() gives the generator a copy of an
+    emitter whose functions and globals are declarations in the program's module. link() then copies
+    the definitions into the parsed module before it is optimized, and makes them internal again, so
+    LLVM inlines them like code of the program itself and drops what isn't called.
+    """
+    _shared = None
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def __init__(self):
+        self.module = ir.Module(name="glitchy.runtime")
+        self.string_pool = {}
+        self.arena = StringArena(self.module)
+        self.formatter = NumberFormatter(self.module, self.stringConstant)
+        self.output = OutputBuffer(self.module, self.stringConstant, self.formatter)
+        self.reader = InputReader(self.module, self.output.flush_fn)
+        self.parsed = None
+
+        # the emitters make their definitions internal, they have to be visible to be linked
+        self.exports = []
+        for value in self.module.global_values:
+            if value.linkage == 'internal':
+                value.linkage = ''
+                self.exports.append(value.name)
+
+    def stringConstant(self, text):
+        constant = self.string_pool.get(text)
+        if constant is None:
+            data = bytearray(text.encode("utf8")) + b"\0"
+            value = ir.Constant(ir.ArrayType(ir.IntType(8), len(data)), data)
+            constant = ir.GlobalVariable(self.module, value.type, name=f"glitchy.str.{len(self.string_pool)}")
+            constant.linkage = 'private'
+            constant.unnamed_addr = True
+            constant.global_constant = True
+            constant.initializer = value
+            self.string_pool[text] = constant
+        zero = ir.Constant(ir.IntType(32), 0)
+        return constant.gep([zero, zero])
+
+    def bind(self, emitter, module, **fields):
+        """ A copy of one of the emitters above that emits calls into 'module'. 'fields' replaces attributes of the copy """
+        bound = copy.copy(emitter)
+        bound.module = module
+        for name, value in vars(emitter).items():
+            if isinstance(value, (ir.Function, ir.GlobalVariable)) and value.linkage != 'private':
+                setattr(bound, name, self.declare(module, value))
+        for name, value in fields.items():
+            setattr(bound, name, value)
+        return bound
+
+    def declare(self, module, value):
+        existing = module.globals.get(value.name)
+        if existing is not None:
+            return existing
+        if isinstance(value, ir.Function) and value.is_declaration:
+            return declareLibc(module, value.name)
+        if isinstance(value, ir.Function):
+            return ir.Function(module, value.function_type, name=value.name)
+        return ir.GlobalVariable(module, value.value_type, name=value.name)
+
+    def link(self, target):
+        """ Copies the runtime into 'target', a parsed module """
+        if self.parsed is None:
+            self.parsed = llvm.parse_assembly(str(self.module))
+        target.link_in(self.parsed, preserve=True)
+        for name in self.exports:
+            try:
+                value = target.get_function(name)
+            except NameError:
+                value = target.get_global_variable(name)
+            value.linkage = 'internal'
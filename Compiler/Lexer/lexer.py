@@ -265,6 +265,8 @@ class Lexer:
             token = Token(TokenType.COLON, self.currentChar)
         elif self.currentChar == '?':
             token = Token(TokenType.QMARK, self.currentChar)
+        elif self.currentChar == '@':
+            token = Token(TokenType.AT, self.currentChar)
         
         elif self.currentChar == '\n':
             token = Token(TokenType.NEWLINE, '\n')   
@@ -0,0 +1,4 @@
+from .mir import *
+from .builder import *
+from .passes import *
+from .feedback import *
\ No newline at end of file
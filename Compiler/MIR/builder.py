@@ -0,0 +1,357 @@
+from Compiler.utils import *
+from .mir import *
+
+class MIRBuilder:
+    """
+    Builds the mid-level IR from the analyzed AST. Variables are put in SSA form while building, using
+    the on the fly algorithm of Braun et al. ("Simple and Efficient Construction of Static Single
+    Assignment Form"): each block remembers the last value assigned to every variable, reads look
+    through the predecessors and phis are placed where definitions from different paths meet.
+
+    The builder remembers which value every AST expression produced (values), so results of MIR passes
+    can be written back to the AST.
+    """
+    def __init__(self, ast):
+        self.ast = ast
+        self.module = Module()
+        self.values = {}            # id(AST expression) -> Value
+        self.function = None
+        self.block = None
+        self.loops = []             # (condition block, exit block) of the enclosing while loops
+        self.current_defs = {}      # symbol -> {block: value}
+        self.incomplete_phis = {}   # block -> {symbol: phi}, phis in blocks that were not sealed yet
+        self.block_counter = 0
+
+    def build(self):
+        if has_error_occurred() or self.ast is None:
+            return None
+        try:
+            self.ast.accept(self)
+        except ExitSignal:
+            return None
+        except Exception as e:
+            throw(CompilationError(f"An error occurred while building the mid-level IR: {e}"), exit=False)
+            return None
+
+        return self.module
+
+    # ------------ SSA construction ----------------- #
+
+    def writeVariable(self, symbol, block, value):
+        self.current_defs.setdefault(symbol, {})[block] = value
+
+    def readVariable(self, symbol, block):
+        defs = self.current_defs.get(symbol, {})
+        # blocks with a single predecessor just look at it, walk those chains without recursing
+        chain = []
+        while block not in defs and block.sealed and len(block.preds) == 1:
+            chain.append(block)
+            block = block.preds[0]
+
+        if block in defs:
+            value = defs[block]
+        elif not block.sealed:
+            # not all predecessors are known yet (loop header), finish the phi once they are
+            value = self.newPhi(symbol, block)
+            self.incomplete_phis.setdefault(block, {})[symbol] = value
+            self.writeVariable(symbol, block, value)
+        elif len(block.preds) == 0:
+            # defined outside of this function, or read in code that can never run
+            value = Instruction('global', [], symbol.data_type, block, attr=symbol)
+            block.instructions.insert(0, value)
+            self.writeVariable(symbol, block, value)
+        else:
+            value = self.newPhi(symbol, block)
+            self.writeVariable(symbol, block, value)
+            self.addPhiOperands(symbol, value)
+
+        for visited in chain:
+            self.writeVariable(symbol, visited, value)
+        return value
+
+    def newPhi(self, symbol, block):
+        phi = Phi(symbol.data_type, block, symbol)
+        block.instructions.insert(0, phi)
+        return phi
+
+    def addPhiOperands(self, symbol, phi):
+        for pred in phi.block.preds:
+            phi.operands.append(self.readVariable(symbol, pred))
+
+    def sealBlock(self, block):
+        for symbol, phi in self.incomplete_phis.pop(block, {}).items():
+            self.addPhiOperands(symbol, phi)
+        block.sealed = True
+
+    def removeTrivialPhis(self, function):
+        """ Replaces phis that only ever see one value (besides themselves) by that value """
+        changed = True
+        while changed:
+            changed = False
+            for block in function.blocks:
+                for phi in block.phis:
+                    incoming = []
+                    for operand in phi.operands:
+                        if operand is not phi and all(operand is not seen for seen in incoming):
+                            incoming.append(operand)
+                    if len(incoming) == 1:
+                        block.instructions.remove(phi)
+                        function.replaceAllUsesWith(phi, incoming[0])
+                        changed = True
+
+    # ------------ Helpers ----------------- #
+
+    def newBlock(self, name):
+        block = BasicBlock(f"{name}{self.block_counter}", self.function)
+        self.block_counter += 1
+        self.function.blocks.append(block)
+        return block
+
+    def emit(self, op, operands, type, attr=None, node=None):
+        inst = Instruction(op, operands, type, self.block, attr=attr, node=node)
+        self.block.instructions.append(inst)
+        if node is not None:
+            self.values[id(node)] = inst
+        return inst
+
+    def branch(self, target):
+        self.emit('br', [], 'void')
+        self.addEdge(self.block, target)
+
+    def cbranch(self, condition, true_block, false_block):
+        self.emit('cbranch', [condition], 'void')
+        self.addEdge(self.block, true_block)
+        self.addEdge(self.block, false_block)
+
+    def addEdge(self, pred, succ):
+        pred.succs.append(succ)
+        succ.preds.append(pred)
+
+    def isTerminated(self):
+        return self.block.terminator is not None
+
+    def startUnreachableBlock(self):
+        """ Code after a return or break still gets a block, it just has no predecessors """
+        self.block = self.newBlock("dead")
+        self.sealBlock(self.block)
+
+    def buildFunction(self, name, return_type, statements, node=None, parameters=()):
+        previous = (self.function, self.block, self.loops)
+        self.function = Function(name, return_type, node)
+        self.module.functions.append(self.function)
+        self.loops = []
+        self.block = self.newBlock("entry")
+        self.sealBlock(self.block)
+
+        for param in parameters:
+            value = self.emit('param', [], param.type, attr=param.name, node=param)
+            self.function.params.append(value)
+            if param.symbol is not None:
+                self.writeVariable(param.symbol, self.block, value)
+
+        for statement in statements:
+            if statement is not None:
+                statement.accept(self)
+        if not self.isTerminated():
+            self.emit('ret', [], 'void')
+
+        self.removeTrivialPhis(self.function)
+        self.function, self.block, self.loops = previous
+
+    def assign(self, symbol, value, node):
+        inst = self.emit('assign', [value], symbol.data_type, attr=symbol, node=node)
+        self.function.assigns.setdefault(symbol, []).append(inst)
+        self.writeVariable(symbol, self.block, inst)
+
+    def fusableOperand(self, node, value):
+        """
+        Whether a string variable used in a concatenation holds the result of another concatenation that
+        could be spliced in instead: it was built in the same block, without calls, and none of the
+        variables it read have changed since.
+        """
+        if not isinstance(node, VariableReference) or not isinstance(value, Instruction) or value.op != 'assign':
+            return False
+        inner = value.operands[0]
+        if not isinstance(inner, Instruction) or inner.op != 'concat' or inner.block is not self.block:
+            return False
+        if hasSideEffects(inner.node):
+            return False
+        for read in walk(inner.node):
+            if isinstance(read, VariableReference):
+                if read.symbol is None or resolve(self.readVariable(read.symbol, self.block)) is not resolve(self.values.get(id(read))):
+                    return False
+        return True
+
+    # ------------ Visitor ----------------- #
+
+    def visit_program(self, node):
+        self.buildFunction('main', 'void', node.statements)
+
+    def visit_block(self, node):
+        for statement in node.statements:
+            if statement is not None:
+                statement.accept(self)
+
+    def visit_function_declaration(self, node):
+        self.buildFunction(node.name, node.return_type, node.block.statements, node, node.parameters)
+
+    def visit_variable(self, node):
+        if isinstance(node, (VariableDeclaration, VariableUpdated)):
+            value = node.value.accept(self)
+            if node.symbol is not None:
+                self.assign(node.symbol, value, node)
+            return None
+
+        if node.symbol is None:
+            value = self.emit('global', [], node.evaluateType(), attr=node.name)
+        else:
+            value = self.readVariable(node.symbol, self.block)
+        self.values[id(node)] = value
+        return value
+
+    def visit_if(self, node):
+        merge_block = self.newBlock("if.end")
+        arms = [(node.comparison, node.block)] + list(node.elifNodes)
+        for comparison, block in arms:
+            condition = comparison.accept(self)
+            then_block = self.newBlock("if.then")
+            else_block = self.newBlock("if.else")
+            self.cbranch(condition, then_block, else_block)
+            self.sealBlock(then_block)
+            self.sealBlock(else_block)
+
+            self.block = then_block
+            block.accept(self)
+            if not self.isTerminated():
+                self.branch(merge_block)
+            self.block = else_block
+
+        if node.elseBlock is not None:
+            node.elseBlock.accept(self)
+        if not self.isTerminated():
+            self.branch(merge_block)
+
+        # keep the blocks in source order
+        self.function.blocks.remove(merge_block)
+        self.function.blocks.append(merge_block)
+        self.sealBlock(merge_block)
+        self.block = merge_block
+
+    def visit_while(self, node):
+        condition_block = self.newBlock("while.cond")
+        self.branch(condition_block)
+        self.block = condition_block
+        condition = node.comparison.accept(self)
+
+        body_block = self.newBlock("while.body")
+        exit_block = self.newBlock("while.end")
+        self.cbranch(condition, body_block, exit_block)
+        self.sealBlock(body_block)
+
+        self.loops.append((condition_block, exit_block))
+        self.block = body_block
+        node.block.accept(self)
+        if not self.isTerminated():
+            self.branch(condition_block)
+        self.loops.pop()
+
+        # every way back into the condition and out of the loop is known now
+        self.sealBlock(condition_block)
+        self.sealBlock(exit_block)
+        self.block = exit_block
+
+    def visit_break(self, node):
+        self.branch(self.loops[-1][1])
+        self.startUnreachableBlock()
+
+    def visit_return(self, node):
+        if isinstance(node.value, Null):
+            self.emit('ret', [], 'void', node=node)
+        else:
+            self.emit('ret', [node.value.accept(self)], 'void', node=node)
+        self.startUnreachableBlock()
+
+    def visit_function_call(self, node):
+        args = [arg.accept(self) for arg in node.args]
+        if node.name == 'print':
+            return self.emit('print', args, 'void', node=node)
+        if node.name == 'input':
+            return self.emit('input', args, 'string', node=node)
+        return self.emit('call', args, node.evaluateType(), attr=node.name, node=node)
+
+    def visit_method_call(self, node):
+        receiver = node.receiver.accept(self)
+        args = [arg.accept(self) for arg in node.args]
+        return self.emit('method', [receiver] + args, node.evaluateType(), attr=node.name, node=node)
+
+    def visit_argument(self, node):
+        value = node.value.accept(self)
+        self.values[id(node)] = value
+        return value
+
+    def visit_parameter(self, node):
+        return None
+
+    def visit_string_cat(self, node):
+        if node.evaluated is not None:
+            return self.visit_string(node.evaluated)
+
+        operands = []
+        fusable = {}    # operand index -> VariableReference holding another concatenation
+        for value in node.strings:
+            if isinstance(value, ASTNode):
+                operand = value.accept(self)
+                if self.fusableOperand(value, operand):
+                    fusable[len(operands)] = value
+                operands.append(operand)
+            else:
+                operands.append(Constant(value, 'string'))
+
+        inst = self.emit('concat', operands, 'string', node=node)
+        inst.fusable = fusable
+        return inst
+
+    def visit_binary_op(self, node):
+        left, right = node.left.accept(self), node.right.accept(self)
+        return self.emit('binop', [left, right], node.evaluateType(), attr=node.operator, node=node)
+
+    def visit_comparison(self, node):
+        left, right = node.left.accept(self), node.right.accept(self)
+        return self.emit('cmp', [left, right], 'boolean', attr=node.operator, node=node)
+
+    def visit_logical_op(self, node):
+        left, right = node.left.accept(self), node.right.accept(self)
+        op = 'and' if node.operator == '&&' else 'or'
+        return self.emit(op, [left, right], 'boolean', node=node)
+
+    def visit_unary_op(self, node):
+        operand = node.left.accept(self)
+        if node.operator == '+':
+            self.values[id(node)] = operand
+            return operand
+        op = 'not' if node.operator == '!' else 'neg'
+        return self.emit(op, [operand], node.evaluateType(), node=node)
+
+    def visit_type_cast(self, node):
+        value = node.value.accept(self)
+        return self.emit('cast', [value], node.type, node=node)
+
+    def visit_integer(self, node):
+        return self.constant(node, node.value, 'integer')
+
+    def visit_double(self, node):
+        return self.constant(node, node.value, 'double')
+
+    def visit_boolean(self, node):
+        return self.constant(node, node.value == 'true', 'boolean')
+
+    def visit_string(self, node):
+        return self.constant(node, node.value, 'string')
+
+    def visit_null(self, node):
+        return self.constant(node, None, 'null')
+
+    def constant(self, node, value, type):
+        constant = Constant(value, type)
+        self.values[id(node)] = constant
+        return constant
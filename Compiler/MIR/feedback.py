@@ -0,0 +1,202 @@
+from Compiler.utils import *
+from .mir import *
+
+# Expressions that can be replaced by the constant the MIR passes computed for them
+FOLDABLE = (VariableReference, BinaryOp, Comparison, LogicalOp, UnaryOp, TypeCast, StringCat)
+
+class MIRFeedback:
+    """
+    Writes what the MIR passes found back into the AST the generator works on:
+        - expressions that were proven constant become literals
+        - concatenations that were fused get the operands of the concatenation they absorbed
+        - dead stores are removed
+    Every visit returns the node that should take its place.
+
+    The AST passes that run after this one (compile time evaluation, specialization, tail calls, memoization)
+    work on the tree, so this is how the MIR's results reach them. The generator then builds the MIR again from
+    the final tree and lowers the functions it models completely from it (see MIRLowering). Everything else,
+    string values and their regions, input and memo tables, is generated from the tree.
+    """
+    def __init__(self, ast, module, values):
+        self.ast = ast
+        self.values = values
+        self.dead_stores = set()
+        self.fused = {}         # id(VariableReference) -> StringCat whose operands replace it
+        for function in module.functions:
+            self.dead_stores |= getattr(function, 'dead_stores', set())
+            for inst in function.instructions():
+                for reference_id, inner in getattr(inst, 'fused', {}).items():
+                    self.fused[reference_id] = inner.node
+        self.report = []
+
+    def apply(self):
+        try:
+            self.ast.accept(self)
+        except ExitSignal:
+            pass
+        except Exception as e:
+            throw(CompilationError(f"An error occurred while applying the mid-level IR optimizations: {e}"), exit=False)
+
+        return self.report
+
+    def print_report(self):
+        for line in self.report:
+            print(line)
+
+    # ------------ Helpers ----------------- #
+
+    def constantOf(self, node):
+        value = resolve(self.values.get(id(node)))
+        if isinstance(value, Instruction):
+            value = value.constant
+        return value if isinstance(value, Constant) else None
+
+    def literal(self, constant, line):
+        if constant.type == 'integer':
+            return Integer(constant.value, line)
+        if constant.type == 'double':
+            return Double(constant.value, line)
+        if constant.type == 'boolean':
+            return Boolean('true' if constant.value else 'false', line)
+        if constant.type == 'string':
+            return String(constant.value, line=line)
+        return None
+
+    def fold(self, node):
+        """ Returns a literal for a constant expression, None if it has to stay """
+        if not isinstance(node, FOLDABLE):
+            return None
+        if isinstance(node, StringCat) and node.evaluated is not None:
+            return None
+        constant = self.constantOf(node)
+        if constant is None or constant.type != node.evaluateType():
+            return None
+        literal = self.literal(constant, getattr(node, 'line', None))
+        if literal is not None and not isinstance(node, VariableReference):
+            self.report.append(f"Line {getattr(node, 'line', None)}: '{str(node)}' is always {constant}")
+        return literal
+
+    def expression(self, node):
+        return self.fold(node) or node.accept(self)
+
+    def visitStatements(self, statements):
+        kept = []
+        for statement in statements:
+            if statement is None:
+                continue
+            if id(statement) in self.dead_stores:
+                self.report.append(f"Line {statement.line}: removed the unused store to '{statement.name}'")
+                continue
+            kept.append(statement.accept(self))
+        return kept
+
+    # ------------ Visitor ----------------- #
+
+    def visit_program(self, node):
+        node.statements = self.visitStatements(node.statements)
+        return node
+
+    def visit_block(self, node):
+        node.statements = self.visitStatements(node.statements)
+        return node
+
+    def visit_function_declaration(self, node):
+        node.block.accept(self)
+        return node
+
+    def visit_variable(self, node):
+        if isinstance(node, (VariableDeclaration, VariableUpdated)):
+            node.value = self.expression(node.value)
+        return node
+
+    def visit_if(self, node):
+        node.comparison = self.expression(node.comparison)
+        node.block.accept(self)
+        node.elifNodes = [(self.expression(comparison), block.accept(self)) for comparison, block in node.elifNodes]
+        if node.elseBlock is not None:
+            node.elseBlock.accept(self)
+        return node
+
+    def visit_while(self, node):
+        node.comparison = self.expression(node.comparison)
+        node.block.accept(self)
+        return node
+
+    def visit_break(self, node):
+        return node
+
+    def visit_return(self, node):
+        node.value = self.expression(node.value)
+        return node
+
+    def visit_function_call(self, node):
+        node.args = [arg.accept(self) for arg in node.args]
+        return node
+
+    def visit_method_call(self, node):
+        node.receiver = self.expression(node.receiver)
+        node.args = [arg.accept(self) for arg in node.args]
+        return node
+
+    def visit_argument(self, node):
+        node.value = self.expression(node.value)
+        return node
+
+    def visit_parameter(self, node):
+        return node
+
+    def visit_string_cat(self, node):
+        node.strings = self.spliceStrings(node.strings, node.line)
+        return node
+
+    def spliceStrings(self, strings, line):
+        result = []
+        for value in strings:
+            if id(value) in self.fused:
+                # the absorbed concatenation's own store is gone, so its operands are rewritten here
+                result.extend(self.spliceStrings(self.fused[id(value)].strings, line))
+                self.report.append(f"Line {line}: '{value.name}' is built directly into the concatenation")
+            elif isinstance(value, ASTNode):
+                result.append(self.expression(value))
+            else:
+                result.append(value)
+        return result
+
+    def visit_binary_op(self, node):
+        node.left = self.expression(node.left)
+        node.right = self.expression(node.right)
+        node.cached_type = None
+        return node
+
+    def visit_comparison(self, node):
+        node.left = self.expression(node.left)
+        node.right = self.expression(node.right)
+        return node
+
+    def visit_logical_op(self, node):
+        node.left = self.expression(node.left)
+        node.right = self.expression(node.right)
+        return node
+
+    def visit_unary_op(self, node):
+        node.left = self.expression(node.left)
+        return node
+
+    def visit_type_cast(self, node):
+        node.value = self.expression(node.value)
+        return node
+
+    def visit_integer(self, node):
+        return node
+
+    def visit_double(self, node):
+        return node
+
+    def visit_boolean(self, node):
+        return node
+
+    def visit_string(self, node):
+        return node
+
+    def visit_null(self, node):
+        return node
@@ -0,0 +1,172 @@
+"""
+Glitchy's mid-level IR (MIR): functions made of basic blocks holding instructions in SSA form.
+
+Every instruction produces at most one value and its operands are other values, so a variable read is
+just a reference to the instruction that last assigned it (or a phi where control flow merges).
+Types are the language's type names ('integer', 'double', 'boolean', 'string', 'null', 'void').
+"""
+
+# Instructions that have an effect besides producing their value (or may, for method calls). They are never removed
+SIDE_EFFECT_OPS = ['print', 'input', 'call', 'method', 'ret', 'br', 'cbranch']
+TERMINATOR_OPS = ['ret', 'br', 'cbranch']
+
+class Value:
+    def __init__(self, type):
+        self.type = type
+
+class Constant(Value):
+    def __init__(self, value, type):
+        super().__init__(type)
+        self.value = value
+
+    def __repr__(self):
+        if self.type == 'string':
+            return repr(self.value)
+        if self.type == 'boolean':
+            return 'true' if self.value else 'false'
+        if self.type == 'null':
+            return 'null'
+        return str(self.value)
+
+class Instruction(Value):
+    """
+    op is one of:
+        param, global (value of a variable defined outside the function), assign (a store into a variable,
+        operand 0 is the stored value), binop, cmp, and, or, not, neg, cast, concat, method, call, input,
+        print, phi, ret, br, cbranch
+    """
+    def __init__(self, op, operands, type, block, attr=None, node=None):
+        super().__init__(type)
+        self.op = op
+        self.operands = list(operands)
+        self.block = block
+        self.attr = attr            # operator, callee name, variable symbol, ... depending on op
+        self.node = node            # the AST node the instruction was built from
+        self.id = None
+        self.constant = None        # Constant found by constant propagation
+        self.forward = None         # set when the instruction was replaced by another value
+
+    @property
+    def hasSideEffects(self):
+        return self.op in SIDE_EFFECT_OPS
+
+    def __repr__(self):
+        return f"%{self.id}"
+
+class Phi(Instruction):
+    """ operands[i] is the value coming in from block.preds[i] """
+    def __init__(self, type, block, symbol):
+        super().__init__('phi', [], type, block, attr=symbol)
+
+class BasicBlock:
+    def __init__(self, name, function):
+        self.name = name
+        self.function = function
+        self.instructions = []
+        self.preds = []
+        self.succs = []
+        self.sealed = False     # all predecessors are known (used while building SSA)
+
+    @property
+    def terminator(self):
+        if self.instructions and self.instructions[-1].op in TERMINATOR_OPS:
+            return self.instructions[-1]
+        return None
+
+    @property
+    def phis(self):
+        return [inst for inst in self.instructions if isinstance(inst, Phi)]
+
+    def __repr__(self):
+        return self.name
+
+class Function:
+    def __init__(self, name, return_type, node=None):
+        self.name = name
+        self.return_type = return_type
+        self.node = node        # FunctionDeclaration, None for the top level program
+        self.params = []
+        self.blocks = []
+        self.assigns = {}       # symbol -> assign instructions of that variable
+
+    @property
+    def entry(self):
+        return self.blocks[0]
+
+    def instructions(self):
+        for block in self.blocks:
+            yield from block.instructions
+
+    def replaceAllUsesWith(self, old, new, phis=True):
+        """ With 'phis' False the operands of phis keep pointing at 'old' """
+        old.forward = new
+        for inst in self.instructions():
+            if phis or inst.op != 'phi':
+                inst.operands = [new if operand is old else operand for operand in inst.operands]
+
+    def removeBlock(self, block):
+        for succ in block.succs:
+            self.removeEdge(block, succ)
+        self.blocks.remove(block)
+
+    def removeEdge(self, pred, succ):
+        """ Drops one control flow edge, along with the matching phi operands """
+        index = succ.preds.index(pred)
+        succ.preds.pop(index)
+        for phi in succ.phis:
+            phi.operands.pop(index)
+        pred.succs.remove(succ)
+
+    def number(self):
+        counter = 0
+        for inst in self.instructions():
+            inst.id = counter
+            counter += 1
+
+class Module:
+    def __init__(self):
+        self.functions = []     # the top level program ('main') comes first
+
+    def print_content(self):
+        for function in self.functions:
+            print_function(function)
+
+def resolve(value):
+    """ Follows replaced instructions to the value that took their place """
+    while isinstance(value, Instruction) and value.forward is not None:
+        value = value.forward
+    return value
+
+def print_function(function):
+    function.number()
+    params = ", ".join(f"{param.type} {param}" for param in function.params)
+    print(f"function {function.return_type} {function.name}({params}) {{")
+    for block in function.blocks:
+        preds = ", ".join(pred.name for pred in block.preds)
+        print(f"  {block.name}:" + (f"    ; preds: {preds}" if preds else ""))
+        for inst in block.instructions:
+            print(f"    {format_instruction(inst)}")
+    print("}")
+
+def format_instruction(inst):
+    if isinstance(inst, Phi):
+        incoming = ", ".join(f"[{operand}, {pred.name}]" for operand, pred in zip(inst.operands, inst.block.preds))
+        return f"{inst} = phi {inst.type} {incoming}    ; {inst.attr.name}"
+    operands = ", ".join(repr(operand) for operand in inst.operands)
+    if inst.op == 'br':
+        return f"br {inst.block.succs[0].name}"
+    if inst.op == 'cbranch':
+        return f"cbranch {operands}, {inst.block.succs[0].name}, {inst.block.succs[1].name}"
+    if inst.op in ['assign', 'global']:
+        text = f"{inst} = {inst.op} {getattr(inst.attr, 'name', inst.attr)} {operands}".rstrip()
+    elif inst.attr is not None:
+        text = f"{inst} = {inst.op} '{inst.attr}' {operands}".rstrip()
+    else:
+        text = f"{inst} = {inst.op} {operands}".rstrip()
+    if inst.type == 'void':
+        text = text.split(" = ", 1)[1]
+    else:
+        text += f" : {inst.type}"
+    if inst.constant is not None:
+        text += f"    ; = {inst.constant}"
+    return text
@@ -0,0 +1,348 @@
+import math
+from Compiler.utils import *
+from .mir import *
+
+INT_MIN, INT_MAX = -2**63, 2**63 - 1
+OVERDEFINED = object()      # lattice value of something that is not a compile time constant
+
+class PassManager:
+    """ Runs MIR passes over every function of a module, in the order they were added """
+    def __init__(self, passes=None):
+        self.passes = passes if passes is not None else [ConstantPropagation(), ConcatFusion(), DeadStoreRemoval()]
+        self.report = []
+
+    def run(self, module):
+        for pass_ in self.passes:
+            self.report.extend(pass_.run(module))
+        return self.report
+
+class FunctionPass:
+    """ A pass that looks at one function at a time """
+    def run(self, module):
+        report = []
+        for function in module.functions:
+            report.extend(f"{function.name}: {line}" for line in self.runOnFunction(function))
+        return report
+
+    def runOnFunction(self, function):
+        raise NotImplementedError
+
+def countUsers(function):
+    users = {}
+    for inst in function.instructions():
+        for operand in inst.operands:
+            if isinstance(operand, Instruction):
+                users[operand] = users.get(operand, 0) + 1
+    return users
+
+def globalReads(module):
+    """ Names of the variables some function reads without assigning them itself """
+    return {getattr(inst.attr, 'name', inst.attr) for function in module.functions
+            for inst in function.instructions() if inst.op == 'global'}
+
+class ConstantPropagation(FunctionPass):
+    """
+    Sparse conditional constant propagation (Wegman & Zadeck). Values start out unknown and only ever move
+    down to a constant and then to overdefined. Only blocks reachable through branches that can actually be
+    taken are evaluated, so a variable keeps its constant value through a loop as long as no taken path
+    changes it. Folding follows the runtime semantics exactly (64 bit wraparound, truncating division,
+    '%f' formatting in concatenations); anything that would not fold identically is left alone.
+
+    Every instruction found to be constant gets its 'constant' set and all its uses are replaced.
+    The control flow graph itself is not modified.
+    """
+    def runOnFunction(self, function):
+        self.values = {}            # instruction -> Constant or OVERDEFINED, missing means unknown
+        self.users = {}
+        for inst in function.instructions():
+            for operand in inst.operands:
+                if isinstance(operand, Instruction):
+                    self.users.setdefault(operand, []).append(inst)
+
+        self.executable_edges = set()
+        self.executable_blocks = set()
+        self.block_worklist = [function.entry]
+        self.value_worklist = []
+        self.executable_blocks.add(function.entry)
+
+        while self.block_worklist or self.value_worklist:
+            while self.value_worklist:
+                inst = self.value_worklist.pop()
+                for user in self.users.get(inst, []):
+                    if user.block in self.executable_blocks:
+                        self.visit(user)
+            while self.block_worklist:
+                for inst in self.block_worklist.pop().instructions:
+                    self.visit(inst)
+
+        report = []
+        for inst in list(function.instructions()):
+            value = self.values.get(inst)
+            if isinstance(value, Constant) and inst.op not in ['param', 'global', 'phi', 'assign']:
+                report.append(f"folded {inst.op} to {value}")
+            if isinstance(value, Constant):
+                inst.constant = value
+                # a phi that isn't constant itself still needs the stores feeding it, see DeadStoreRemoval
+                function.replaceAllUsesWith(inst, value, phis=False)
+        return report
+
+    # ------------ Lattice ----------------- #
+
+    def valueOf(self, operand):
+        if isinstance(operand, Constant):
+            return operand
+        return self.values.get(operand)
+
+    def update(self, inst, value):
+        old = self.values.get(inst)
+        if value is None or old is OVERDEFINED or old is value:
+            return
+        if isinstance(old, Constant) and isinstance(value, Constant):
+            if sameConstant(old, value):
+                return
+            value = OVERDEFINED     # two different constants
+        self.values[inst] = value
+        self.value_worklist.append(inst)
+
+    def markEdge(self, pred, succ):
+        if (pred, succ) in self.executable_edges:
+            return
+        self.executable_edges.add((pred, succ))
+        if succ not in self.executable_blocks:
+            self.executable_blocks.add(succ)
+            self.block_worklist.append(succ)
+        else:
+            for phi in succ.phis:
+                self.visit(phi)
+
+    # ------------ Transfer functions ----------------- #
+
+    def visit(self, inst):
+        if inst.op == 'br':
+            self.markEdge(inst.block, inst.block.succs[0])
+        elif inst.op == 'cbranch':
+            condition = self.valueOf(inst.operands[0])
+            if condition is OVERDEFINED:
+                self.markEdge(inst.block, inst.block.succs[0])
+                self.markEdge(inst.block, inst.block.succs[1])
+            elif condition is not None:
+                self.markEdge(inst.block, inst.block.succs[0 if condition.value else 1])
+        elif inst.op == 'phi':
+            self.update(inst, self.meet([
+                self.valueOf(operand) for operand, pred in zip(inst.operands, inst.block.preds)
+                if (pred, inst.block) in self.executable_edges
+            ]))
+        elif inst.op == 'assign':
+            self.update(inst, self.valueOf(inst.operands[0]))
+        elif inst.op in ['binop', 'cmp', 'and', 'or', 'not', 'neg', 'cast', 'concat']:
+            if self.values.get(inst) is OVERDEFINED:
+                return      # can't move any further, and a concatenation can have thousands of operands
+            operands = [self.valueOf(operand) for operand in inst.operands]
+            if any(operand is OVERDEFINED for operand in operands):
+                self.update(inst, OVERDEFINED)
+            elif all(operand is not None for operand in operands):
+                folded = fold(inst, operands)
+                self.update(inst, folded if folded is not None else OVERDEFINED)
+        elif inst.type != 'void':
+            self.update(inst, OVERDEFINED)     # params, globals, calls, input, methods
+
+    def meet(self, values):
+        result = None
+        for value in values:
+            if value is OVERDEFINED:
+                return OVERDEFINED
+            if value is None:
+                continue
+            if result is None:
+                result = value
+            elif not sameConstant(result, value):
+                return OVERDEFINED
+        return result
+
+# ------------ Folding ----------------- #
+
+def sameConstant(a, b):
+    # repr tells 0.0 and -0.0 apart, which print differently
+    return a.type == b.type and repr(a.value) == repr(b.value)
+
+def wrap(value):
+    """ Two's complement wraparound of a 64 bit integer """
+    return (value - INT_MIN) % 2**64 + INT_MIN
+
+def fold(inst, operands):
+    """ Evaluates an instruction on constant operands, None if it cannot be done exactly like at runtime """
+    values = [operand.value for operand in operands]
+    types = [operand.type for operand in operands]
+    try:
+        if inst.op == 'binop':
+            result = foldArithmetic(inst.attr, values[0], values[1], types[0])
+        elif inst.op == 'cmp':
+            result = foldComparison(inst.attr, values[0], values[1], types[0])
+        elif inst.op == 'and':
+            result = values[0] and values[1]
+        elif inst.op == 'or':
+            result = values[0] or values[1]
+        elif inst.op == 'not':
+            result = not values[0]
+        elif inst.op == 'neg':
+            result = wrap(-values[0]) if types[0] == 'integer' else -values[0]
+        elif inst.op == 'cast':
+            result = foldCast(values[0], inst.type)
+        else:
+            result = foldConcat(values, types)
+    except (ArithmeticError, ValueError, TypeError):
+        return None
+
+    if result is None or (isinstance(result, float) and not math.isfinite(result)):
+        return None
+    return Constant(result, inst.type)
+
+def foldArithmetic(operator, left, right, type_):
+    if type_ == 'integer':
+        if operator in ['/', '%']:
+            if right == 0 or (left == INT_MIN and right == -1):
+                return None     # traps at runtime, leave it there
+            quotient = abs(left) // abs(right) * (1 if (left < 0) == (right < 0) else -1)
+            return quotient if operator == '/' else left - quotient * right
+        if operator == '+':
+            return wrap(left + right)
+        if operator == '-':
+            return wrap(left - right)
+        if operator == '*':
+            return wrap(left * right)
+        return None
+
+    if operator == '+':
+        return left + right
+    if operator == '-':
+        return left - right
+    if operator == '*':
+        return left * right
+    if operator == '/':
+        return left / right if right != 0 else None
+    if operator == '%':
+        return math.fmod(left, right) if right != 0 else None
+    if operator == '^':
+        return math.pow(left, right)
+    return None
+
+def foldComparison(operator, left, right, type_):
+    if type_ == 'string':
+        return None
+    if type_ == 'boolean' and operator not in ['==', '!=']:
+        return None
+    if operator == '==':
+        return left == right
+    if operator == '!=':
+        return left != right
+    if operator == '<':
+        return left < right
+    if operator == '<=':
+        return left <= right
+    if operator == '>':
+        return left > right
+    if operator == '>=':
+        return left >= right
+    return None
+
+def foldCast(value, type_):
+    if type_ == 'double':
+        return float(value)
+    if type_ == 'integer' and INT_MIN <= value <= INT_MAX:
+        return int(value)
+    return None
+
+def foldConcat(values, types):
+    parts = []
+    for value, type_ in zip(values, types):
+        if type_ == 'string':
+            parts.append(value)
+        elif type_ == 'integer':
+            parts.append("%d" % value)
+        elif type_ == 'double':
+            parts.append("%f" % value)
+        elif type_ == 'boolean':
+            parts.append("true" if value else "false")
+        else:
+            return None
+    return ''.join(parts)
+
+class ConcatFusion(FunctionPass):
+    """
+    Splices a concatenation into the one that uses its result: 's = a + b' followed by 't = s + c' builds
+    't' as 'a + b + c' in one go. Only done when the builder found the operands unchanged between the two
+    (see MIRBuilder.fusableOperand) and the intermediate variable is not read anywhere else, so its store
+    becomes dead and is removed by DeadStoreRemoval.
+    """
+    def run(self, module):
+        self.globals = globalReads(module)
+        return super().run(module)
+
+    def runOnFunction(self, function):
+        report = []
+        users = countUsers(function)
+        for inst in list(function.instructions()):
+            if inst.op != 'concat' or not getattr(inst, 'fusable', None):
+                continue
+            inst.fused = {}     # id of the VariableReference -> concat that replaces it
+            operands = []
+            for index, operand in enumerate(inst.operands):
+                reference = inst.fusable.get(index)
+                if reference is not None and self.canFuse(function, inst, operand, users):
+                    inner = operand.operands[0]
+                    operands.extend(inner.operands)
+                    inst.fused[id(reference)] = inner
+                    users[operand] -= 1
+                    report.append(f"fused the concatenation stored in '{operand.attr.name}' into its use")
+                else:
+                    operands.append(operand)
+            inst.operands = operands
+        return report
+
+    def canFuse(self, function, inst, operand, users):
+        if not isinstance(operand, Instruction) or operand.op != 'assign' or users.get(operand, 0) != 1:
+            return False
+        if operand.attr.name in self.globals:
+            return False
+        inner = operand.operands[0]
+        if not isinstance(inner, Instruction) or inner.op != 'concat' or users.get(inner, 0) != 1:
+            return False
+        # once fused, every store into the variable has to be dead for its declaration to go away
+        return all(users.get(other, 0) == 0 for other in function.assigns.get(operand.attr, []) if other is not operand)
+
+class DeadStoreRemoval(FunctionPass):
+    """
+    Finds stores into variables whose value is never read. Everything that has an effect is live, and so is
+    every value one of them uses. A store whose value has side effects (a call) is always kept. A variable's
+    declaration is only removed when all of its stores are dead, so the generator never sees an update of a
+    variable that was not declared. Variables read from another function are never touched.
+    """
+    def run(self, module):
+        self.globals = globalReads(module)
+        return super().run(module)
+
+    def runOnFunction(self, function):
+        live = set()
+        worklist = [inst for inst in function.instructions() if inst.hasSideEffects or self.mustKeep(inst)]
+        while worklist:
+            inst = worklist.pop()
+            if inst in live:
+                continue
+            live.add(inst)
+            worklist.extend(operand for operand in inst.operands if isinstance(operand, Instruction))
+
+        report = []
+        function.dead_stores = set()
+        for symbol, assigns in function.assigns.items():
+            dead = [assign for assign in assigns if assign not in live]
+            if len(dead) < len(assigns) and any(isinstance(assign.node, VariableDeclaration) for assign in dead):
+                dead = [assign for assign in dead if not isinstance(assign.node, VariableDeclaration)]
+            for assign in dead:
+                function.dead_stores.add(id(assign.node))
+                report.append(f"removed dead store to '{symbol.name}' on line {assign.node.line}")
+        return report
+
+    def mustKeep(self, inst):
+        if inst.op != 'assign':
+            return False
+        return inst.attr.name in self.globals or inst.node is None or hasSideEffects(inst.node.value)
@@ -0,0 +1,8 @@
+from .callGraph import *
+from .deadCode import *
+from .tailCalls import *
+from .purity import *
+from .memoize import *
+from .effects import *
+from .ctfe import *
+from .specialize import *
\ No newline at end of file
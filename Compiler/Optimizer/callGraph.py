@@ -0,0 +1,147 @@
+from Compiler.utils import *
+
+class CallGraph:
+    """
+    Records which functions each user function calls. Calls made outside of any function body
+    (top level program code) are stored under the key None.
+    """
+    def __init__(self, ast):
+        self.functions = {}     # name -> FunctionDeclaration
+        self.calls = {None: set()}
+        self.call_sites = {None: []}    # name -> FunctionCall nodes made inside that function
+        self.current_function = None
+        if ast is not None:
+            ast.accept(self)
+
+    def callees(self, name):
+        return self.calls.get(name, set())
+
+    def reachable(self):
+        """ Returns the names of all user functions that can be called starting from the top level code """
+        seen = set()
+        worklist = [callee for callee in self.calls[None] if callee in self.functions]
+        while worklist:
+            name = worklist.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            worklist.extend(callee for callee in self.callees(name) if callee in self.functions and callee not in seen)
+        return seen
+
+    def isRecursive(self, name):
+        """ True if the function can end up calling itself, directly or through other functions """
+        return any(self.reaches(callee, name) for callee in self.callees(name))
+
+    def reaches(self, start, target):
+        """ True if calling 'start' can lead to a call of 'target' (or start is target) """
+        seen = set()
+        worklist = [start]
+        while worklist:
+            name = worklist.pop()
+            if name == target:
+                return True
+            if name in seen or name not in self.functions:
+                continue
+            seen.add(name)
+            worklist.extend(self.callees(name))
+        return False
+
+    # ------------ Visitor ----------------- #
+
+    def visit_program(self, node):
+        for statement in node.statements:
+            if statement is not None:
+                statement.accept(self)
+
+    def visit_block(self, node):
+        for statement in node.statements:
+            if statement is not None:
+                statement.accept(self)
+
+    def visit_function_declaration(self, node):
+        self.functions[node.name] = node
+        self.calls.setdefault(node.name, set())
+        self.call_sites.setdefault(node.name, [])
+
+        previous_function = self.current_function
+        self.current_function = node.name
+        node.block.accept(self)
+        self.current_function = previous_function
+
+    def visit_function_call(self, node):
+        self.calls[self.current_function].add(node.name)
+        self.call_sites[self.current_function].append(node)
+        for arg in node.args:
+            arg.accept(self)
+
+    def visit_method_call(self, node):
+        node.receiver.accept(self)
+        for arg in node.args:
+            arg.accept(self)
+
+    def visit_variable(self, node):
+        if isinstance(node, (VariableDeclaration, VariableUpdated)) and node.value is not None:
+            node.value.accept(self)
+
+    def visit_if(self, node):
+        node.comparison.accept(self)
+        node.block.accept(self)
+        for elif_comparison, elif_block in node.elifNodes:
+            elif_comparison.accept(self)
+            elif_block.accept(self)
+        if node.elseBlock is not None:
+            node.elseBlock.accept(self)
+
+    def visit_while(self, node):
+        node.comparison.accept(self)
+        node.block.accept(self)
+
+    def visit_return(self, node):
+        node.value.accept(self)
+
+    def visit_argument(self, node):
+        node.value.accept(self)
+
+    def visit_string_cat(self, node):
+        for value in node.strings:
+            if isinstance(value, ASTNode):
+                value.accept(self)
+
+    def visit_binary_op(self, node):
+        node.left.accept(self)
+        node.right.accept(self)
+
+    def visit_comparison(self, node):
+        node.left.accept(self)
+        node.right.accept(self)
+
+    def visit_logical_op(self, node):
+        node.left.accept(self)
+        node.right.accept(self)
+
+    def visit_unary_op(self, node):
+        node.left.accept(self)
+
+    def visit_type_cast(self, node):
+        node.value.accept(self)
+
+    def visit_break(self, node):
+        pass
+
+    def visit_parameter(self, node):
+        pass
+
+    def visit_integer(self, node):
+        pass
+
+    def visit_double(self, node):
+        pass
+
+    def visit_boolean(self, node):
+        pass
+
+    def visit_string(self, node):
+        pass
+
+    def visit_null(self, node):
+        pass
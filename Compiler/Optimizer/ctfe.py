@@ -0,0 +1,268 @@
+import math
+from Compiler.utils import *
+from Compiler.MIR.passes import foldArithmetic, foldComparison, foldCast, foldConcat, wrap
+from .callGraph import CallGraph
+from .purity import PurityAnalyzer
+
+# Steps (statements, expressions and calls) a single call site may take before it is left to the runtime
+DEFAULT_FUEL = 100000
+# Deepest chain of nested calls the evaluator follows
+MAX_CALL_DEPTH = 50
+
+class NotConstant(Exception):
+    """ The call does something that can't be reproduced exactly at compile time """
+
+class OutOfFuel(NotConstant):
+    pass
+
+class BreakSignal(Exception):
+    pass
+
+class ReturnSignal(Exception):
+    def __init__(self, value):
+        self.value = value
+
+class CompileTimeEvaluator:
+    """
+    Runs calls of pure functions whose arguments are all literals at compile time and puts the result in
+    place of the call, e.g. 'fib(30)' becomes '832040'.
+
+    The evaluator walks the analyzed function body and folds every operation with the same rules as the
+    mid-level IR (64 bit wraparound, truncating division, '%f' formatting). Anything it can't reproduce
+    exactly (division by zero, method calls, string comparisons, ...) leaves the call to the runtime.
+    Every call site gets 'fuel' steps; when they run out the call is left alone too, so compilation
+    can't hang on a loop that never ends. Results are cached per function and arguments, which is sound
+    because the functions are pure.
+    """
+    def __init__(self, ast, fuel=DEFAULT_FUEL):
+        self.ast = ast
+        self.fuel = fuel
+        self.remaining = 0
+        self.depth = 0
+        self.functions = {}
+        self.pure = {}
+        self.cache = {}         # (name, arguments) -> result
+        self.env = {}           # symbol -> value, for the call being evaluated
+        self.evaluated = []
+        self.folded = 0         # calls replaced by their result
+
+    def run(self):
+        if has_error_occurred() or self.ast is None or self.fuel <= 0:
+            return self.evaluated
+        try:
+            graph = CallGraph(self.ast)
+            self.functions = graph.functions
+            self.pure = PurityAnalyzer(self.ast, graph).analyze()
+            rewrite(self.ast, self.foldCall)
+        except ExitSignal:
+            pass
+        except Exception as e:
+            throw(CompilationError(f"An error occurred during compile time evaluation: {e}"), exit=False)
+
+        return self.evaluated
+
+    def print_report(self):
+        for line in self.evaluated:
+            print(line)
+
+    # ------------ Helpers ----------------- #
+
+    def foldCall(self, node):
+        """ Replacement for a node of the tree: a literal for foldable calls, the node itself otherwise """
+        if not isinstance(node, FunctionCall) or not self.canEvaluate(node):
+            return node
+        args = [self.literalValue(arg.value) for arg in node.args]
+
+        self.remaining = self.fuel
+        try:
+            result = self.call(node.name, args)
+        except OutOfFuel:
+            self.evaluated.append(f"Line {node.line}: gave up on '{node.name}' after {self.fuel} steps")
+            return node
+        except (NotConstant, RecursionError, ArithmeticError, ValueError, TypeError):
+            return node
+
+        literal = self.literal(result, self.functions[node.name].return_type, node.line)
+        if literal is None:
+            return node
+        self.evaluated.append(f"Line {node.line}: '{node.name}({', '.join(str(arg.value) for arg in node.args)})' evaluated to {literal.value}")
+        self.folded += 1
+        return literal
+
+    def canEvaluate(self, node):
+        function = self.functions.get(node.name)
+        return (function is not None and self.pure.get(node.name, False) and function.return_type != 'void'
+                and all(isinstance(arg, Argument) and self.isLiteral(arg.value) for arg in node.args))
+
+    def isLiteral(self, node):
+        return isinstance(node, (Integer, Double, Boolean, String))
+
+    def literalValue(self, node):
+        if isinstance(node, Boolean):
+            return node.value == 'true'
+        return node.value
+
+    def literal(self, value, type_, line):
+        if type_ == 'integer' and type(value) is int:
+            return Integer(value, line)
+        if type_ == 'double' and type(value) is float and math.isfinite(value):
+            return Double(value, line)
+        if type_ == 'boolean' and type(value) is bool:
+            return Boolean('true' if value else 'false', line)
+        if type_ == 'string' and type(value) is str:
+            return String(value, line=line)
+        return None
+
+    def typeOf(self, value):
+        if type(value) is bool:
+            return 'boolean'
+        if type(value) is int:
+            return 'integer'
+        if type(value) is float:
+            return 'double'
+        if type(value) is str:
+            return 'string'
+        raise NotConstant()
+
+    def step(self):
+        self.remaining -= 1
+        if self.remaining < 0:
+            raise OutOfFuel()
+
+    def call(self, name, args):
+        self.step()
+        key = (name, tuple((self.typeOf(arg), repr(arg)) for arg in args))
+        if key in self.cache:
+            return self.cache[key]
+        function = self.functions.get(name)
+        if function is None or not self.pure.get(name, False) or self.depth >= MAX_CALL_DEPTH:
+            raise NotConstant()
+
+        previous_env = self.env
+        self.env = {param.symbol: arg for param, arg in zip(function.parameters, args)}
+        self.depth += 1
+        try:
+            self.run_statements(function.block.statements)
+            raise NotConstant()     # ran off the end without returning a value
+        except ReturnSignal as signal:
+            result = signal.value
+        finally:
+            self.env = previous_env
+            self.depth -= 1
+
+        if result is None or self.typeOf(result) != function.return_type:
+            raise NotConstant()
+        self.cache[key] = result
+        return result
+
+    def run_statements(self, statements):
+        for statement in statements:
+            if statement is not None:
+                self.step()
+                statement.accept(self)
+
+    def evaluate(self, node):
+        self.step()
+        value = node.accept(self)
+        if value is None or (type(value) is float and not math.isfinite(value)):
+            raise NotConstant()
+        return value
+
+    # ------------ Statements ----------------- #
+
+    def visit_block(self, node):
+        self.run_statements(node.statements)
+
+    def visit_function_declaration(self, node):
+        pass    # declaring a function does nothing at runtime
+
+    def visit_variable(self, node):
+        if isinstance(node, (VariableDeclaration, VariableUpdated)):
+            if node.symbol is None:
+                raise NotConstant()
+            self.env[node.symbol] = self.evaluate(node.value)
+            return None
+        if node.symbol not in self.env:
+            raise NotConstant()
+        return self.env[node.symbol]
+
+    def visit_if(self, node):
+        if self.evaluate(node.comparison):
+            return node.block.accept(self)
+        for comparison, block in node.elifNodes:
+            if self.evaluate(comparison):
+                return block.accept(self)
+        if node.elseBlock is not None:
+            node.elseBlock.accept(self)
+
+    def visit_while(self, node):
+        while self.evaluate(node.comparison):
+            try:
+                node.block.accept(self)
+            except BreakSignal:
+                break
+
+    def visit_break(self, node):
+        raise BreakSignal()
+
+    def visit_return(self, node):
+        raise ReturnSignal(None if isinstance(node.value, Null) else self.evaluate(node.value))
+
+    # ------------ Expressions ----------------- #
+
+    def visit_function_call(self, node):
+        return self.call(node.name, [self.evaluate(arg) for arg in node.args])
+
+    def visit_method_call(self, node):
+        raise NotConstant()
+
+    def visit_argument(self, node):
+        return self.evaluate(node.value)
+
+    def visit_string_cat(self, node):
+        if node.evaluated is not None:
+            return node.evaluated.value
+        values = [self.evaluate(value) if isinstance(value, ASTNode) else value for value in node.strings]
+        return foldConcat(values, [self.typeOf(value) for value in values])
+
+    def visit_binary_op(self, node):
+        left, right = self.evaluate(node.left), self.evaluate(node.right)
+        return foldArithmetic(node.operator, left, right, self.typeOf(left))
+
+    def visit_comparison(self, node):
+        left, right = self.evaluate(node.left), self.evaluate(node.right)
+        return foldComparison(node.operator, left, right, self.typeOf(left))
+
+    def visit_logical_op(self, node):
+        # both sides are always evaluated at runtime too
+        left, right = self.evaluate(node.left), self.evaluate(node.right)
+        return left and right if node.operator == '&&' else left or right
+
+    def visit_unary_op(self, node):
+        operand = self.evaluate(node.left)
+        if node.operator == '!':
+            return not operand
+        if node.operator == '-':
+            return wrap(-operand) if self.typeOf(operand) == 'integer' else -operand
+        return operand
+
+    def visit_type_cast(self, node):
+        return foldCast(self.evaluate(node.value), node.type)
+
+    def visit_integer(self, node):
+        return wrap(node.value)
+
+    def visit_double(self, node):
+        return node.value
+
+    def visit_boolean(self, node):
+        return node.value == 'true'
+
+    def visit_string(self, node):
+        return node.value
+
+    def visit_null(self, node):
+        return None
+
+    def visit_parameter(self, node):
+        return None
@@ -0,0 +1,254 @@
+from Compiler.utils import *
+from .callGraph import CallGraph
+
+class DeadCodeEliminator:
+    """
+    Removes code that can never run from the analyzed AST before it reaches the generator:
+        - statements after a return/break (or after an if whose every branch returns or breaks)
+        - if/elif/else branches and while loops whose condition is a compile time constant
+        - user functions that are never called
+    Every removal is recorded so it can be reported back to the user.
+    """
+    def __init__(self, ast):
+        self.ast = ast
+        self.removed = []
+
+    def eliminate(self):
+        if has_error_occurred() or self.ast is None:
+            return self.removed
+        try:
+            self.ast.accept(self)
+            self.removeUnusedFunctions()
+        except ExitSignal:
+            pass
+        except Exception as e:
+            throw(CompilationError(f"An error occurred during dead code elimination: {e}"), exit=False)
+
+        return self.removed
+
+    def print_report(self):
+        if not self.removed:
+            print("  Nothing was removed")
+        for entry in self.removed:
+            print(f"  {entry}")
+
+    # ------------ Visitor ----------------- #
+    # Every visit returns the node that should take its place, or None if it should be dropped
+
+    def visit_program(self, node):
+        node.statements = self.pruneStatements(node.statements)
+        return node
+
+    def visit_block(self, node):
+        node.statements = self.pruneStatements(node.statements)
+        return node
+
+    def visit_function_declaration(self, node):
+        # the body shares the function's scope, so we prune its statements instead of visiting it as a Block
+        node.block.statements = self.pruneStatements(node.block.statements)
+        return node
+
+    def visit_if(self, node):
+        arms = [(node.comparison, node.block)] + list(node.elifNodes)
+        live_arms = []
+        else_block = node.elseBlock
+
+        for index, (comparison, block) in enumerate(arms):
+            condition = self.constantCondition(comparison)
+            if condition is False:
+                self.record(f"branch with a condition that is always false '{str(comparison)}'", node)
+                continue
+
+            block.accept(self)
+            if condition is True:
+                skipped = len(arms) - index - 1 + (1 if node.elseBlock is not None else 0)
+                if skipped > 0:
+                    self.record(f"{skipped} branch(es) after the condition '{str(comparison)}' that is always true", node)
+                # an always true arm behaves like an else block
+                else_block = block
+                break
+            live_arms.append((comparison, block))
+        else:
+            if else_block is not None:
+                else_block.accept(self)
+
+        if not live_arms:
+            return else_block   # None drops the whole statement
+
+        node.comparison, node.block = live_arms[0]
+        node.elifNodes = live_arms[1:]
+        node.elseBlock = else_block
+        return node
+
+    def visit_while(self, node):
+        if self.constantCondition(node.comparison) is False:
+            self.record(f"while loop with a condition that is always false '{str(node.comparison)}'", node)
+            return None
+        node.block.accept(self)
+        return node
+
+    def visit_variable(self, node):
+        return node
+
+    def visit_return(self, node):
+        return node
+
+    def visit_break(self, node):
+        return node
+
+    def visit_function_call(self, node):
+        return node
+
+    def visit_method_call(self, node):
+        return node
+
+    def visit_argument(self, node):
+        return node
+
+    def visit_parameter(self, node):
+        return node
+
+    def visit_string_cat(self, node):
+        return node
+
+    def visit_binary_op(self, node):
+        return node
+
+    def visit_comparison(self, node):
+        return node
+
+    def visit_logical_op(self, node):
+        return node
+
+    def visit_unary_op(self, node):
+        return node
+
+    def visit_type_cast(self, node):
+        return node
+
+    def visit_integer(self, node):
+        return node
+
+    def visit_double(self, node):
+        return node
+
+    def visit_boolean(self, node):
+        return node
+
+    def visit_string(self, node):
+        return node
+
+    def visit_null(self, node):
+        return node
+
+    # ------------ Helpers ----------------- #
+
+    def record(self, description, node=None):
+        line = getattr(node, 'line', None)
+        _ = f" on line {line}" if line is not None else ""
+        self.removed.append(f"Removed {description}{_}")
+
+    def pruneStatements(self, statements):
+        """ Visits a list of statements, dropping everything that follows a statement that always terminates """
+        kept = []
+        for index, statement in enumerate(statements):
+            if statement is None:
+                continue
+            statement = statement.accept(self)
+            if statement is None:
+                continue
+
+            kept.append(statement)
+            if self.terminates(statement):
+                for unreachable in statements[index + 1:]:
+                    if unreachable is not None:
+                        self.record(f"unreachable statement {repr(unreachable)}", unreachable)
+                break
+        return kept
+
+    def terminates(self, statement):
+        """ Whether control can never fall through to the statement after this one """
+        if isinstance(statement, (Return, Break)):
+            return True
+        if isinstance(statement, Block):
+            return len(statement.statements) > 0 and self.terminates(statement.statements[-1])
+        if isinstance(statement, If):
+            if statement.elseBlock is None:
+                return False
+            blocks = [statement.block] + [block for _, block in statement.elifNodes] + [statement.elseBlock]
+            return all(self.terminates(block) for block in blocks)
+        return False
+
+    def constantCondition(self, expr):
+        """ Returns True/False for conditions made up only of literals, None if it depends on runtime values """
+        value = self.constantValue(expr)
+        return value if isinstance(value, bool) else None
+
+    def constantValue(self, expr):
+        if isinstance(expr, Boolean):
+            return expr.value == 'true'
+        if isinstance(expr, (Integer, Double, String)):
+            return expr.value
+
+        if isinstance(expr, UnaryOp):
+            operand = self.constantValue(expr.left)
+            if expr.operator == '!' and isinstance(operand, bool):
+                return not operand
+            return None
+
+        if isinstance(expr, LogicalOp):
+            # both sides are always evaluated at runtime, so both must be constant
+            left, right = self.constantValue(expr.left), self.constantValue(expr.right)
+            if not isinstance(left, bool) or not isinstance(right, bool):
+                return None
+            return (left and right) if expr.operator == '&&' else (left or right)
+
+        if isinstance(expr, Comparison):
+            left, right = self.constantValue(expr.left), self.constantValue(expr.right)
+            if left is None or right is None:
+                return None
+            if isinstance(left, bool) or isinstance(right, bool) or isinstance(left, str) or isinstance(right, str):
+                # booleans and strings only support (in)equality with a value of the same type
+                if type(left) != type(right) or expr.operator not in ['==', '!=']:
+                    return None
+                return (left == right) if expr.operator == '==' else (left != right)
+
+            if isinstance(left, float) or isinstance(right, float):
+                left, right = float(left), float(right)
+            operators = {
+                '==': lambda x, y: x == y,
+                '!=': lambda x, y: x != y,
+                '<': lambda x, y: x < y,
+                '<=': lambda x, y: x <= y,
+                '>': lambda x, y: x > y,
+                '>=': lambda x, y: x >= y,
+            }
+            op_func = operators.get(expr.operator)
+            return op_func(left, right) if op_func else None
+
+        return None
+
+    def removeUnusedFunctions(self):
+        graph = CallGraph(self.ast)
+        live = graph.reachable()
+        unused = set(graph.functions) - live
+        if unused:
+            self.ast.statements = self.removeFunctions(self.ast.statements, unused)
+
+    def removeFunctions(self, statements, unused):
+        kept = []
+        for statement in statements:
+            if isinstance(statement, FunctionDeclaration):
+                if statement.name in unused:
+                    self.record(f"unused function '{statement.name}'")
+                    continue
+                statement.block.statements = self.removeFunctions(statement.block.statements, unused)
+            elif isinstance(statement, (Block, While)):
+                block = statement if isinstance(statement, Block) else statement.block
+                block.statements = self.removeFunctions(block.statements, unused)
+            elif isinstance(statement, If):
+                for block in [statement.block] + [block for _, block in statement.elifNodes] + [statement.elseBlock]:
+                    if block is not None:
+                        block.statements = self.removeFunctions(block.statements, unused)
+            kept.append(statement)
+        return kept
@@ -0,0 +1,140 @@
+from Compiler.utils import *
+from .callGraph import CallGraph
+from .purity import PurityAnalyzer
+from .memoize import SCALAR_TYPES
+
+# How much memory a function may touch, from least to most
+MEMORY_EFFECTS = ['none', 'read', 'any']
+
+# Comparisons a counting loop may use, with the direction its counter has to move in
+COUNTING_DIRECTIONS = {'<': '+', '<=': '+', '>': '-', '>=': '-'}
+
+class EffectAnalyzer:
+    """
+    Works out what every user function does besides computing its result, so the generator can tell LLVM
+    through function attributes and calls can be reused, hoisted out of loops or dropped when unused:
+        - function.memory: 'none' if it touches no memory at all (a pure function of integers, doubles and
+          booleans), 'read' if it only reads memory (a pure function that looks at strings without building
+          any) and 'any' otherwise, e.g. when it prints, reads input, builds strings or is memoized
+        - function.recursive: whether it can end up calling itself
+        - function.terminates: whether it always returns. Only proven for functions that aren't recursive,
+          only call functions that terminate and whose loops all count a local integer up or down to a bound
+    A function touches at least as much memory as the functions it calls.
+    """
+    def __init__(self, ast):
+        self.ast = ast
+        self.effects = []
+
+    def run(self):
+        if has_error_occurred() or self.ast is None:
+            return self.effects
+        try:
+            graph = CallGraph(self.ast)
+            purity = PurityAnalyzer(self.ast, graph)
+            purity.analyze()
+
+            for name, function in graph.functions.items():
+                function.memory = self.localMemory(function, purity)
+                function.recursive = graph.isRecursive(name)
+                function.terminates = False
+
+            # memory effects spread from callees to their callers, termination from callees that terminate
+            changed = True
+            while changed:
+                changed = False
+                for name, function in graph.functions.items():
+                    callees = [graph.functions[callee] for callee in graph.callees(name) if callee in graph.functions]
+                    memory = max([function.memory] + [callee.memory for callee in callees], key=MEMORY_EFFECTS.index)
+                    if memory != function.memory:
+                        function.memory = memory
+                        changed = True
+                    if not function.terminates and not function.recursive and self.loopsTerminate(function) \
+                            and all(callee.terminates for callee in callees):
+                        function.terminates = True
+                        changed = True
+
+            for name, function in graph.functions.items():
+                self.effects.append(f"Function '{name}' {self.describe(function)}")
+        except ExitSignal:
+            pass
+        except Exception as e:
+            throw(CompilationError(f"An error occurred while analyzing the side effects of functions: {e}"), exit=False)
+
+        return self.effects
+
+    def print_report(self):
+        if not self.effects:
+            print("  No functions to analyze")
+        for entry in self.effects:
+            print(f"  {entry}")
+
+    # ------------ Helpers ----------------- #
+
+    def describe(self, function):
+        memory = {'none': "touches no memory", 'read': "only reads memory", 'any': "may write memory"}[function.memory]
+        recursion = "is recursive" if function.recursive else "is not recursive"
+        termination = "always returns" if function.terminates else "may not return"
+        return f"{memory}, {recursion} and {termination}"
+
+    def localMemory(self, function, purity):
+        """ The memory the function's own body touches, leaving out the functions it calls """
+        # memo tables are written on every miss, returned strings are moved into the caller's region
+        if function.memoize or not purity.isPure(function.name) or function.return_type == 'string':
+            return 'any'
+
+        memory = 'none' if all(param.type in SCALAR_TYPES for param in function.parameters) else 'read'
+        for node in walk(function.block):
+            if isinstance(node, StringCat) and node.evaluated is None:
+                return 'any'    # built in the string arena
+            if isinstance(node, (VariableUpdated, FunctionCall, MethodCall)) and node.evaluateType() == 'string':
+                return 'any'    # may be copied into (or built in) the string arena
+            if isinstance(node, (String, StringCat, MethodCall)) or \
+                    (isinstance(node, VariableReference) and node.evaluateType() == 'string'):
+                memory = 'read'
+        return memory
+
+    def loopsTerminate(self, function):
+        local_symbols = {id(node.symbol) for node in walk(function)
+                         if isinstance(node, (VariableDeclaration, Parameter)) and node.symbol is not None}
+        return all(self.isCountingLoop(loop, local_symbols) for loop in walk(function.block) if isinstance(loop, While))
+
+    def isCountingLoop(self, loop, local_symbols):
+        """
+        Whether the loop is 'while (i < bound)' (or '<=', '>', '>=') over a local integer i that moves one
+        step towards the bound on every iteration, with neither i nor the bound changed anywhere else in it
+        """
+        comparison = loop.comparison
+        if not isinstance(comparison, Comparison) or comparison.operator not in COUNTING_DIRECTIONS:
+            return False
+        counter, bound = comparison.left, comparison.right
+        if not isinstance(counter, VariableReference) or id(counter.symbol) not in local_symbols:
+            return False
+        if counter.evaluateType() != 'integer' or bound.evaluateType() != 'integer':
+            return False
+
+        watched = [counter.symbol]
+        if isinstance(bound, Integer):
+            # 'i <= bound' holds for every integer when bound is the largest one
+            if comparison.operator in ('<=', '>=') and abs(bound.value) >= 2 ** 63 - 1:
+                return False
+        elif isinstance(bound, VariableReference) and id(bound.symbol) in local_symbols:
+            if comparison.operator in ('<=', '>='):
+                return False
+            watched.append(bound.symbol)
+        else:
+            return False
+
+        direction = COUNTING_DIRECTIONS[comparison.operator]
+        steps = [statement for statement in loop.block.statements if self.isStep(statement, counter.symbol, direction)]
+        updates = [node for node in walk(loop.block)
+                   if isinstance(node, VariableUpdated) and any(node.symbol is symbol for symbol in watched)]
+        return len(steps) == 1 and len(updates) == 1
+
+    def isStep(self, statement, symbol, direction):
+        """ Whether the statement is 'i = i + 1' ('i = i - 1' for direction '-') """
+        if not isinstance(statement, VariableUpdated) or statement.symbol is not symbol:
+            return False
+        value = statement.value
+        return isinstance(value, BinaryOp) and value.operator == direction \
+            and isinstance(value.left, VariableReference) and value.left.symbol is symbol \
+            and isinstance(value.right, Integer) and value.right.value == 1
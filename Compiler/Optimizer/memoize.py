@@ -0,0 +1,64 @@
+from Compiler.utils import *
+from .callGraph import CallGraph
+from .purity import PurityAnalyzer
+
+# Only these types fit in a memo table slot
+SCALAR_TYPES = ['integer', 'double', 'boolean']
+
+class Memoizer:
+    """
+    Picks the functions whose results are cached in a memo table by the generator (function.memoize):
+        - functions annotated with '@memo'
+        - pure functions that call themselves from at least two places (e.g. fib(n - 1) + fib(n - 2)),
+          which is what makes naive recursion recompute the same calls over and over
+    Only functions whose parameters and return value are integers, doubles or booleans can be memoized.
+    """
+    def __init__(self, ast, enabled=True):
+        self.ast = ast
+        self.enabled = enabled
+        self.memoized = []
+
+    def run(self):
+        if has_error_occurred() or self.ast is None or not self.enabled:
+            return self.memoized
+        try:
+            graph = CallGraph(self.ast)
+            purity = PurityAnalyzer(self.ast, graph)
+            purity.analyze()
+
+            for name, function in graph.functions.items():
+                requested = 'memo' in function.annotations
+                if not self.hasScalarSignature(function):
+                    if requested:
+                        report(f"Function '{name}' can not be memoized, only functions taking and returning integers, doubles or booleans can be. '@memo' will be ignored", type_="Warning", error=False, line=function.line)
+                    continue
+
+                if requested:
+                    if not purity.isPure(name):
+                        report(f"Function '{name}' is memoized but is not pure. Its side effects will only happen the first time it is called with a set of arguments", type_="Warning", error=False, line=function.line)
+                    function.memoize = True
+                    self.memoized.append(f"Function '{name}' is memoized ('@memo')")
+                elif purity.isPure(name) and self.recursiveCallSites(graph, name) >= 2:
+                    function.memoize = True
+                    self.memoized.append(f"Function '{name}' is pure and recursive and will be memoized")
+        except ExitSignal:
+            pass
+        except Exception as e:
+            throw(CompilationError(f"An error occurred while looking for functions to memoize: {e}"), exit=False)
+
+        return self.memoized
+
+    def print_report(self):
+        if not self.memoized:
+            print("  No functions were memoized")
+        for entry in self.memoized:
+            print(f"  {entry}")
+
+    # ------------ Helpers ----------------- #
+
+    def hasScalarSignature(self, function):
+        return function.return_type in SCALAR_TYPES and all(param.type in SCALAR_TYPES for param in function.parameters)
+
+    def recursiveCallSites(self, graph, name):
+        """ Counts the calls inside the function that can lead back to it """
+        return sum(1 for call in graph.call_sites.get(name, []) if graph.reaches(call.name, name))
@@ -0,0 +1,148 @@
+from Compiler.utils import *
+from .callGraph import CallGraph
+
+# Built in functions that read or write the outside world
+IMPURE_BUILTINS = ['print', 'input']
+
+class PurityAnalyzer:
+    """
+    Decides which user functions are pure, i.e. always give the same result for the same arguments
+    and do nothing else. A function is pure when:
+        - it never calls print or input, directly or through the functions it calls
+        - it only reads and writes its own parameters and the variables it declares itself
+        - every user function it calls is pure as well
+    """
+    def __init__(self, ast, graph=None):
+        self.ast = ast
+        self.graph = graph if graph is not None else CallGraph(ast)
+        self.pure = {}      # function name -> bool
+        self.locals = set()
+        self.impure = False
+
+    def analyze(self):
+        # a function is impure on its own if its body is, or it calls something we know nothing about
+        for name, function in self.graph.functions.items():
+            self.pure[name] = self.isLocallyPure(function) and all(
+                callee in self.graph.functions for callee in self.graph.callees(name)
+                if callee not in BuiltInFunctions.BUILTINS
+            )
+
+        # impurity spreads from callees to their callers until nothing changes
+        changed = True
+        while changed:
+            changed = False
+            for name in self.graph.functions:
+                if self.pure[name] and any(not self.pure.get(callee, True) for callee in self.graph.callees(name)):
+                    self.pure[name] = False
+                    changed = True
+
+        return self.pure
+
+    def isPure(self, name):
+        return self.pure.get(name, False)
+
+    # ------------ Helpers ----------------- #
+
+    def isLocallyPure(self, function):
+        self.locals = {param.name for param in function.parameters}
+        self.impure = False
+        for statement in function.block.statements:
+            statement.accept(self)
+        return not self.impure
+
+    def visitAll(self, nodes):
+        for node in nodes:
+            if node is not None:
+                node.accept(self)
+
+    # ------------ Visitor ----------------- #
+
+    def visit_program(self, node):
+        self.visitAll(node.statements)
+
+    def visit_block(self, node):
+        self.visitAll(node.statements)
+
+    def visit_function_declaration(self, node):
+        pass    # nested functions are judged on their own
+
+    def visit_variable(self, node):
+        if isinstance(node, VariableDeclaration):
+            node.value.accept(self)
+            self.locals.add(node.name)
+        elif isinstance(node, VariableUpdated):
+            node.value.accept(self)
+            if node.name not in self.locals:
+                self.impure = True
+        elif node.name not in self.locals:
+            self.impure = True
+
+    def visit_if(self, node):
+        node.comparison.accept(self)
+        node.block.accept(self)
+        for elif_comparison, elif_block in node.elifNodes:
+            elif_comparison.accept(self)
+            elif_block.accept(self)
+        if node.elseBlock is not None:
+            node.elseBlock.accept(self)
+
+    def visit_while(self, node):
+        node.comparison.accept(self)
+        node.block.accept(self)
+
+    def visit_return(self, node):
+        node.value.accept(self)
+
+    def visit_function_call(self, node):
+        if node.name in IMPURE_BUILTINS:
+            self.impure = True
+        self.visitAll(node.args)
+
+    def visit_method_call(self, node):
+        node.receiver.accept(self)
+        self.visitAll(node.args)
+
+    def visit_argument(self, node):
+        node.value.accept(self)
+
+    def visit_string_cat(self, node):
+        self.visitAll(value for value in node.strings if isinstance(value, ASTNode))
+
+    def visit_binary_op(self, node):
+        node.left.accept(self)
+        node.right.accept(self)
+
+    def visit_comparison(self, node):
+        node.left.accept(self)
+        node.right.accept(self)
+
+    def visit_logical_op(self, node):
+        node.left.accept(self)
+        node.right.accept(self)
+
+    def visit_unary_op(self, node):
+        node.left.accept(self)
+
+    def visit_type_cast(self, node):
+        node.value.accept(self)
+
+    def visit_break(self, node):
+        pass
+
+    def visit_parameter(self, node):
+        pass
+
+    def visit_integer(self, node):
+        pass
+
+    def visit_double(self, node):
+        pass
+
+    def visit_boolean(self, node):
+        pass
+
+    def visit_string(self, node):
+        pass
+
+    def visit_null(self, node):
+        pass
@@ -0,0 +1,123 @@
+import copy
+from Compiler.utils import *
+from .callGraph import CallGraph
+
+# Functions with more nodes than this are never cloned
+MAX_FUNCTION_SIZE = 200
+# Total number of nodes all clones together may add to the program
+DEFAULT_BUDGET = 2000
+# How often the specializer and the MIR folding take turns. A clone can make the arguments of the calls
+# inside it constant, which the next round specializes in turn (e.g. the chain of states of a state machine)
+MAX_ROUNDS = 4
+
+LITERALS = (Integer, Double, Boolean, String)
+
+class FunctionSpecializer:
+    """
+    Clones a function for every distinct set of literal arguments it is called with, e.g.
+    'stateMachine(0, value)' calls a copy of stateMachine whose 'currentState' is declared as a local set
+    to 0 instead of being a parameter. Folding then turns the parameter's uses into constants and dead code
+    elimination drops the branches that can no longer run. Calls with the same literal arguments share
+    one clone. Cloning stops once the clones would add more than 'budget' nodes to the program.
+    """
+    def __init__(self, ast, budget=DEFAULT_BUDGET):
+        self.ast = ast
+        self.budget = budget
+        self.clones = {}        # (name, constant arguments) -> cloned FunctionDeclaration
+        self.specialized = []
+
+    def run(self):
+        """ Runs one round, returns how many calls were redirected to a clone """
+        if has_error_occurred() or self.ast is None or self.budget <= 0:
+            return 0
+        redirected = 0
+        try:
+            graph = CallGraph(self.ast)
+            containers = self.findContainers()
+            for node in list(walk(self.ast)):
+                if isinstance(node, FunctionCall) and node.name in graph.functions:
+                    redirected += self.specialize(node, graph.functions[node.name], containers)
+        except ExitSignal:
+            pass
+        except Exception as e:
+            throw(CompilationError(f"An error occurred during function specialization: {e}"), exit=False)
+
+        return redirected
+
+    def print_report(self):
+        for line in self.specialized:
+            print(line)
+
+    # ------------ Helpers ----------------- #
+
+    def specialize(self, call, function, containers):
+        constants = [(index, arg.value) for index, arg in enumerate(call.args)
+                     if isinstance(arg, Argument) and isinstance(arg.value, LITERALS)]
+        if not constants or len(call.args) != len(function.parameters):
+            return 0
+
+        key = (function.name, tuple((index, type(value).__name__, repr(value.value)) for index, value in constants))
+        clone = self.clones.get(key)
+        if clone is None:
+            size = sum(1 for _ in walk(function))
+            if size > MAX_FUNCTION_SIZE or size > self.budget or id(function) not in containers:
+                return 0
+            clone = self.cloneFunction(function, constants, len(self.clones))
+            self.budget -= size
+            self.clones[key] = clone
+
+            statements = containers[id(function)]
+            position = next(index for index, statement in enumerate(statements) if statement is function)
+            statements.insert(position + 1, clone)
+            values = ", ".join(f"{function.parameters[index].name}={value}" for index, value in constants)
+            self.specialized.append(f"Function '{function.name}' specialized for {values} as '{clone.name}'")
+
+        constant_indices = {index for index, _ in constants}
+        call.name = clone.name
+        call.args = [arg for index, arg in enumerate(call.args) if index not in constant_indices]
+        return 1
+
+    def cloneFunction(self, function, constants, number):
+        """
+        Deep copies a function with its own symbols, so the generator gives the clone its own stack slots.
+        Nodes and symbols outside of the function are shared with the original.
+        """
+        inside = {id(node) for node in walk(function)}
+        local_symbols = {id(node.symbol) for node in walk(function)
+                         if isinstance(node, (VariableDeclaration, Parameter)) and node.symbol is not None}
+        memo = {}
+        for node in walk(function):
+            parent = getattr(node, 'parent', None)
+            if parent is not None and id(parent) not in inside:
+                memo[id(parent)] = parent
+            symbol = getattr(node, 'symbol', None)
+            if symbol is not None and id(symbol) not in local_symbols:
+                memo[id(symbol)] = symbol
+        clone = copy.deepcopy(function, memo)
+
+        clone.name = f"{function.name}.{number}"
+        constant_indices = {index for index, _ in constants}
+        declarations = []
+        for index, value in constants:
+            param = clone.parameters[index]
+            declaration = VariableDeclaration(param.name, copy.copy(value), function.line)
+            declaration.symbol = param.symbol
+            declarations.append(declaration)
+        clone.parameters = [param for index, param in enumerate(clone.parameters) if index not in constant_indices]
+        clone.arity = len(clone.parameters)
+        clone.block.statements = declarations + clone.block.statements
+        return clone
+
+    def findContainers(self):
+        """ Maps every function declaration to the statement list it sits in """
+        containers = {}
+        for node in walk(self.ast):
+            statements = None
+            if isinstance(node, (Program, Block)):
+                statements = node.statements
+            elif isinstance(node, FunctionDeclaration):
+                statements = node.block.statements
+            for statement in statements or []:
+                if isinstance(statement, FunctionDeclaration):
+                    containers[id(statement)] = statements
+        return containers
@@ -0,0 +1,82 @@
+from Compiler.utils import *
+from .callGraph import CallGraph
+
+class TailCallMarker:
+    """
+    Finds user function calls in tail position, i.e. calls after which the caller returns straight away:
+        - 'return f(...)'                      -> call.tail = 'return'
+        - 'f(...)' as the last thing a void function does (optionally followed by a bare 'return')
+                                               -> call.tail = 'void'
+    Functions that tail call themselves are flagged with tailRecursive so the generator can turn
+    those calls into a jump back to the top of the function instead of growing the stack.
+    """
+    def __init__(self, ast):
+        self.ast = ast
+        self.function = None
+        self.marked = []
+
+    def mark(self):
+        if has_error_occurred() or self.ast is None:
+            return self.marked
+        try:
+            for function in CallGraph(self.ast).functions.values():
+                self.function = function
+                self.markStatements(function.block.statements, in_tail=True)
+                if function.tailRecursive:
+                    self.marked.append(f"Function '{function.name}' tail calls itself and will run as a loop")
+            self.function = None
+        except ExitSignal:
+            pass
+        except Exception as e:
+            throw(CompilationError(f"An error occurred while looking for tail calls: {e}"), exit=False)
+
+        return self.marked
+
+    def print_report(self):
+        if not self.marked:
+            print("  No tail calls found")
+        for entry in self.marked:
+            print(f"  {entry}")
+
+    # ------------ Helpers ----------------- #
+
+    def markStatements(self, statements, in_tail):
+        for index, statement in enumerate(statements):
+            # a statement is still in tail position if only bare returns follow it
+            rest = statements[index + 1:]
+            is_tail = in_tail and all(isinstance(s, Return) and isinstance(s.value, Null) for s in rest)
+            self.markStatement(statement, is_tail)
+
+    def markStatement(self, statement, in_tail):
+        if isinstance(statement, Return):
+            # returning exits the function wherever it is, even from inside a loop
+            if isinstance(statement.value, FunctionCall):
+                kind = 'void' if self.function.return_type == 'void' else 'return'
+                self.markCall(statement.value, kind)
+
+        elif isinstance(statement, FunctionCall):
+            if in_tail and self.function.return_type == 'void':
+                self.markCall(statement, 'void')
+
+        elif isinstance(statement, If):
+            blocks = [statement.block] + [block for _, block in statement.elifNodes]
+            if statement.elseBlock is not None:
+                blocks.append(statement.elseBlock)
+            for block in blocks:
+                self.markStatements(block.statements, in_tail)
+
+        elif isinstance(statement, Block):
+            self.markStatements(statement.statements, in_tail)
+
+        elif isinstance(statement, While):
+            # the loop runs again after its body so nothing in it is in tail position (returns aside)
+            self.markStatements(statement.block.statements, False)
+
+    def markCall(self, call, kind):
+        if call.name in BuiltInFunctions.BUILTINS:
+            return
+        call.tail = kind
+        if call.name == self.function.name:
+            self.function.tailRecursive = True
+        else:
+            self.marked.append(f"Tail call to '{call.name}' in function '{self.function.name}' on line {call.line}")
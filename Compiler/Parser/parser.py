@@ -244,7 +244,27 @@ class Parser:
 
                 node = If(**base_args)
 
+            elif self.checkToken(TokenType.AT):
+                # Function annotations: '@memo' on the line(s) above a function declaration
+                annotations = []
+                while self.checkToken(TokenType.AT):
+                    self.match(TokenType.AT)
+                    annotation = self.currentToken.value
+                    self.match(TokenType.IDENTIFIER, errorMsg=f"Expected an annotation name after '@', got: '{annotation}'")
+                    if annotation not in FUNCTION_ANNOTATIONS:
+                        report(f"Unknown annotation '@{annotation}'. Supported annotations: {', '.join('@' + name for name in FUNCTION_ANNOTATIONS)}", type_="Syntax", line=self.lineNumber)
+                    annotations.append(annotation)
+                    self.nl()
+
+                if not self.checkToken(TokenType.FUNCTION):
+                    report("Annotations must be followed by a function declaration", type_="Syntax", line=self.lineNumber)
+                    self.panic()
+                else:
+                    node = self.statement()
+                    node.annotations = annotations
+
             elif self.checkToken(TokenType.FUNCTION):
+                line = self.lineNumber  # the body moves the parser on to the closing brace
                 self.match(TokenType.FUNCTION)
                 return_type = self.currentToken.value
                 self.match(TokenType.IDENTIFIER)
@@ -276,7 +296,7 @@ class Parser:
                 self.inFunctionBlock = True
                 function_body = self.block()
                 self.inFunctionBlock = False
-                node = FunctionDeclaration(function_name, return_type_tag, parameters, function_body, self.lineNumber)
+                node = FunctionDeclaration(function_name, return_type_tag, parameters, function_body, line)
             
             elif self.checkToken(TokenType.RETURN):
                 if self.inFunctionBlock == False:
@@ -641,15 +661,20 @@ class Parser:
     
     # for + and - operators
     def additive(self):
-        node = self.term()  # Additive comes after term in precedence
+        operands = [self.term()]  # Additive comes after term in precedence
+        operators = []
         while self.checkToken(TokenType.PLUS) or self.checkToken(TokenType.MINUS):
-            operator = self.currentToken.value
+            operators.append(self.currentToken.value)
             self.nextToken()
-            right = self.additive()
-            binOp = BinaryOp(node, operator, right, parent=self.currentNode, line=self.lineNumber)
+            operands.append(self.term())
+        
+        # built from the right without recursing, so chains with thousands of operands parse too. 
+        node = operands.pop()
+        while operators:
+            binOp = BinaryOp(operands.pop(), operators.pop(), node, parent=self.currentNode, line=self.lineNumber)
             binOp.left.parent = binOp
             binOp.right.parent = binOp
-            return binOp
+            node = binOp
         return node
 
     # for *, /, % operators 
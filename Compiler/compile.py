@@ -1,11 +1,14 @@
 import argparse
 import os
+import sys
 import llvmlite.ir as ir
 import llvmlite.binding as llvm
 from collections import deque
 from Compiler.Lexer import *
 from Compiler.Parser import *
 from Compiler.Analyzer import *
+from Compiler.MIR import *
+from Compiler.Optimizer import *
 from Compiler.Generator import *
 from Compiler.utils import *
 from ctypes import CFUNCTYPE, c_void_p
@@ -18,7 +21,7 @@ COLORS = {
     'reset': "\033[0m"
 }
 
-def compile(source_code, log_level):
+def compile(source_code, log_level, memoize=True, ctfe_fuel=DEFAULT_FUEL, specialize=True, ssa=False, line_buffered=False, pipeline=None):
     LOG_LEVELS = {
         0: "No Logging",
         1: "Minimal information",
@@ -58,6 +61,99 @@ def compile(source_code, log_level):
     log("The following Symbol table was returned:", 2, 'blue', action=lambda: symbol_table.print_table())  
     log("The analyzer returned this AST:", 3, 'blue', action=lambda: ast.print_content())  
 
+    # Mid-level IR optimizations
+    def optimize_mir():
+        mir_builder = MIRBuilder(ast)
+        mir = mir_builder.build()
+        if has_error_occurred() or mir is None:
+            return False
+
+        mir_report = PassManager().run(mir)
+        mir_feedback = MIRFeedback(ast, mir, mir_builder.values)
+        mir_feedback.apply()
+        if has_error_occurred():
+            return False
+
+        log(f"Mid-level IR optimizations completed! {len(mir_report)} change(s)", 1, 'green', immediate=True)
+        log("Optimized mid-level IR:", 3, 'blue', action=lambda: mir.print_content())
+        log("Mid-level IR report:", 2, 'blue', action=lambda: mir_feedback.print_report())
+        return True
+
+    if not optimize_mir():
+        flush_logs()
+        return
+
+    # Compile time function evaluation
+    evaluator = CompileTimeEvaluator(ast, fuel=ctfe_fuel)
+    evaluator.run()
+
+    if has_error_occurred():
+        flush_logs()
+        return
+
+    log("Compile time evaluation:", 2, 'blue', action=lambda: evaluator.print_report())
+
+    # Function specialization. Each round's clones are folded before the next round looks at their calls
+    specializer = FunctionSpecializer(ast, budget=DEFAULT_BUDGET if specialize else 0)
+    changed = evaluator.folded > 0     # the evaluated results are new constants to propagate
+    rounds = 0
+    while True:
+        if changed and not optimize_mir():
+            flush_logs()
+            return
+        if rounds == MAX_ROUNDS:
+            break
+        rounds += 1
+        changed = specializer.run() > 0
+        if has_error_occurred():
+            flush_logs()
+            return
+        if not changed:
+            break
+
+    log("Specialized functions:", 2, 'blue', action=lambda: specializer.print_report())
+
+    # Dead code elimination
+    dce = DeadCodeEliminator(ast)
+    removed = dce.eliminate()
+
+    if has_error_occurred():
+        flush_logs()
+        return
+
+    log(f"Dead code elimination completed! Removed {len(removed)} node(s)", 1, 'green', immediate=True)
+    log("Dead code elimination report:", 2, 'blue', action=lambda: dce.print_report())
+
+    # Tail calls
+    tail_call_marker = TailCallMarker(ast)
+    tail_calls = tail_call_marker.mark()
+
+    if has_error_occurred():
+        flush_logs()
+        return
+
+    log("Tail calls:", 2, 'blue', action=lambda: tail_call_marker.print_report())
+
+    # Memoization
+    memoizer = Memoizer(ast, enabled=memoize)
+    memoized = memoizer.run()
+
+    if has_error_occurred():
+        flush_logs()
+        return
+
+    log("Memoized functions:", 2, 'blue', action=lambda: memoizer.print_report())
+
+    # Side effects, after memoization since memo tables are written to
+    effect_analyzer = EffectAnalyzer(ast)
+    effect_analyzer.run()
+
+    if has_error_occurred():
+        flush_logs()
+        return
+
+    log("Function side effects:", 2, 'blue', action=lambda: effect_analyzer.print_report())
+
     # LLVM Initialization 
     try:
         llvm.initialize()
@@ -69,7 +165,7 @@ def compile(source_code, log_level):
         return
 
     # LLVM IR code generation phase
-    llvmir_gen = LLVMCodeGenerator(symbol_table)
+    llvmir_gen = LLVMCodeGenerator(symbol_table, ssa=ssa, line_buffered=line_buffered)
     llvm_ir = llvmir_gen.generate_code(ast)
 
     if has_error_occurred() or llvm_ir is None:
@@ -79,6 +175,7 @@ def compile(source_code, log_level):
     # LLVMIR verification
     try:
         mod = llvm.parse_assembly(str(llvm_ir))
+        llvmir_gen.linkRuntime(mod)
         mod.verify()
         log("LLVM IR generated:", 1, 'blue')
         log("---------------------------------------", 1)
@@ -91,22 +188,19 @@ def compile(source_code, log_level):
 
     # optimization passes
     try:
-        target = llvm.Target.from_default_triple()
-        target_machine = target.create_target_machine()
-
-        # Set up the pass manager and apply optimizations
-        pmb = llvm.create_pass_manager_builder()
-        pmb.opt_level = 3
-
-        pass_manager = llvm.create_module_pass_manager()
-        pmb.populate(pass_manager)
-
-        # Run the pass manager
-        pass_manager.run(mod)
+        if pipeline is None:
+            pipeline = OptimizationPipeline()
+        target_machine = pipeline.targetMachine()
+        pipeline.run(mod, target_machine)
     except Exception as e:
         log(f"An error occurred during the LLVM optimization pass: {e}", 0, 'red', immediate=True)
         flush_logs()
         return  # Avoid proceeding if there's an error
+
+    if pipeline.stats:
+        log("Optimization statistics:", 0, 'blue', action=lambda: pipeline.print_stats())
+    if pipeline.timings:
+        log(None, 0, action=lambda: print(pipeline.timings))
     
     # print logs
     if not has_error_occurred():
@@ -126,6 +220,7 @@ def compile(source_code, log_level):
 
                 main_ptr = engine.get_function_address("main")
                 if main_ptr:
+                    sys.stdout.flush()  # the program writes to the file descriptor directly, after the logs
                     c_main = CFUNCTYPE(None)(main_ptr)
                     c_main()  # Call the main function
                 else:
@@ -133,9 +228,6 @@ def compile(source_code, log_level):
     except Exception as e:
         log(f"Execution failed: {str(e)}", 0, 'red', immediate=True)
 
-    # Shutdown LLVM and return stdout
-    llvm.shutdown()
-
 def flush_logs():
     """Flushes the log queue immediately."""
     while log_queue:
@@ -150,8 +242,41 @@ def main():
     parser.add_argument('file', metavar='FILE', type=str, help='source .g file to compile')
     parser.add_argument('--log', type=int, default=0, choices=[0, 1, 2, 3],
                         help='set the verbosity level (0:none 1: minimal, 2: intermediate, 3: full)')
+    parser.add_argument('--no-memo', action='store_true',
+                        help='do not cache the results of pure recursive functions or functions annotated with @memo')
+    parser.add_argument('--no-specialize', action='store_true',
+                        help='do not clone functions for the literal arguments they are called with')
+    parser.add_argument('--ctfe-fuel', type=int, default=DEFAULT_FUEL, metavar='STEPS',
+                        help=f'steps each call of a pure function with constant arguments may take when it is evaluated at compile time, 0 disables it (default: {DEFAULT_FUEL})')
+
+    parser.add_argument('-O', dest='opt', default='3', choices=list(OPT_LEVELS),
+                        help='optimization level: 0 to 3, s to also keep the code small or z to keep it as small as possible (default: 3)')
+    parser.add_argument('--inline-threshold', type=int, metavar='N',
+                        help='how large a function LLVM may inline, larger inlines more (default: the one clang uses for the level)')
+    parser.add_argument('--loop-vectorize', action=argparse.BooleanOptionalAction,
+                        help='turn the loop vectorizer on or off (default: on from -O2, except for -Oz)')
+    parser.add_argument('--slp-vectorize', action=argparse.BooleanOptionalAction,
+                        help='turn the SLP vectorizer, which combines similar instructions, on or off (default: as --loop-vectorize)')
+    parser.add_argument('--passes', metavar='LIST',
+                        help="run exactly these LLVM passes instead of the ones the level picks, comma separated, e.g. 'sroa,instruction_combining,gvn'")
+    parser.add_argument('--time-passes', action='store_true',
+                        help='print how long every LLVM pass took')
+    parser.add_argument('--opt-stats', action='store_true',
+                        help='print the size of the program before and after optimizing it, and how long that took')
+
+    parser.add_argument('--ssa', action='store_true',
+                        help='keep variables in registers while generating code instead of leaving that to LLVM')
+    parser.add_argument('--line-buffered', action='store_true',
+                        help='write the output after every printed line instead of in large blocks, for interactive programs')
 
     args = parser.parse_args()
+    try:
+        pipeline = OptimizationPipeline.fromFlag(args.opt, inline_threshold=args.inline_threshold,
+                                                 loop_vectorize=args.loop_vectorize, slp_vectorize=args.slp_vectorize,
+                                                 passes=args.passes.split(',') if args.passes is not None else None,
+                                                 time_passes=args.time_passes, stats=args.opt_stats)
+    except ValueError as e:
+        parser.error(str(e))
 
     file_name = args.file
 
@@ -166,7 +291,9 @@ def main():
     with open(file_name, 'r') as file:
         source_code = file.read()
 
-    compile(source_code, log_level=args.log)
+    compile(source_code, log_level=args.log, memoize=not args.no_memo, ctfe_fuel=args.ctfe_fuel, specialize=not args.no_specialize, ssa=args.ssa, line_buffered=args.line_buffered, pipeline=pipeline)
+    # LLVM can't be used again once it is shut down, so only the command line does it, on its way out
+    llvm.shutdown()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
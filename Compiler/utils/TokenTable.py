@@ -42,6 +42,7 @@ class TokenType(Enum):
     DOT = 13        # .
     COLON = 14      # :
     QMARK = 15      # ?
+    AT = 16         # @
     # -------------------------------- #
     # Keywords.
     WHILE = 101
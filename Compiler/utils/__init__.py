@@ -3,4 +3,5 @@ from .error import *
 from .builtInFunctions import *
 from .symbolTable import *
 from .methodTable import *
-from .TokenTable import *
\ No newline at end of file
+from .TokenTable import *
+from .astWalk import *
\ No newline at end of file
@@ -29,6 +29,7 @@ class Program(ASTNode):
 class Block(ASTNode):
     def __init__(self, statements):
         self.statements = statements
+        self.scope = None   # set in analyzer
 
     def __eq__(self, other):
         return isinstance(other, Block) and self.statements == other.statements
@@ -53,6 +54,7 @@ class VariableDeclaration(ASTNode):
         self.value = value
         self.annotation = annotation
         self.line = line
+        self.symbol = None  # set in analyzer
     
     def evaluateType(self):
         if self.value is not None:
@@ -91,6 +93,7 @@ class VariableReference(ASTNode):
         self.value = None
         self.type = None
         self.scope = None
+        self.symbol = None
         
     def evaluateType(self):
         if self.type is not None:
@@ -118,6 +121,7 @@ class VariableUpdated(ASTNode):
         self.name = name
         self.value = value
         self.line = line
+        self.symbol = None  # set in analyzer
     
     def evaluateType(self):
         if self.value is not None:
@@ -146,13 +150,20 @@ class VariableUpdated(ASTNode):
             print(" " * (indent + 2) + "Value: None")
 
 class FunctionDeclaration(ASTNode):
-    def __init__(self, name, return_type, parameters, block, line=None):
+    def __init__(self, name, return_type, parameters, block, line=None, annotations=None):
         self.name = name
         self.return_type = return_type
         self.parameters = parameters
         self.block = block
         self.arity = len(parameters)
         self.line = line
+        self.annotations = annotations or []    # e.g. ['memo'] for '@memo'
+        self.scope = None   # set in analyzer
+        self.tailRecursive = False  # set in optimizer
+        self.memoize = False        # set in optimizer
+        self.memory = 'any'         # set in optimizer
+        self.recursive = True       # set in optimizer
+        self.terminates = False     # set in optimizer
     
     def __eq__(self, other):
         return (isinstance(other, FunctionDeclaration) and
@@ -172,6 +183,8 @@ class FunctionDeclaration(ASTNode):
     
     def print_content(self, indent=0):
         print(" " * indent + f"FunctionDeclaration: {self.name} (return_type: {self.return_type})")
+        if self.annotations:
+            print(" " * (indent + 2) + f"Annotations: {', '.join('@' + name for name in self.annotations)}")
         print(" " * (indent + 2) + f"Parameters: ({self.parameters})")
         self.block.print_content(indent + 2)
 
@@ -223,6 +236,7 @@ class Parameter(ASTNode):
     def __init__(self, name, type):
         self.name = name
         self.type = type
+        self.symbol = None  # set in analyzer
     
     def evaluateType(self):
         return self.type
@@ -251,6 +265,7 @@ class FunctionCall(ASTNode):
         self.line = line
         self.type = None     # set in analyzer
         self.transformed = None 
+        self.tail = None     # set in optimizer. 'return' or 'void' when the call is in tail position
     
     def evaluateType(self):
         if self.type is not None:
@@ -573,8 +588,8 @@ class BinaryOp(Expression):
         
         if self.operator in ['+', '-', '*', '/', '%','^']:
             if left_type in numeric_types and right_type in numeric_types:
-                # If one is double, the result is double
-                if left_type == 'double' or right_type == 'double':
+                # If one is double, the result is double. '^' is pow, which only exists for doubles
+                if left_type == 'double' or right_type == 'double' or self.operator == '^':
                     self.cached_type = 'double'
                 else:
                     self.cached_type = 'integer'
@@ -594,10 +609,11 @@ class BinaryOp(Expression):
                 if hasattr(self.parent, attr):
                     value = getattr(self.parent, attr)
                     try:
-                        if value == self:
+                        # compare identities, '==' compares whole subtrees
+                        if value is self:
                             setattr(self.parent, attr, new_node)
-                        elif isinstance(value, (list, tuple)) and self in value:
-                            index = value.index(self)
+                        elif isinstance(value, (list, tuple)) and any(item is self for item in value):
+                            index = next(i for i, item in enumerate(value) if item is self)
                             if isinstance(value, list):
                                 value[index] = new_node
                             else:
@@ -673,6 +689,34 @@ class UnaryOp(Expression):
         print(" " * indent + f"UnaryOp (Operator: {self.operator})")
         self.left.print_content(indent + 2)
 
+# int <-> double conversions. Only inserted by the compiler (see TypeInference), there is no syntax for them
+class TypeCast(ASTNode):
+    def __init__(self, value, type, line=None):
+        self.value = value
+        self.type = type
+        self.line = line if line is not None else getattr(value, 'line', None)
+
+    def evaluateType(self):
+        return self.type
+
+    def accept(self, visitor):
+        return visitor.visit_type_cast(self)
+
+    def __str__(self):
+        return f"{str(self.value)}"
+
+    def __repr__(self):
+        return f"TypeCast({repr(self.value)} -> {self.type})"
+
+    def __eq__(self, other):
+        return (isinstance(other, TypeCast) and
+                self.value == other.value and
+                self.type == other.type)
+
+    def print_content(self, indent=0):
+        print(" " * indent + f"TypeCast (to: {self.type})")
+        self.value.print_content(indent + 2)
+
 # for < > <= >= == !=
 class Comparison(Expression):
     def __init__(self, left, operator, right, line=None):
@@ -0,0 +1,80 @@
+"""
+Generic traversal helpers for passes that only need to look at every node, not visit them in order
+"""
+from .ast import *
+
+def walk(node):
+    """ Yields a node and everything below it """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, ASTNode):
+            continue
+        yield node
+        stack.extend(children(node))
+
+def children(node):
+    if isinstance(node, (Program, Block)):
+        return node.statements
+    if isinstance(node, FunctionDeclaration):
+        return list(node.parameters) + [node.block]
+    if isinstance(node, (VariableDeclaration, VariableUpdated, Return, Argument, TypeCast)):
+        return [node.value]
+    if isinstance(node, If):
+        nodes = [node.comparison, node.block, node.elseBlock]
+        for comparison, block in node.elifNodes:
+            nodes += [comparison, block]
+        return nodes
+    if isinstance(node, While):
+        return [node.comparison, node.block]
+    if isinstance(node, FunctionCall):
+        return node.args
+    if isinstance(node, MethodCall):
+        return [node.receiver] + list(node.args)
+    if isinstance(node, StringCat):
+        return node.strings
+    if isinstance(node, (BinaryOp, Comparison, LogicalOp)):
+        return [node.left, node.right]
+    if isinstance(node, UnaryOp):
+        return [node.left]
+    return []
+
+def hasSideEffects(node):
+    """ Whether evaluating an expression can do anything besides producing its value """
+    return any(isinstance(child, (FunctionCall, MethodCall)) for child in walk(node))
+
+def rewrite(node, replace):
+    """
+    Rebuilds a tree bottom up: every node below 'node' is first rewritten itself and then handed to
+    'replace', whose return value takes its place. Returns the replacement for 'node'.
+    """
+    if not isinstance(node, ASTNode):
+        return node
+    if isinstance(node, (Program, Block)):
+        node.statements = [rewrite(statement, replace) for statement in node.statements]
+    elif isinstance(node, FunctionDeclaration):
+        node.block = rewrite(node.block, replace)
+    elif isinstance(node, (VariableDeclaration, VariableUpdated, Return, Argument, TypeCast)):
+        node.value = rewrite(node.value, replace)
+    elif isinstance(node, If):
+        node.comparison = rewrite(node.comparison, replace)
+        node.block = rewrite(node.block, replace)
+        # never mutate elifNodes in place, the parser's default list is shared
+        node.elifNodes = [(rewrite(comparison, replace), rewrite(block, replace)) for comparison, block in node.elifNodes]
+        node.elseBlock = rewrite(node.elseBlock, replace)
+    elif isinstance(node, While):
+        node.comparison = rewrite(node.comparison, replace)
+        node.block = rewrite(node.block, replace)
+    elif isinstance(node, FunctionCall):
+        node.args = [rewrite(arg, replace) for arg in node.args]
+    elif isinstance(node, MethodCall):
+        node.receiver = rewrite(node.receiver, replace)
+        node.args = [rewrite(arg, replace) for arg in node.args]
+    elif isinstance(node, StringCat):
+        node.strings = [rewrite(value, replace) for value in node.strings]
+    elif isinstance(node, (BinaryOp, Comparison, LogicalOp)):
+        node.left = rewrite(node.left, replace)
+        node.right = rewrite(node.right, replace)
+    elif isinstance(node, UnaryOp):
+        node.left = rewrite(node.left, replace)
+    return replace(node)
@@ -4,6 +4,9 @@ Even though this is overkill for three functions but adding more in future will
 """
 from .ast import *
 
+# Annotations that can be placed above a function declaration ('@memo')
+FUNCTION_ANNOTATIONS = ['memo']
+
 class BuiltInFunctions:
     BUILTINS = {
         'typeof': {
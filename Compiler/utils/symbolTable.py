@@ -1,223 +1,239 @@
-from collections import deque
+class Symbol:
+    """
+    A single entry of the symbol table. Only the fields that make sense for the symbol type are set:
+        - variable:  data_type, value, isStatic, annotated, mangled_name
+        - parameter: data_type, function_name
+        - function:  data_type (the return type), parameters, arity
+    """
+    __slots__ = ('name', 'symbol_type', 'scope', 'ref', 'mangled_name', 'data_type', 'value',
+                 'isStatic', 'annotated', 'parameters', 'arity', 'function_name')
+
+    def __init__(self, name, symbol_type, scope, data_type=None, mangled_name=None, value=None, isStatic=False,
+                 annotated=False, parameters=None, arity=None, function_name=None):
+        self.name = name
+        self.symbol_type = symbol_type      # one of: variable, function, parameter
+        self.scope = scope                  # index of the scope the symbol is declared in
+        self.ref = None                     # alloca or value, set by the generator
+        self.mangled_name = mangled_name
+        self.data_type = data_type
+        self.value = value
+        self.isStatic = isStatic
+        self.annotated = annotated
+        self.parameters = parameters
+        self.arity = arity
+        self.function_name = function_name
+
+    @property
+    def return_type(self):
+        return self.data_type
+
+class Scope:
+    __slots__ = ('id', 'symbols', 'parent', 'children')
+
+    def __init__(self, id, parent):
+        self.id = id
+        self.symbols = {}       # name -> Symbol
+        self.parent = parent    # index of the parent scope
+        self.children = []      # indices of the child scopes in the order they were created
 
 class SymbolTable:
-    def __init__(self):
-        # Initialize with global scope (id, symbols, parent_id, child_indices)
-        self.scopes = deque([(0, {}, None, [])])
+    def __init__(self, indexed=True):
+        # scopes are only ever appended, so a scope's index never changes
+        self.scopes = [Scope(0, None)]
         self.current_scope_index = 0
-        self.scope_pointer_stack = [self.current_scope_index]  
+        self.scope_pointer_stack = [self.current_scope_index]
         self.unique_scope_id = 1
-        self.visited_children_stack = [0]  # Stack to manage which children have been visited
-    
+        self.declared = set()   # every name declared in any scope
+
+        # name -> stack of the symbols with that name in the open scopes, innermost last.
+        # Makes lookups O(1) instead of a walk over the scope stack
+        self.indexed = indexed
+        self.bindings = {}
+
     def createScope(self):
         # Create a new scope with the current scope as the parent
-        new_scope = (self.unique_scope_id, {}, self.current_scope_index, [])
-        self.scopes.append(new_scope)
+        self.scopes.append(Scope(self.unique_scope_id, self.current_scope_index))
         # Add this new scope's index as a child of the current scope
-        self.scopes[self.current_scope_index][3].append(len(self.scopes) - 1)
+        self.scopes[self.current_scope_index].children.append(len(self.scopes) - 1)
         self.unique_scope_id += 1
         # Update scope and stacks
         self.current_scope_index = len(self.scopes) - 1
         self.scope_pointer_stack.append(self.current_scope_index)
-        self.visited_children_stack.append(0)  # Initialize visited children tracker for the new scope
-    
-    def enterScope(self):
-        if self.visited_children_stack and self.visited_children_stack[-1] < len(self.scopes[self.current_scope_index][3]):
-            current_scope = self.scopes[self.current_scope_index]
-            child_indices = current_scope[3]
-            # Get the next unvisited child index
-            next_child_index = child_indices[self.visited_children_stack[-1]]
-            self.visited_children_stack[-1] += 1
-            # Update scope and stacks
-            self.current_scope_index = next_child_index
-            self.scope_pointer_stack.append(self.current_scope_index)
-            self.visited_children_stack.append(0)  # Initialize visited tracker for the new scope
-        else:
-            raise Exception("No further unvisited child scope to enter.")
-    
+
     def exitScope(self):
         if len(self.scope_pointer_stack) > 1:
+            if self.indexed:
+                for name in self.scopes[self.current_scope_index].symbols:
+                    self.bindings[name].pop()
             self.scope_pointer_stack.pop()
-            self.visited_children_stack.pop()
             self.current_scope_index = self.scope_pointer_stack[-1]
         else:
             raise Exception("Cannot exit global scope.")
-    
+
     def getScopeId(self):
-        return self.scopes[self.current_scope_index][0]
+        return self.scopes[self.current_scope_index].id
 
-    def add(self, name, variableData=None, symbolType=None, functionData=None, parameterData=None):
-        current_scope_dict = self.scopes[self.current_scope_index][1]
-        
-        if name in current_scope_dict:
+    def add(self, name, symbolType, dataType=None, value=None, isStatic=False, annotated=False,
+            parameters=None, arity=None, functionName=None):
+        current_scope = self.scopes[self.current_scope_index]
+
+        if name in current_scope.symbols:
             raise Exception(f"Symbol '{name}' already declared in this scope")
-        
-        current_scope_dict[name] = {
-            'ref': None,    # alloca or value
-            'symbol_type': symbolType,          # one of: variable, function, parameter
-            'mangled_name': self._mangleVariableName(name) if symbolType == 'variable' else None,
-            'variable_data': variableData,      # dict with fields : "value", "data_type", "annotated", "isStatic"
-            'function_data': functionData,      # dict with fields : "parameters", "arity", "return_type"
-            'parameter_data': parameterData     # dict with fields : "data_type", "function_name"
-        }
-
-    def addGlobalFunction(self, name, functionData=None):
-        global_scope_dict = self.scopes[0][1]
-        
-        if name in global_scope_dict:
+
+        symbol = Symbol(
+            name, symbolType, self.current_scope_index,
+            data_type=dataType,
+            mangled_name=self._mangleVariableName(name) if symbolType == 'variable' else None,
+            value=value,
+            isStatic=isStatic,
+            annotated=annotated,
+            parameters=parameters,
+            arity=arity,
+            function_name=functionName,
+        )
+        current_scope.symbols[name] = symbol
+        self.declared.add(name)
+        if self.indexed:
+            self.bindings.setdefault(name, []).append(symbol)
+        return symbol
+
+    def addGlobalFunction(self, name, parameters=None, arity=None, returnType=None):
+        global_scope = self.scopes[0]
+
+        if name in global_scope.symbols:
             raise Exception(f"Symbol '{name}' already declared in the global scope")
-        
-        global_scope_dict[name] = {
-            'ref': None,    
-            'symbol_type': 'function',         
-            'mangled_name': None,               
-            'variable_data': None,             
-            'function_data': functionData,     
-            'parameter_data': None             
-        }
+
+        symbol = Symbol(name, 'function', 0, data_type=returnType, parameters=parameters, arity=arity)
+        global_scope.symbols[name] = symbol
+        self.declared.add(name)
+        if self.indexed:
+            # the global scope is always open and is the outermost one
+            self.bindings.setdefault(name, []).insert(0, symbol)
+        return symbol
 
     def inScope(self, name):
-        current_scope_dict = self.scopes[self.current_scope_index][1]
-        return current_scope_dict.get(name, None)
+        return self.scopes[self.current_scope_index].symbols.get(name, None)
 
     def isStatic(self, name, scope_id=None):
         """
-        Returns whether the variable's isStatic field from variable_data is True,
-        or False if the symbol is not found or is of a different type.
+        Returns whether the variable is static, False if it is a different type of symbol,
+        or None if the symbol is not found.
         """
         symbol = self.lookup(name, scope_id)
         if symbol is None:
             return None
-        
-        symbol_type = symbol.get('symbol_type')
-        
-        if symbol_type == 'variable':
-            variable_data = symbol.get('variable_data', {})
-            return variable_data.get('isStatic', False)
-        else:
-            return False
-    
+        return symbol.isStatic if symbol.symbol_type == 'variable' else False
+
     def getFunctionType(self, name):
         function = self.lookup(name)
-        if function is None or function.get('symbol_type') != 'function':
+        if function is None or function.symbol_type != 'function':
             raise Exception(f"Function '{name}' does not exist.")
-        return function.get('function_data').get('return_type')
+        return function.data_type
 
     def getMangledName(self, name):
         symbol = self.lookup(name)
         if symbol is not None:
-            mangled_name = symbol.get('mangled_name')
-            if mangled_name is not None:
-                return mangled_name
+            if symbol.mangled_name is not None:
+                return symbol.mangled_name
             else:
                 return name     # params have no name mangling
         return None
 
     def scopeOf(self, name):
         """
-        Returns the scope ID where the variable is declared.
-        Starts searching from the current scope and moves backward.
+        Returns the index of the innermost open scope where the name is declared.
         """
-        for scope_id in reversed(self.scope_pointer_stack):
-            scope_dict = self.scopes[scope_id][1]
-            if name in scope_dict:
-                return scope_id
-        return None
-    
+        symbol = self.lookup(name)
+        return symbol.scope if symbol is not None else None
+
     def lookup(self, name, scope_id=None):
         """
         Search for the symbol in a specific scope or from the current scope and upward.
         """
         if scope_id is None:
+            if self.indexed:
+                symbols = self.bindings.get(name)
+                return symbols[-1] if symbols else None
             # Search from the current scope backward using the pointer stack
             for scope_id in reversed(self.scope_pointer_stack):
-                scope_dict = self.scopes[scope_id][1]
-                if name in scope_dict:
-                    return scope_dict[name]
+                symbols = self.scopes[scope_id].symbols
+                if name in symbols:
+                    return symbols[name]
             return None
         else:
             # Search within a specific scope
             if scope_id < len(self.scopes):
-                scope_dict = self.scopes[scope_id][1]
-                if name in scope_dict:
-                    return scope_dict[name]
+                return self.scopes[scope_id].symbols.get(name, None)
             return None
 
     def update(self, name, type_info, value=None):
         symbol = self.lookup(name)
         if symbol is not None:
-            symbol['type'] = type_info
-            if value is not None: 
-                if symbol['symbol_type'] not in ['variable','parameter']:
-                    raise Exception(f"The '{symbol['symbol_type']}' symbol '{name}' cannot be updated")
-                symbol['variable_data']['value'] = value
+            if value is not None:
+                if symbol.symbol_type not in ['variable','parameter']:
+                    raise Exception(f"The '{symbol.symbol_type}' symbol '{name}' cannot be updated")
+                symbol.value = value
             return
         raise Exception(f"Symbol '{name}' not found in any scope")
 
     def isDeclared(self, name):
-        return any(name in scope[1] for scope in self.scopes)
-   
+        return name in self.declared
+
     def getType(self, name):
         symbol = self.lookup(name)
-        symbol_type = symbol.get('symbol_type')
-        
-        if symbol_type == 'parameter':
-            return symbol.get('parameter_data').get('data_type')
-        elif symbol_type == 'function':
-            return symbol.get('function_data').get('return_type')
-        elif symbol_type == 'variable':
-            return symbol.get('variable_data').get('data_type') 
-        
+        return symbol.data_type
+
     def setType(self, name, type_str):
         symbol = self.lookup(name)
-        symbol_type = symbol.get('symbol_type')
-        
-        if symbol_type == 'parameter':
-            symbol['parameter_data']['data_type'] = type_str
-        elif symbol_type == 'function':
-            symbol['function_data']['return_type'] = type_str
-        elif symbol_type == 'variable':
-            symbol['variable_data']['data_type'] = type_str
-        else:
-            raise ValueError(f"Unknown symbol type: {symbol_type}")
-        
+        if symbol.symbol_type not in ['parameter', 'function', 'variable']:
+            raise ValueError(f"Unknown symbol type: {symbol.symbol_type}")
+        symbol.data_type = type_str
+
     def setReference(self, var_name, ref):
         var_info = self.lookup(var_name)
         if var_info:
-            var_info['ref'] = ref
+            var_info.ref = ref
         else:
             raise ValueError(f"Variable '{var_name}' not found.")
 
     def getReference(self, var_name):
         var_info = self.lookup(var_name)
-        if var_info and 'ref' in var_info:
-            return var_info['ref']
+        if var_info:
+            return var_info.ref
         else:
             raise ValueError(f"Reference for variable '{var_name}' not found.")
-        
+
+    def pushScope(self, scope_index):
+        """ Re-enters a scope created earlier, by the index recorded on its node during analysis """
+        self.current_scope_index = scope_index
+        self.scope_pointer_stack.append(scope_index)
+        if self.indexed:
+            for name, symbol in self.scopes[scope_index].symbols.items():
+                self.bindings.setdefault(name, []).append(symbol)
+
     def _mangleVariableName(self, name):
         return f"{name}${self.getScopeId()}"
 
     def print_table(self):
-        for i, (scope_id, scope_dict, parent_id, child_indices) in enumerate(self.scopes):
-            if not scope_dict:  # Skip empty scopes
+        for i, scope in enumerate(self.scopes):
+            if not scope.symbols:  # Skip empty scopes
                 continue
-            
+
             # Header with scope level and ID
             if i == 0:
                 header = "Global Scope"
             else:
-                header = f"Scope {scope_id} - Parent ID: {parent_id}"
-            
+                header = f"Scope {scope.id} - Parent ID: {scope.parent}"
+
             print(header)
 
             # Display child scopes
-            if child_indices:
-                child_scope_str = ", ".join(str(child_id) for child_id in child_indices)
+            if scope.children:
+                child_scope_str = ", ".join(str(child_id) for child_id in scope.children)
                 print(f"Child Scope idx: {child_scope_str}\n")
-            
+
             # Check if there's function data to adjust the header
-            has_function_data = any('function_data' in info for info in scope_dict.values())
+            has_function_data = any(info.symbol_type == 'function' for info in scope.symbols.values())
             if has_function_data:
                 print("{:<20} {:<15} {:<10} {:<15} {:<20} {:<15}".format(
                     'Symbol Name', 'Symbol Type', 'Reference', 'Data Type', 'Parameters', 'Return Type'
@@ -228,36 +244,32 @@ class SymbolTable:
                     'Symbol Name', 'Symbol Type', 'Reference', 'Data Type'
                 ))
                 print("="*60)
-            
+
             # Display symbols in the scope
-            for name, info in scope_dict.items():
-                symbol_type = info.get('symbol_type', 'n/a') or 'n/a'
-                ref = info.get('ref', 'n/a') or 'n/a'
+            for name, info in scope.symbols.items():
+                symbol_type = info.symbol_type or 'n/a'
+                ref = info.ref or 'n/a'
                 ref = ref.get_name() if hasattr(ref, 'get_name') else str(ref)
                 data_type = 'n/a'
-                
-                if symbol_type == 'variable':
-                    data_type = info.get('variable_data', {}).get('data_type', 'n/a') or 'n/a'
-                elif symbol_type == 'parameter':
-                    data_type = info.get('parameter_data', {}).get('data_type', 'n/a') or 'n/a'
-                
+
+                if symbol_type in ['variable', 'parameter']:
+                    data_type = info.data_type or 'n/a'
+
                 name = name or 'n/a'
-                
+
                 if has_function_data and symbol_type == 'function':
-                    function_data = info.get('function_data', {})
-                    parameters = function_data.get('parameters', 'n/a') or 'n/a'
+                    parameters = info.parameters or 'n/a'
                     if isinstance(parameters, list):
                         parameters = ', '.join(param.name for param in parameters) if parameters else 'n/a'
-                    return_type = function_data.get('return_type', 'n/a') or 'n/a'
+                    return_type = info.data_type or 'n/a'
                     print(f"{name:<20} {symbol_type:<15} {ref:<10} {data_type:<15} {parameters:<20} {return_type:<15}")
                 else:
                     print(f"{name:<20} {symbol_type:<15} {ref:<10} {data_type:<15}")
-            
+
             # Print footer line
             if has_function_data:
                 print("="*95)
             else:
                 print("="*60)
-            
-            print("\n")            
-                 
\ No newline at end of file
+
+            print("\n")
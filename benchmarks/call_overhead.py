@@ -0,0 +1,86 @@
+"""
+Times call heavy programs built from the recursive samples (ackermann.g, hanoi.g, turing.g), scaled up
+and with their per call prints replaced by counting, so the calls themselves dominate. The sizes are
+read from input and memoization and compile time evaluation are off, so every call really happens.
+Includes compiling.
+
+    python benchmarks/call_overhead.py [runs]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROGRAMS = {
+    'ackermann(3, 11)': ('''
+function int ackermann(m:int, n:int) {
+    if (m == 0) {
+        return n + 1
+    } elif (m > 0 && n == 0) {
+        return ackermann(m - 1, 1)
+    } else {
+        return ackermann(m - 1, ackermann(m, n - 1))
+    }
+}
+set m = input().toInteger()
+set n = input().toInteger()
+print(ackermann(m, n))
+''', '3\n11\n'),
+    'hanoi(28)': ('''
+function int hanoi(n:int, fromPeg:int, toPeg:int, auxPeg:int) {
+    if (n == 1) {
+        return 1
+    }
+    set before = hanoi(n - 1, fromPeg, auxPeg, toPeg)
+    set after = hanoi(n - 1, auxPeg, toPeg, fromPeg)
+    return before + 1 + after
+}
+set disks = input().toInteger()
+print(hanoi(disks, 1, 3, 2))
+''', '28\n'),
+    'turing(200M steps)': ('''
+function int transition(state:int, value:int) {
+    if (state == 0) {
+        return value + 3
+    } elif (state == 1) {
+        return value - 1
+    } elif (state == 2) {
+        return value * 2
+    } else {
+        return value / 2
+    }
+}
+set steps = input().toInteger()
+set value = 5
+set i = 0
+while (i < steps) {
+    set next = transition(i % 4, value)
+    value = next
+    i = i + 1
+}
+print(value)
+''', '200000000\n'),
+}
+
+def run(path, stdin):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-m', 'Compiler.compile', path, '--no-memo', '--ctfe-fuel', '0'],
+                            input=stdin, cwd=ROOT, capture_output=True, text=True)
+    return time.perf_counter() - start, result.stdout.strip()
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"{'program':<20}{'time':>10}  output")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (source, stdin) in PROGRAMS.items():
+            path = os.path.join(directory, 'bench.g')
+            with open(path, 'w') as file:
+                file.write(source)
+            results = [run(path, stdin) for _ in range(runs)]
+            print(f"{name:<20}{min(elapsed for elapsed, _ in results):>9.3f}s  {results[0][1]}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Throughput of input: compiles and runs a program that reads a count and then that many numbers and
+words, with 'input().toInteger()' parsing each number straight out of the input buffer. Includes compiling.
+
+    python benchmarks/input_throughput.py [number of lines]
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SOURCE = '''set n = input().toInteger()
+set total = 0
+set letters = 0
+set i = 0
+while (i < n) {
+    set number = input().toInteger()
+    total = total + number
+    set word = input()
+    set length = word.length()
+    letters = letters + length
+    i = i + 1
+}
+print(total)
+print(letters)
+'''
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    random.seed(0)
+    numbers = [random.randint(-10**12, 10**12) for _ in range(lines)]
+    words = ['x' * random.randint(1, 9) for _ in range(lines)]
+    stdin = f"{lines}\n" + "".join(f"{number} {word}\n" for number, word in zip(numbers, words))
+
+    with tempfile.NamedTemporaryFile('w', suffix='.g', delete=False) as file:
+        file.write(SOURCE)
+    try:
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-m', 'Compiler.compile', file.name], input=stdin, text=True,
+                                capture_output=True, cwd=ROOT, check=True)
+        elapsed = time.perf_counter() - start
+    finally:
+        os.remove(file.name)
+
+    expected = f"{sum(numbers)}\n{sum(map(len, words))}\n"
+    status = "ok" if result.stdout == expected else f"wrong output: {result.stdout!r}"
+    print(f"{lines} lines, {len(stdin) / 1e6:.1f}MB: {elapsed:.2f}s ({status})")
+
+if __name__ == '__main__':
+    main()
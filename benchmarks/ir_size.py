@@ -0,0 +1,70 @@
+"""
+Size of the LLVM IR the generator emits for every sample, before any optimization: instructions,
+allocas among them, and how long LLVM takes to parse the module. The runtime is linked in after parsing
+and isn't counted. '--ssa' generates with variables kept in registers (see LLVMCodeGenerator).
+
+    python benchmarks/ir_size.py [--ssa] [directory with .g files]
+"""
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import llvmlite.binding as llvm
+import llvmlite.ir as ir
+from Compiler.Lexer import Lexer
+from Compiler.Parser import Parser
+from Compiler.Analyzer import SemanticAnalyzer
+from Compiler.Generator import LLVMCodeGenerator
+from Compiler.utils import *
+
+def generate(source, ssa=False):
+    error.clear_errors()
+    ast = Parser(Lexer(source)).parse()
+    symbol_table = SemanticAnalyzer(ast).analyze()
+    if has_error_occurred():
+        return None
+    return LLVMCodeGenerator(symbol_table, ssa=ssa).generate_code(ast)
+
+def count(module):
+    instructions = allocas = 0
+    for function in module.functions:
+        for block in function.blocks:
+            instructions += len(block.instructions)
+            allocas += sum(1 for inst in block.instructions if isinstance(inst, ir.AllocaInstr))
+    return instructions, allocas
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != '--ssa']
+    ssa = len(args) < len(sys.argv) - 1
+    directory = args[0] if args else os.path.join(ROOT, 'samples')
+    llvm.initialize()
+    llvm.initialize_native_target()
+    llvm.initialize_native_asmprinter()
+
+    print(f"{'program':<16}{'instructions':>14}{'allocas':>10}{'parse':>12}")
+    totals = [0, 0, 0.0]
+    for path in sorted(glob.glob(os.path.join(directory, '*.g'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path) as file:
+            module = generate(file.read(), ssa)
+        if module is None:
+            print(f"{name:<16}{'does not compile':>36}")
+            continue
+
+        text = str(module)
+        start = time.perf_counter()
+        llvm.parse_assembly(text).verify()
+        parse = time.perf_counter() - start
+
+        instructions, allocas = count(module)
+        print(f"{name:<16}{instructions:>14}{allocas:>10}{parse * 1000:>10.2f}ms")
+        totals[0] += instructions
+        totals[1] += allocas
+        totals[2] += parse
+    print(f"{'total':<16}{totals[0]:>14}{totals[1]:>10}{totals[2] * 1000:>10.2f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Times naive recursive programs compiled with and without memoization (--no-memo).
+Compile time evaluation is turned off, it would fold these calls away entirely.
+
+    python benchmarks/memoization.py [runs]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROGRAMS = {
+    'fib(40)': '''
+function int fib(n:int) {
+    if (n < 2) {
+        return n
+    }
+    return fib(n - 1) + fib(n - 2)
+}
+print(fib(40))
+''',
+    'ackermann(3, 9)': '''
+function int ackermann(m:int, n:int) {
+    if (m == 0) {
+        return n + 1
+    } elif (m > 0 && n == 0) {
+        return ackermann(m - 1, 1)
+    } else {
+        return ackermann(m - 1, ackermann(m, n - 1))
+    }
+}
+print(ackermann(3, 9))
+''',
+    'paths(16, 16)': '''
+@memo
+function int paths(x:int, y:int) {
+    if (x == 0 || y == 0) {
+        return 1
+    }
+    return paths(x - 1, y) + paths(x, y - 1)
+}
+print(paths(16, 16))
+''',
+}
+
+def run(path, flags):
+    flags = flags + ['--ctfe-fuel', '0']
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-m', 'Compiler.compile', path] + flags,
+                            cwd=ROOT, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, result.stdout.strip()
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"{'program':<18}{'no memo':>12}{'memo':>12}{'speedup':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, source in PROGRAMS.items():
+            path = os.path.join(directory, 'bench.g')
+            with open(path, 'w') as file:
+                file.write(source)
+
+            plain = min(run(path, ['--no-memo'])[0] for _ in range(runs))
+            memo = min(run(path, [])[0] for _ in range(runs))
+            if run(path, ['--no-memo'])[1] != run(path, [])[1]:
+                print(f"{name}: memoized output differs!")
+            print(f"{name:<18}{plain:>11.3f}s{memo:>11.3f}s{plain / memo:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
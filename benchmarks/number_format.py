@@ -0,0 +1,96 @@
+"""
+Formats millions of integers and doubles with the runtime's NumberFormatter and with sprintf("%lld") /
+sprintf("%f"), inside loops compiled with LLVM at O3, and reports the time per conversion.
+
+    python benchmarks/number_format.py [conversions]
+"""
+import ctypes
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import llvmlite.ir as ir
+import llvmlite.binding as llvm
+from Compiler.Generator import LLVMCodeGenerator
+
+def emitLoop(module, name, value_type, format_):
+    """ i64 name(i64 count): formats a different value every iteration, returns the total length """
+    i64 = ir.IntType(64)
+    function = ir.Function(module, ir.FunctionType(i64, [i64]), name=name)
+    builder = ir.IRBuilder(function.append_basic_block(name="entry"))
+    buffer = builder.bitcast(builder.alloca(ir.ArrayType(ir.IntType(8), 400)), ir.IntType(8).as_pointer())
+    entry_block = builder.block
+    loop_block = function.append_basic_block(name="loop")
+    done_block = function.append_basic_block(name="done")
+    builder.branch(loop_block)
+
+    builder.position_at_end(loop_block)
+    index = builder.phi(i64)
+    total = builder.phi(i64)
+    index.add_incoming(ir.Constant(i64, 0), entry_block)
+    total.add_incoming(ir.Constant(i64, 0), entry_block)
+    # spread the values over many magnitudes: i * 7919 - count for integers, i * 0.731 for doubles
+    if value_type == i64:
+        value = builder.sub(builder.mul(index, ir.Constant(i64, 7919)), function.args[0])
+    else:
+        value = builder.fmul(builder.sitofp(index, value_type), ir.Constant(value_type, 0.731))
+    length = format_(builder, buffer, value)
+    index.add_incoming(builder.add(index, ir.Constant(i64, 1)), loop_block)
+    total.add_incoming(builder.add(total, length), loop_block)
+    builder.cbranch(builder.icmp_signed('<', builder.add(index, ir.Constant(i64, 1)), function.args[0]), loop_block, done_block)
+
+    builder.position_at_end(done_block)
+    builder.ret(total)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    llvm.initialize()
+    llvm.initialize_native_target()
+    llvm.initialize_native_asmprinter()
+
+    generator = LLVMCodeGenerator(None)
+    module = generator.module
+    formatter = generator.numberFormatter()
+    sprintf = module.get_global('sprintf')
+
+    def viaSprintf(fmt):
+        def format_(builder, buffer, value):
+            written = builder.call(sprintf, [buffer, generator.stringConstant(fmt), value])
+            return builder.sext(written, ir.IntType(64))
+        return format_
+
+    cases = [
+        ('integers', 'int_runtime', 'int_sprintf', ir.IntType(64), formatter.integer, viaSprintf("%lld")),
+        ('doubles', 'double_runtime', 'double_sprintf', ir.DoubleType(), formatter.double, viaSprintf("%f")),
+    ]
+    for _, runtime, libc, type_, ours, theirs in cases:
+        emitLoop(module, runtime, type_, ours)
+        emitLoop(module, libc, type_, theirs)
+
+    compiled = llvm.parse_assembly(str(module))
+    generator.linkRuntime(compiled)
+    pass_manager = llvm.create_module_pass_manager()
+    builder = llvm.create_pass_manager_builder()
+    builder.opt_level = 3
+    builder.populate(pass_manager)
+    pass_manager.run(compiled)
+    engine = llvm.create_mcjit_compiler(compiled, llvm.Target.from_default_triple().create_target_machine())
+    engine.finalize_object()
+
+    print(f"{count} conversions each")
+    print(f"{'':<10}{'runtime':>12}{'sprintf':>12}{'speedup':>10}")
+    for label, runtime, libc, *_ in cases:
+        times = []
+        lengths = []
+        for name in (runtime, libc):
+            loop = ctypes.CFUNCTYPE(ctypes.c_int64, ctypes.c_int64)(engine.get_function_address(name))
+            start = time.perf_counter()
+            lengths.append(loop(count))
+            times.append(time.perf_counter() - start)
+        # the same total length is a cheap check that both produced the same text
+        check = "" if lengths[0] == lengths[1] else "  (lengths differ!)"
+        print(f"{label:<10}{times[0] / count * 1e9:>10.1f}ns{times[1] / count * 1e9:>10.1f}ns{times[1] / times[0]:>9.1f}x{check}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Compiles and runs call heavy and print heavy programs at every optimization level and reports the time
+LLVM spent optimizing (from --opt-stats) next to the total time, which includes parsing, code generation
+and running the program. Shows what each level costs at compile time and what it buys at run time.
+
+    python benchmarks/opt_levels.py [runs]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEVELS = ['0', '1', '2', '3', 's', 'z']
+
+PROGRAMS = {
+    'hanoi(24)': ('''
+function int hanoi(n:int, fromPeg:int, toPeg:int, auxPeg:int) {
+    if (n == 1) {
+        return 1
+    }
+    set before = hanoi(n - 1, fromPeg, auxPeg, toPeg)
+    set after = hanoi(n - 1, auxPeg, toPeg, fromPeg)
+    return before + 1 + after
+}
+set disks = input().toInteger()
+print(hanoi(disks, 1, 3, 2))
+''', '24\n'),
+    'print 2M lines': ('''
+set n = input().toInteger()
+set i = 0
+while (i < n) {
+    print("line " + i + " of " + n)
+    i = i + 1
+}
+''', '2000000\n'),
+}
+
+def run(path, stdin, level):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-m', 'Compiler.compile', path, f'-O{level}', '--opt-stats', '--no-memo'],
+                            input=stdin, cwd=ROOT, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    optimizing = sum(float(line.split()[-1][:-2]) for line in result.stdout.splitlines()
+                     if line.strip().startswith(('function passes', 'module passes'))) / 1000
+    return elapsed, optimizing
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"{'program':<18}{'level':>6}{'optimize':>11}{'total':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (source, stdin) in PROGRAMS.items():
+            path = os.path.join(directory, 'bench.g')
+            with open(path, 'w') as file:
+                file.write(source)
+            for level in LEVELS:
+                results = [run(path, stdin, level) for _ in range(runs)]
+                elapsed, optimizing = min(results)
+                print(f"{name:<18}{'-O' + level:>6}{optimizing:>10.3f}s{elapsed:>8.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Printing concatenations: compiles and runs a Tower of Hanoi style loop that prints
+'"Move disk " + disk + " from peg " + fromPeg + " to " + peg + " " + toPeg' per line, once printed
+directly (the pieces are written straight into the output buffer) and once stored in a variable first
+(the string is built in the arena, then printed). Output goes to /dev/null, both runs include compiling.
+
+    python benchmarks/print_concat.py [number of lines]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def program(statement):
+    return (
+        'set n = input().toInteger()\n'
+        'set peg = input()\n'
+        'set i = 0\n'
+        'while (i < n) {\n'
+        '    set disk = i % 7 + 1\n'
+        '    set fromPeg = i % 3 + 1\n'
+        '    set toPeg = i % 5\n'
+        f'    {statement}\n'
+        '    i = i + 1\n'
+        '}\n'
+    )
+
+LINE = '"Move disk " + disk + " from peg " + fromPeg + " to " + peg + " " + toPeg'
+VARIANTS = [
+    ('printed directly', program(f'print({LINE})')),
+    ('built, then printed', program(f'set line = {LINE}\n    print(line)')),
+]
+
+def run(path, stdin):
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull:
+        subprocess.run([sys.executable, '-m', 'Compiler.compile', path], input=stdin, text=True,
+                       stdout=devnull, cwd=ROOT, check=True)
+    return time.perf_counter() - start
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    stdin = f"{lines}\npeg\n"
+    print(f"{lines} lines")
+    for name, source in VARIANTS:
+        with tempfile.NamedTemporaryFile('w', suffix='.g', delete=False) as file:
+            file.write(source)
+        try:
+            print(f"{name:<22}{run(file.name, stdin):>8.2f}s")
+        finally:
+            os.remove(file.name)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Throughput of print: compiles and runs a program that prints a mix of numbers, booleans and strings,
+once with the default block buffered output and once with --line-buffered, writing to /dev/null.
+Both runs include compiling, the difference between them is the cost of a write per line.
+
+    python benchmarks/print_throughput.py [number of lines]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def program(lines):
+    return (
+        'set n = input().toInteger()\n'
+        'set i = 0\n'
+        'while (i < n) {\n'
+        '    print("Next number: " + i)\n'
+        '    print(i * 3)\n'
+        '    print(i / 7.0)\n'
+        '    print(i % 2 == 0)\n'
+        '    i = i + 4\n'
+        '}\n'
+    ), str(lines)
+
+def run(path, stdin, flags):
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull:
+        subprocess.run([sys.executable, '-m', 'Compiler.compile', *flags, path], input=stdin, text=True,
+                       stdout=devnull, cwd=ROOT, check=True)
+    return time.perf_counter() - start
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    source, stdin = program(lines)
+    with tempfile.NamedTemporaryFile('w', suffix='.g', delete=False) as file:
+        file.write(source)
+    try:
+        print(f"{lines} lines")
+        for name, flags in [('buffered', []), ('line buffered', ['--line-buffered'])]:
+            print(f"{name:<16}{run(file.name, stdin, flags):>8.2f}s")
+    finally:
+        os.remove(file.name)
+
+if __name__ == '__main__':
+    main()
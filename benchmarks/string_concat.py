@@ -0,0 +1,73 @@
+"""
+Scaling benchmark for long string concatenations like '"a" + x + "b" + y + ...': times parsing, semantic
+analysis and the mid-level IR passes of a single concatenation with up to 10k operands. The time per
+operand should stay flat as the chain grows.
+
+    python benchmarks/string_concat.py [largest number of operands]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Compiler.Lexer import Lexer
+from Compiler.Parser import Parser
+from Compiler.Analyzer import SemanticAnalyzer
+from Compiler.MIR import MIRBuilder, PassManager
+from Compiler.utils import *
+
+def program(terms):
+    """ A message built from literals, a static variable and values only known at runtime """
+    pieces = []
+    for i in range(terms):
+        kind = i % 4
+        if kind == 0:
+            pieces.append(f'"part {i} "')
+        elif kind == 1:
+            pieces.append('name')
+        elif kind == 2:
+            pieces.append('count')
+        else:
+            pieces.append(str(i))
+    return (
+        'set name = input()\n'
+        'set count = 3\n'
+        f'set message = {" + ".join(pieces)}\n'
+        'print(message)\n'
+    )
+
+def measure(terms):
+    source = program(terms)
+    error.clear_errors()
+
+    start = time.perf_counter()
+    ast = Parser(Lexer(source)).parse()
+    parse = time.perf_counter() - start
+
+    start = time.perf_counter()
+    SemanticAnalyzer(ast).analyze()
+    analyze = time.perf_counter() - start
+
+    start = time.perf_counter()
+    builder = MIRBuilder(ast)
+    builder.build()
+    PassManager().run(builder.module)
+    mir = time.perf_counter() - start
+
+    if has_error_occurred():
+        print(f"{terms} operands: compilation failed")
+    return parse, analyze, mir
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+    print(f"{'operands':<10}{'parse':>10}{'analyze':>12}{'MIR':>12}{'per operand':>14}")
+    terms = 100
+    while terms <= largest:
+        parse, analyze, mir = measure(terms)
+        per_operand = (parse + analyze + mir) / terms * 1e6
+        print(f"{terms:<10}{parse:>9.3f}s{analyze:>11.3f}s{mir:>11.3f}s{per_operand:>12.1f}us")
+        terms *= 10
+
+if __name__ == '__main__':
+    main()
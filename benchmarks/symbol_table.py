@@ -0,0 +1,74 @@
+"""
+Scaling benchmark for the symbol table: 10k scopes holding 100k symbols, declared and looked up the
+way the analyzer uses the table, then re-entered by their recorded index with pushScope().
+
+    python benchmarks/symbol_table.py [scopes] [symbols per scope] [depth]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Compiler.utils.symbolTable import SymbolTable
+
+def build(table, scopes, per_scope, depth):
+    """ Declares scopes in nested chains of the given depth, each with per_scope variables """
+    recorded = []
+    created = 0
+    while created < scopes:
+        opened = 0
+        while opened < depth and created < scopes:
+            table.createScope()
+            recorded.append(table.current_scope_index)
+            for i in range(per_scope):
+                table.add(f"v{i}", symbolType='variable', dataType='integer')
+            # every scope reads the variables of the outermost function level as well
+            for i in range(per_scope):
+                table.lookup(f"v{i}")
+                table.lookup("global")
+            opened += 1
+            created += 1
+        for _ in range(opened):
+            table.exitScope()
+    return recorded
+
+def replay(table, recorded, per_scope, depth):
+    """ Re-enters every scope by its recorded index and resolves every name in it """
+    for start in range(0, len(recorded), depth):
+        chain = recorded[start:start + depth]
+        for scope_index in chain:
+            table.pushScope(scope_index)
+            for i in range(per_scope):
+                table.getMangledName(f"v{i}")
+                table.getType("global")
+        for _ in chain:
+            table.exitScope()
+
+def measure(indexed, scopes, per_scope, depth):
+    table = SymbolTable(indexed=indexed)
+    table.add("global", symbolType='variable', dataType='integer')
+
+    start = time.perf_counter()
+    recorded = build(table, scopes, per_scope, depth)
+    analyze = time.perf_counter() - start
+
+    start = time.perf_counter()
+    replay(table, recorded, per_scope, depth)
+    generate = time.perf_counter() - start
+
+    symbols = sum(len(scope.symbols) for scope in table.scopes)
+    return analyze, generate, len(table.scopes), symbols
+
+def main():
+    scopes = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    per_scope = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    depth = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    print(f"{'lookups':<16}{'scopes':>8}{'symbols':>10}{'declare':>12}{'replay':>12}")
+    for indexed in [False, True]:
+        analyze, generate, total_scopes, symbols = measure(indexed, scopes, per_scope, depth)
+        name = "name index" if indexed else "scope walk"
+        print(f"{name:<16}{total_scopes:>8}{symbols:>10}{analyze:>11.3f}s{generate:>11.3f}s")
+
+if __name__ == '__main__':
+    main()
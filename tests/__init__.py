@@ -1,2 +1,6 @@
 from .test_analyzer import *
-from .test_parser import *
\ No newline at end of file
+from .test_parser import *
+from .test_optimizer import *
+from .test_symbol_table import *
+from .test_mir import *
+from .test_generator import *
\ No newline at end of file
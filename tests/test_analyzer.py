@@ -1,5 +1,7 @@
 import unittest
 from Compiler.utils import *
+from Compiler.Lexer import *
+from Compiler.Parser import *
 from Compiler.Analyzer import *
 
 class TestAnalyzer(unittest.TestCase):
@@ -221,6 +223,35 @@ class TestAnalyzer(unittest.TestCase):
         self.assertTrue(error.has_error_occurred())
         self.assertTrue(any("TypeError: Return Type error on line 2. Expected return of type 'integer' for function 'square' got: 'string' instead." in e for e in error.get_errors()))
 
+    def test_function_assigning_outer_variable(self):
+        # used to compile, and the MIR dropped the store to 'g' as unused
+        ast = Parser(Lexer('''
+        set g = 1
+        function void setg(k:int) {
+            g = k
+        }
+        setg(5)
+        print(g)
+        ''')).parse()
+        SemanticAnalyzer(ast).analyze()
+        self.assertTrue(error.has_error_occurred())
+        self.assertTrue(any("The function 'setg' can not assign to 'g'" in e for e in error.get_errors()))
+
+    def test_function_assigning_own_variables(self):
+        ast = Parser(Lexer('''
+        function int count(n:int) {
+            set total = 0
+            while (n > 0) {
+                total = total + n
+                n = n - 1
+            }
+            return total
+        }
+        print(count(3))
+        ''')).parse()
+        SemanticAnalyzer(ast).analyze()
+        self.assertFalse(error.has_error_occurred())
+
     def test_invalid_argument_type(self):
         ast = Program([
             FunctionDeclaration('testFunc', 'void', [Parameter('x', 'integer')], Block([
@@ -274,5 +305,103 @@ class TestAnalyzer(unittest.TestCase):
         self.assertTrue(error.has_error_occurred())
         self.assertTrue(any("ArgumentError: Function 'factorial' expects 1 arguments but received 0 arguments" in e for e in error.get_errors()))
 
+class TestTypeInference(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def analyze(self, source_code):
+        ast = Parser(Lexer(source_code)).parse()
+        SemanticAnalyzer(ast).analyze()
+        self.assertFalse(error.has_error_occurred())
+        return ast
+
+    def test_double_stored_in_integer_variable_is_truncated(self):
+        ast = self.analyze('''
+        set x = 1
+        x = x + 2.5
+        ''')
+        declaration, update = ast.statements
+        self.assertEqual(declaration.symbol.data_type, 'integer')
+        self.assertIsInstance(update.value, TypeCast)
+        self.assertEqual(update.value.type, 'integer')
+        self.assertIsInstance(update.value.value.left, TypeCast)
+        self.assertTrue(any("Truncating double to int" in message for message in error.get_errors()))
+
+    def test_mixed_operands_get_explicit_casts(self):
+        ast = self.analyze('''
+        function double scale(x:double) {
+            return x
+        }
+        set n = input().toInteger()
+        set ratio = n / 2.5
+        print(scale(n))
+        print(n ^ n)
+        ''')
+        ratio = ast.statements[2]
+        self.assertIsInstance(ratio.value.left, TypeCast)
+        self.assertEqual(ratio.value.left.type, 'double')
+        call = ast.statements[3].args[0].value
+        self.assertIsInstance(call.args[0].value, TypeCast)
+        power = ast.statements[4].args[0].value
+        self.assertEqual(power.evaluateType(), 'double')
+        self.assertIsInstance(power.left, TypeCast)
+        self.assertIsInstance(power.right, TypeCast)
+
+    def test_exponentiation_is_always_double(self):
+        ast = self.analyze('''
+        set a = input().toInteger()
+        set squared = a ^ 2
+        set cubed = a ^ a
+        ''')
+        squared, cubed = ast.statements[1:]
+        self.assertEqual(squared.symbol.data_type, 'double')
+        self.assertEqual(cubed.symbol.data_type, 'double')
+        self.assertIsInstance(squared.value.right, Double)
+
+    def test_annotated_variables_keep_their_type(self):
+        ast = self.analyze('''
+        set count:int = 0
+        set average = 0.0
+        average = count / 2.0
+        ''')
+        self.assertEqual(ast.statements[0].symbol.data_type, 'integer')
+        self.assertEqual(ast.statements[1].symbol.data_type, 'double')
+        self.assertIsInstance(ast.statements[2].value.left, TypeCast)
+
+class TestStringConcatenation(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def analyze(self, source_code):
+        ast = Parser(Lexer(source_code)).parse()
+        SemanticAnalyzer(ast).analyze()
+        self.assertFalse(error.has_error_occurred())
+        return ast
+
+    def test_long_chains_become_one_concatenation(self):
+        terms = 10000     # far deeper than the recursion limit
+        pieces = ['"a"' if i % 2 == 0 else 'name' for i in range(terms)]
+        ast = self.analyze('set name = input()\nset message = ' + ' + '.join(pieces) + '\nprint(message)\n')
+        message = ast.statements[1].value
+        self.assertIsInstance(message, StringCat)
+        self.assertIs(message.parent, ast.statements[1])
+        self.assertEqual(len(message.strings), terms)
+        self.assertEqual(message.strings[0], 'a')
+        references = message.strings[1::2]
+        self.assertTrue(all(isinstance(value, VariableReference) and value.symbol is not None for value in references))
+
+    def test_literals_are_folded_in_order(self):
+        ast = self.analyze('''
+        set name = input()
+        set count = 3
+        set a = 1 + 2 + "a" + name
+        set b = "b" + count + 4 + name + "c" + "d"
+        ''')
+        self.assertEqual(ast.statements[2].value.strings[0], '12a')
+        b = ast.statements[3].value
+        self.assertEqual(b.strings[0], 'b34')
+        self.assertIsInstance(b.strings[1], VariableReference)
+        self.assertEqual(b.strings[2], 'cd')
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,834 @@
+import ctypes
+import math
+import os
+import random
+import select
+import struct
+import sys
+import tempfile
+import threading
+import unittest
+import llvmlite.ir as ir
+import llvmlite.binding as llvm
+from Compiler.Lexer import *
+from Compiler.Parser import *
+from Compiler.Analyzer import *
+from Compiler.Optimizer import *
+from Compiler.Generator import *
+from Compiler.Generator.arena import StringArena
+from Compiler.Generator.reader import InputReader
+from Compiler.Generator.output import OutputBuffer
+from Compiler.utils import *
+from Compiler.compile import compile as compile_program
+
+def jit(generator):
+    llvm.initialize()
+    llvm.initialize_native_target()
+    llvm.initialize_native_asmprinter()
+    target_machine = llvm.Target.from_default_triple().create_target_machine()
+    module = llvm.parse_assembly(str(generator.module))
+    generator.linkRuntime(module)
+    engine = llvm.create_mcjit_compiler(module, target_machine)
+    engine.finalize_object()
+    return engine
+
+def program(source_code, **options):
+    """ Parses and analyzes a source string and returns the generator that built the module for it """
+    ast = Parser(Lexer(source_code)).parse()
+    symbol_table = SemanticAnalyzer(ast).analyze()
+    generator = LLVMCodeGenerator(symbol_table, **options)
+    generator.generate_code(ast)
+    return generator
+
+def generate(source_code):
+    """ Parses and analyzes a source string and returns the module the generator builds for it """
+    return program(source_code).module
+
+def run(generator, stdin=b''):
+    """ Runs the program's main with 'stdin' as its input and returns what it printed """
+    engine = jit(generator)
+    return captured(ctypes.CFUNCTYPE(None)(engine.get_function_address('main')), stdin)
+
+def captured(action, stdin=b''):
+    """ Calls 'action' with 'stdin' as the input of the process and returns what it wrote to stdout """
+    with tempfile.TemporaryFile() as input_file, tempfile.TemporaryFile() as output_file:
+        input_file.write(stdin)
+        input_file.seek(0)
+        sys.stdout.flush()
+        saved = os.dup(0), os.dup(1)
+        try:
+            os.dup2(input_file.fileno(), 0)
+            os.dup2(output_file.fileno(), 1)
+            action()
+        finally:
+            os.dup2(saved[0], 0)
+            os.dup2(saved[1], 1)
+            os.close(saved[0])
+            os.close(saved[1])
+        output_file.seek(0)
+        return output_file.read().decode()
+
+class TestNumberFormatter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        generator = LLVMCodeGenerator(None)
+        formatter = generator.numberFormatter()
+        # the runtime is linked in as internal functions, these wrappers are what the test calls
+        for name, routine, type_ in [('format_int', formatter.integer, ir.IntType(64)),
+                                     ('format_double', formatter.double, ir.DoubleType())]:
+            i8_ptr = ir.IntType(8).as_pointer()
+            function = ir.Function(generator.module, ir.FunctionType(ir.IntType(64), [i8_ptr, type_]), name=name)
+            builder = ir.IRBuilder(function.append_basic_block(name="entry"))
+            builder.ret(routine(builder, *function.args))
+        cls.engine = jit(generator)
+        cls.format_int = ctypes.CFUNCTYPE(ctypes.c_int64, ctypes.c_char_p, ctypes.c_int64)(cls.engine.get_function_address('format_int'))
+        cls.format_double = ctypes.CFUNCTYPE(ctypes.c_int64, ctypes.c_char_p, ctypes.c_double)(cls.engine.get_function_address('format_double'))
+
+    def formatted(self, routine, value):
+        buffer = ctypes.create_string_buffer(400)
+        length = routine(buffer, value)
+        return buffer.raw[:length].decode()
+
+    def test_integers_match_lld(self):
+        values = [0, 1, -1, 9, 10, 99, 100, 101, 999, 1000, 12345, -100000, 2**31, -2**31,
+                  10**18, 10**18 - 1, 2**63 - 1, -2**63]
+        random.seed(0)
+        values += [random.randint(-2**63, 2**63 - 1) >> random.randint(0, 63) for _ in range(5000)]
+        for value in values:
+            self.assertEqual(self.formatted(self.format_int, value), '%d' % value)
+
+    def test_doubles_match_f(self):
+        values = [0.0, -0.0, 1.0, -1.5, 0.5, 0.0000005, 0.0000015, 0.0000025, 0.9999995, 0.99999949999,
+                  2**-7, 123456.1234565, 1e-7, -1e-7, 5e-324, 2.2250738585072014e-308, 2**52 + 0.5,
+                  2**63 - 1024.0, 2.0**63, -2.0**63, 1e300, -1e308, float('inf'), float('-inf')]
+        # exact ties on the sixth decimal, which round to even
+        values += [n / 2**7 for n in range(-300, 300)] + [n / 2**20 for n in range(3000)]
+        random.seed(0)
+        for _ in range(20000):
+            # any bit pattern covers every exponent, the products favor ordinary numbers with decimals
+            values.append(struct.unpack('<d', struct.pack('<Q', random.getrandbits(64)))[0])
+            values.append(random.uniform(-1e6, 1e6) * 10 ** random.randint(-8, 8))
+        for value in values:
+            if math.isnan(value):
+                continue    # sprintf prints the sign of a nan, python doesn't
+            self.assertEqual(self.formatted(self.format_double, value), '%f' % value, repr(value))
+
+class TestPrint(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_printed_concatenation_is_not_built(self):
+        module = generate('''
+        function void move(n:int, name:string, x:double) {
+            print("Move disk " + n + " from " + name + " to " + x + "!")
+        }
+        move(3, "A", 2.5)
+        ''')
+        move = str(module.get_global('move'))
+        self.assertNotIn('@"glitchy.alloc"', move)
+        # room for all of it is reserved once, numbers are formatted right into it
+        self.assertEqual(move.count('@"glitchy.reserve"'), 1)
+        self.assertIn('@"glitchy.format.int"', move)
+        self.assertIn('@"glitchy.format.double"', move)
+        # the last literal carries the newline
+        self.assertIn(r'c"!\0a\00"', str(module))
+
+class TestLiterals(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_literal_is_emitted_once(self):
+        module = generate('''
+        function string tag(name:string) {
+            set tagged = "hello" + name
+            return tagged
+        }
+        set first = "hello"
+        set word = input()
+        set second = tag(word)
+        if (word == "hello") {
+            print(first + word)
+        }
+        print(second + "hello")
+        ''')
+        pooled = [value for value in module.global_values
+                  if isinstance(value, ir.GlobalVariable) and value.initializer is not None
+                  and value.initializer.constant == bytearray(b"hello\0")]
+        self.assertEqual(len(pooled), 1)
+        self.assertEqual(pooled[0].linkage, 'private')
+        self.assertTrue(pooled[0].global_constant and pooled[0].unnamed_addr)
+        # every use (in main and in tag) points at that one constant
+        name = f'@"{pooled[0].name}"'
+        self.assertEqual(str(module.get_global('tag')).count(name), 1)
+        self.assertEqual(str(module.get_global('main')).count(name), 4)
+
+class TestStackSlots(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def allocas(self, function):
+        return [instruction for block in function.blocks for instruction in block.instructions
+                if isinstance(instruction, ir.AllocaInstr)]
+
+    def test_literals_are_constants(self):
+        module = generate('''
+        function int seven() {
+            return 7
+        }
+        function boolean yes() {
+            return true
+        }
+        set n = 42
+        set x = 2.5
+        set flag = false
+        set total = n + 1 + seven()
+        if (yes()) {
+            print(x * 2.0)
+        }
+        print(total)
+        print(flag)
+        ''')
+        # a slot for every variable and none for the literals
+        main = module.get_global('main')
+        self.assertEqual([alloca.name for alloca in self.allocas(main)], ['n$0', 'x$0', 'flag$0', 'total$0'])
+        self.assertIn('store i64 42, i64* %"n$0"', str(main))
+        self.assertIn('store i1 0, i1* %"flag$0"', str(main))
+        self.assertIn('fmul double %"x$0.1", 0x4000000000000000', str(main))
+        for name, returned in [('seven', 'ret i64 7'), ('yes', 'ret i1 1')]:
+            function = module.get_global(name)
+            self.assertEqual(self.allocas(function), [])
+            self.assertIn(returned, str(function))
+
+    def test_slots_are_at_the_top_of_the_entry_block(self):
+        module = generate('''
+        function int sumTo(n:int) {
+            set total = 0
+            set i = 0
+            while (i < n) {
+                set square = i * i
+                if (square % 2 == 0) {
+                    set half = square / 2
+                    total = total + half
+                } else {
+                    set word = "odd" + i
+                    set size = word.length()
+                    total = total + size
+                }
+                i = i + 1
+            }
+            return total
+        }
+        set n = input().toInteger()
+        set j = 0
+        while (j < n) {
+            set result = sumTo(j)
+            print(result)
+            j = j + 1
+        }
+        ''')
+        for name, slots in [('sumTo', ['n.1', 'total$1', 'i$1', 'square$2', 'half$3', 'word$4', 'size$4']),
+                            ('main', ['n$0', 'j$0', 'result$5'])]:
+            function = module.get_global(name)
+            self.assertEqual([alloca.name for alloca in self.allocas(function)], slots)
+            # reserved once on entry, even for variables declared in a loop body
+            entry = function.entry_basic_block.instructions
+            self.assertTrue(all(isinstance(instruction, ir.AllocaInstr) for instruction in entry[:len(slots)]))
+
+class TestOutput(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_flushed_at_exit(self):
+        generator = program('''
+        function void greet(name:string) {
+            print("Hello " + name)
+        }
+        greet("there")
+        print(1.5)
+        ''')
+        # nothing is written before main returns
+        main = str(generator.module.get_global('main'))
+        self.assertEqual(main.count('@"glitchy.flush"'), 1)
+        self.assertNotIn('@"glitchy.flush"', str(generator.module.get_global('greet')))
+        self.assertEqual(run(generator), "Hello there\n1.500000\n")
+
+    def test_flushed_when_full(self):
+        generator = program('''
+        set n = input().toInteger()
+        set long = ""
+        set i = 0
+        while (i < n) {
+            print("line " + i)
+            print(i * 0.5)
+            long = long + "x"
+            i = i + 1
+        }
+        print(long)
+        print(long.length())
+        ''')
+        n = 20000
+        expected = "".join(f"line {i}\n{'%f' % (i * 0.5)}\n" for i in range(n)) + "x" * n + f"\n{n}\n"
+        # several buffers full, and a last line longer than the buffer
+        self.assertGreater(len(expected), 4 * OutputBuffer.SIZE)
+        self.assertEqual(run(generator, f"{n}\n".encode()), expected)
+
+    def test_flushed_before_input(self):
+        generator = program('''
+        print("Name?")
+        set name = input()
+        print("Hello " + name)
+        ''')
+        engine = jit(generator)
+        main = ctypes.CFUNCTYPE(None)(engine.get_function_address('main'))
+        input_read, input_write = os.pipe()
+        output_read, output_write = os.pipe()
+        sys.stdout.flush()
+        saved = os.dup(0), os.dup(1)
+        os.dup2(input_read, 0)
+        os.dup2(output_write, 1)
+        program_thread = threading.Thread(target=main)
+        program_thread.start()
+        try:
+            # the program is blocked on its input now, the prompt has to be out already
+            ready, _, _ = select.select([output_read], [], [], 10)
+            prompt = os.read(output_read, 100) if ready else b''
+        finally:
+            os.write(input_write, b'Ada\n')
+            os.close(input_write)
+            program_thread.join(10)
+            os.dup2(saved[0], 0)
+            os.dup2(saved[1], 1)
+            for fd in saved + (input_read, output_write):
+                os.close(fd)
+        with os.fdopen(output_read, 'rb') as output:
+            rest = output.read()
+        self.assertEqual(prompt, b"Name?\n")
+        self.assertEqual(rest, b"Hello Ada\n")
+
+class TestConcatenation(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_exact_length(self):
+        generator = program('''
+        set word = input()
+        set n = input().toInteger()
+        set x = input().toDouble()
+        set flag = word == "ab"
+        set all = word + n + x + flag + "!"
+        print(all)
+        print(all.length())
+        ''')
+        # one block for the concatenation and one for input(), sized up front
+        self.assertEqual(str(generator.module.get_global('main')).count('@"glitchy.alloc"'), 2)
+        # the longest number texts fill the room reserved for them
+        for stdin, expected in [(b'ab -9223372036854775808 -1.5\n', "ab-9223372036854775808-1.500000true!"),
+                                (b'abc 7 -1e308\n', f"abc7{'%f' % -1e308}false!")]:
+            self.assertEqual(run(generator, stdin), f"{expected}\n{len(expected)}\n")
+
+    def test_empty_operands(self):
+        generator = program('''
+        set word = input()
+        set empty = input()
+        set none = empty + empty + ""
+        print(none.length())
+        set around = empty + word + empty
+        print("(" + around + ")" + none)
+        print(around.length())
+        ''')
+        # the second input() is at the end of the input, so it is empty
+        self.assertEqual(run(generator, b'ab'), "0\n(ab)\n2\n")
+        self.assertEqual(run(generator, b''), "0\n()\n0\n")
+
+    def test_nested(self):
+        generator = program('''
+        function string wrap(s:string) {
+            set wrapped = "[" + s + "]"
+            return wrapped
+        }
+        set word = input()
+        set n = input().toInteger()
+        set inner = word + "-" + n
+        set wrapped = wrap(inner)
+        set outer = "<" + inner + wrapped + ">" + inner
+        print(outer)
+        print(outer.length())
+        set i = 0
+        while (i < 3) {
+            set twice = outer + outer
+            outer = twice + i
+            i = i + 1
+        }
+        print(outer.length())
+        ''')
+        inner = "ab-42"
+        outer = f"<{inner}[{inner}]>{inner}"
+        for i in range(3):
+            outer = outer + outer + str(i)
+        self.assertEqual(run(generator, b'ab 42'), f"<{inner}[{inner}]>{inner}\n{len(inner) * 3 + 4}\n{len(outer)}\n")
+
+class TestInput(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_integers(self):
+        generator = program('''
+        set count = input().toInteger()
+        set i = 0
+        while (i < count) {
+            set n = input().toInteger()
+            print(n)
+            i = i + 1
+        }
+        ''')
+        tokens = {
+            '42': 42, '+42': 42, '-42': -42, '007': 7, '-0': 0,
+            '9223372036854775807': 2**63 - 1, '-9223372036854775808': -2**63,
+            # out of range values saturate like strtol
+            '9223372036854775808': 2**63 - 1, '-9223372036854775809': -2**63,
+            '99999999999999999999999': 2**63 - 1, '-99999999999999999999999': -2**63,
+            # digits up to the first other character, like atol
+            '12abc': 12, '-3.9': -3, 'abc': 0, '-': 0, '+': 0, '+-1': 0,
+        }
+        stdin = f"{len(tokens) + 1}\n" + "\n".join(tokens) + "\n"
+        # the last one is read at the end of the input
+        expected = "".join(f"{value}\n" for value in tokens.values()) + "0\n"
+        self.assertEqual(run(generator, stdin.encode()), expected)
+
+    def test_doubles_and_strings(self):
+        generator = program('''
+        set x = input().toDouble()
+        set word = input()
+        set y = input().toDouble()
+        set z = input().toDouble()
+        set rest = input()
+        print(x)
+        print("[" + word + "]")
+        print(y)
+        print(z)
+        print("[" + rest + "]")
+        ''')
+        self.assertEqual(run(generator, b'  -2.5\t\n\n  hello   +1e3 abc'), "-2.500000\n[hello]\n1000.000000\n0.000000\n[]\n")
+        self.assertEqual(run(generator, b''), "0.000000\n[]\n0.000000\n0.000000\n[]\n")
+
+    def test_tokens_across_refills(self):
+        generator = program('''
+        set count = input().toInteger()
+        set total = 0
+        set i = 0
+        while (i < count) {
+            set n = input().toInteger()
+            total = total + n
+            i = i + 1
+        }
+        set last = input()
+        print(total)
+        print(last.length())
+        ''')
+        # well over one buffer of input, and a token longer than what is left of one
+        numbers = list(range(-30000, 30000, 3))
+        stdin = f"{len(numbers)}\n" + " ".join(map(str, numbers)) + " " + "x" * 70000
+        self.assertEqual(run(generator, stdin.encode()), f"{sum(numbers)}\n{InputReader.SIZE}\n")
+
+class TestRuntime(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_runtime_is_declared_then_linked(self):
+        module = generate('''
+        set n = input().toInteger()
+        print("n is " + n)
+        ''')
+        self.assertTrue(module.get_global('glitchy.token').is_declaration)
+        self.assertTrue(module.get_global('glitchy.reserve').is_declaration)
+
+        llvm.initialize()
+        llvm.initialize_native_target()
+        llvm.initialize_native_asmprinter()
+        linked = llvm.parse_assembly(str(module))
+        Runtime.shared().link(linked)
+        linked.verify()
+        for name in ('glitchy.token', 'glitchy.reserve', 'glitchy.format.int'):
+            function = linked.get_function(name)
+            self.assertFalse(function.is_declaration)
+            self.assertEqual(function.linkage, llvm.Linkage.internal)
+
+    def test_compiles_twice_in_one_process(self):
+        source = '''
+        set n = input().toInteger()
+        print("n is " + n)
+        '''
+        # the runtime is parsed once and linked into both programs
+        self.assertEqual(captured(lambda: compile_program(source, 0), b'3'), "n is 3\n")
+        parsed = Runtime.shared().parsed
+        self.assertEqual(captured(lambda: compile_program(source, 0), b'4'), "n is 4\n")
+        self.assertIs(Runtime.shared().parsed, parsed)
+
+    def test_loop_invariant_string_calls_are_hoisted(self):
+        module = generate('''
+        set s = input()
+        set t = input()
+        set total = 0
+        set i = 0
+        while (i < 1000) {
+            set n = s.length()
+            if (s == t) {
+                total = total + n
+            }
+            i = i + 1
+        }
+        print(total)
+        ''')
+        self.assertIn('declare i32 @"strcmp"(i8* nocapture %".1", i8* nocapture %".2") argmemonly nounwind readonly', str(module))
+
+        llvm.initialize()
+        llvm.initialize_native_target()
+        llvm.initialize_native_asmprinter()
+        optimized = llvm.parse_assembly(str(module))
+        Runtime.shared().link(optimized)
+        builder = llvm.create_pass_manager_builder()
+        builder.opt_level = 3
+        pass_manager = llvm.create_module_pass_manager()
+        builder.populate(pass_manager)
+        pass_manager.run(optimized)
+
+        # every block that branches back to itself is a loop, neither call is left in one
+        main = str(optimized.get_function('main'))
+        loops = [block for block in main.split('\n\n') if f"label %{block.strip().split(':')[0]}" in block]
+        self.assertTrue(loops)
+        for block in loops:
+            self.assertNotIn('@strlen', block)
+            self.assertNotIn('@strcmp', block)
+        self.assertIn('@strlen', main)
+        self.assertIn('@strcmp', main)
+
+class MallInfo(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_size_t) for name in
+                ('arena', 'ordblks', 'smblks', 'hblks', 'hblkhd', 'usmblks', 'fsmblks', 'uordblks', 'fordblks', 'keepcost')]
+
+def allocated():
+    """ Bytes malloc handed out that weren't freed yet (glibc only) """
+    libc = ctypes.CDLL(None)
+    libc.mallinfo2.restype = MallInfo
+    info = libc.mallinfo2()
+    return info.hblkhd + info.uordblks
+
+class TestArena(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_reset_and_promote(self):
+        generator = LLVMCodeGenerator(None)
+        arena = generator.stringArena()
+        i8_ptr = ir.IntType(8).as_pointer()
+        i64 = ir.IntType(64)
+
+        # allocates, resets to the mark taken before and allocates again, returns whether both got the same bytes
+        function = ir.Function(generator.module, ir.FunctionType(ir.IntType(1), [i64]), name="reused")
+        builder = ir.IRBuilder(function.append_basic_block(name="entry"))
+        mark = arena.mark(builder)
+        first = arena.alloc(builder, function.args[0])
+        arena.reset(builder, mark)
+        second = arena.alloc(builder, function.args[0])
+        builder.ret(builder.icmp_unsigned('==', first, second))
+
+        for name, routine in [('promote', arena.promote), ('copy', arena.copy)]:
+            function = ir.Function(generator.module, ir.FunctionType(i8_ptr, [i8_ptr]), name=name)
+            builder = ir.IRBuilder(function.append_basic_block(name="entry"))
+            builder.ret(routine(builder, function.args[0]))
+        function = ir.Function(generator.module, ir.FunctionType(ir.VoidType(), [i8_ptr]), name="discard")
+        builder = ir.IRBuilder(function.append_basic_block(name="entry"))
+        arena.discard(builder, function.args[0])
+        builder.ret_void()
+
+        engine = jit(generator)
+        reused = ctypes.CFUNCTYPE(ctypes.c_bool, ctypes.c_int64)(engine.get_function_address('reused'))
+        promote = ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_char_p)(engine.get_function_address('promote'))
+        copy = ctypes.CFUNCTYPE(ctypes.c_void_p, ctypes.c_char_p)(engine.get_function_address('copy'))
+        discard = ctypes.CFUNCTYPE(None, ctypes.c_void_p)(engine.get_function_address('discard'))
+
+        # larger than a chunk too, reset goes back to the chunk it was in
+        for size in (1, 100, StringArena.CHUNK_SIZE + 1):
+            self.assertTrue(reused(size))
+
+        text = b"promoted" * 1000
+        promoted = promote(text)
+        self.assertEqual(ctypes.string_at(promoted), text)
+        self.assertNotEqual(promoted, copy(text))
+        discard(promoted)
+        discard(None)
+
+    def test_regions_are_reset(self):
+        module = generate('''
+        function string greet(name:string) {
+            set greeting = "Hello " + name + "!"
+            return greeting
+        }
+        set i = 0
+        while (i < 3) {
+            set message = greet("n" + i)
+            print(message)
+            i = i + 1
+        }
+        ''')
+        main = str(module.get_global('main'))
+        self.assertIn('@"glitchy.reset"', main)     # after every iteration
+        self.assertNotIn('@"glitchy.promote"', main)
+        greet = str(module.get_global('greet'))
+        # the returned string is copied down to where the function's region started
+        self.assertLess(greet.index('@"glitchy.reset"'), greet.index('@"glitchy.copy"'))
+
+    @unittest.skipUnless(hasattr(ctypes.CDLL(None), 'mallinfo2'), "needs glibc's mallinfo2")
+    def test_promoted_strings_are_freed(self):
+        ast = Parser(Lexer('''
+        set all = ""
+        set kept = ""
+        set i = 0
+        while (i < 4000) {
+            all = all + "abcdefghij"
+            kept = all
+            i = i + 1
+        }
+        print(all.length() + kept.length())
+        ''')).parse()
+        generator = LLVMCodeGenerator(SemanticAnalyzer(ast).analyze())
+        generator.generate_code(ast)
+        main = str(generator.module.get_global('main'))
+        self.assertEqual(main.count('@"glitchy.promote"'), 2)
+        self.assertEqual(main.count('@"free"'), 2)
+
+        # only the last string each variable holds is left, not every one built (that would be 160MB)
+        engine = jit(generator)
+        run = ctypes.CFUNCTYPE(None)(engine.get_function_address('main'))
+        before = allocated()
+        run()
+        self.assertLess(allocated() - before, 8 << 20)
+
+class TestFunctions(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_only_main_is_exported(self):
+        module = generate('''
+        function int twice(n:int) {
+            return n * 2
+        }
+        function int unused(n:int) {
+            return n
+        }
+        print(twice(3))
+        ''')
+        self.assertEqual(module.get_global('main').linkage, '')
+        for name in ('twice', 'unused'):
+            function = module.get_global(name)
+            self.assertEqual(function.linkage, 'internal')
+            self.assertEqual(function.calling_convention, 'fastcc')
+        self.assertIn('call fastcc i64 @"twice"', str(module.get_global('main')))
+
+    def test_effects_become_attributes(self):
+        ast = Parser(Lexer('''
+        function boolean isPrime(n:int) {
+            for (set i = 2; i < n; i++) {
+                if (n % i == 0) {
+                    return false
+                }
+            }
+            return n > 1
+        }
+        function int loud(n:int) {
+            print(n)
+            return n
+        }
+        set n = input().toInteger()
+        set count = 0
+        set i = 0
+        while (i < n) {
+            set unused = isPrime(i)
+            if (isPrime(97)) {
+                count = count + 1
+            }
+            i = i + 1
+        }
+        print(count + loud(1))
+        ''')).parse()
+        symbol_table = SemanticAnalyzer(ast).analyze()
+        EffectAnalyzer(ast).run()
+        module = LLVMCodeGenerator(symbol_table).generate_code(ast)
+        self.assertIn('@"isPrime"(i64 %"n") norecurse nounwind readnone willreturn', str(module))
+        self.assertIn('@"loud"(i64 %"n") norecurse nounwind willreturn', str(module))
+
+        llvm.initialize()
+        llvm.initialize_native_target()
+        llvm.initialize_native_asmprinter()
+        optimized = llvm.parse_assembly(str(module))
+        Runtime.shared().link(optimized)
+        builder = llvm.create_pass_manager_builder()
+        builder.opt_level = 3
+        pass_manager = llvm.create_module_pass_manager()
+        builder.populate(pass_manager)
+        pass_manager.run(optimized)
+
+        # the unused call is gone and the one with a constant argument is made once, so no loop is left
+        main = str(optimized.get_function('main'))
+        self.assertEqual(main.count('@isPrime'), 1)
+        self.assertIn('@isPrime(i64 97)', main)
+        self.assertFalse([block for block in main.split('\n\n') if f"label %{block.strip().split(':')[0]}" in block])
+
+class TestSSA(unittest.TestCase):
+    SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'samples')
+    # input for the samples that read some, the ones left out don't compile
+    INPUT = {'ackermann': b'2\n2\n', 'average': b'4\n6\n-1\n', 'calculator': b'+\n4\n5\n*\n3\n7\n/\n1\n0\nexit\n',
+             'collatz': b'27\n', 'exp': b'3\n2\n', 'fib': b'30\n', 'hanoi': b'', 'isPrime': b'97\n', 'turing': b''}
+
+    def setUp(self):
+        error.clear_errors()
+
+    def test_samples_match_without_stack_slots(self):
+        for name, stdin in self.INPUT.items():
+            with self.subTest(sample=name):
+                with open(os.path.join(self.SAMPLES, f"{name}.g")) as file:
+                    source = file.read()
+                in_memory = program(source)
+                in_registers = program(source, ssa=True)
+                output = run(in_memory, stdin)
+                self.assertTrue(output)
+                self.assertEqual(run(in_registers, stdin), output)
+
+                # integers, doubles and booleans are all kept in registers
+                for function in in_registers.module.functions:
+                    for block in function.blocks:
+                        for instruction in block.instructions:
+                            if isinstance(instruction, ir.AllocaInstr):
+                                self.assertNotIn(instruction.type.pointee, (ir.IntType(64), ir.DoubleType(), ir.IntType(1)),
+                                                 f"{function.name}: {instruction}")
+
+class TestMIRLowering(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def instructions(self, function, kind):
+        return [instruction for block in function.blocks for instruction in block.instructions
+                if isinstance(instruction, kind)]
+
+    def test_numeric_functions_are_lowered_from_the_mir(self):
+        generator = program('''
+        function int countPrimes(limit:int) {
+            set count = 0
+            set n = 2
+            while (n < limit) {
+                set d = 2
+                set prime = true
+                while (d * d <= n) {
+                    if (n % d == 0) {
+                        prime = false
+                        break
+                    }
+                    d = d + 1
+                }
+                if (prime) {
+                    count = count + 1
+                }
+                n = n + 1
+            }
+            print("found " + count + " below " + limit)
+            return count
+        }
+        set limit = input().toInteger()
+        print(countPrimes(limit))
+        ''')
+        function = generator.module.get_global('countPrimes')
+        # the variables are phis straight away, the print writes its pieces without building a string
+        self.assertEqual(self.instructions(function, ir.AllocaInstr), [])
+        self.assertTrue(self.instructions(function, ir.PhiInstr))
+        self.assertNotIn('@"glitchy.alloc"', str(function))
+        self.assertEqual(run(generator, b'100\n'), "found 25 below 100\n25\n")
+
+    def test_functions_with_string_values_are_generated_from_the_ast(self):
+        generator = program('''
+        function int describe(n:int) {
+            set word = "number " + n
+            print(word)
+            return word.length()
+        }
+        print(describe(42))
+        ''')
+        function = generator.module.get_global('describe')
+        self.assertTrue(self.instructions(function, ir.AllocaInstr))
+        self.assertEqual(run(generator), "number 42\n9\n")
+
+    def test_self_tail_calls_become_a_loop(self):
+        ast = Parser(Lexer('''
+        function int gcd(a:int, b:int) {
+            if (b == 0) {
+                return a
+            }
+            return gcd(b, a % b)
+        }
+        set n = input().toInteger()
+        print(gcd(n * 6, 4))
+        ''')).parse()
+        symbol_table = SemanticAnalyzer(ast).analyze()
+        TailCallMarker(ast).mark()
+        generator = LLVMCodeGenerator(symbol_table)
+        generator.generate_code(ast)
+        function = generator.module.get_global('gcd')
+        self.assertEqual(self.instructions(function, ir.CallInstr), [])
+        self.assertEqual([block.name for block in function.blocks][:2], ['entry', 'tail_recurse'])
+        self.assertEqual(run(generator, b'7\n'), "2\n")
+
+class TestPipeline(unittest.TestCase):
+    SOURCE = '''
+    function int square(n:int) {
+        return n * n
+    }
+    set n = input().toInteger()
+    set total = 0
+    for (set i = 0; i < n; i++) {
+        set squared = square(i)
+        total = total + squared
+    }
+    print(total)
+    '''
+
+    def setUp(self):
+        error.clear_errors()
+
+    def optimize(self, pipeline):
+        llvm.initialize()
+        llvm.initialize_native_target()
+        llvm.initialize_native_asmprinter()
+        ast = Parser(Lexer(self.SOURCE)).parse()
+        generator = LLVMCodeGenerator(SemanticAnalyzer(ast).analyze())
+        module = llvm.parse_assembly(str(generator.generate_code(ast)))
+        generator.linkRuntime(module)
+        pipeline.run(module, pipeline.targetMachine())
+        module.verify()
+        return module
+
+    def test_levels(self):
+        pipeline = OptimizationPipeline.fromFlag('s')
+        self.assertEqual((pipeline.opt_level, pipeline.size_level, pipeline.inline_threshold), (2, 1, 75))
+        self.assertTrue(pipeline.loop_vectorize)
+        pipeline = OptimizationPipeline.fromFlag('0', loop_vectorize=True)
+        self.assertIsNone(pipeline.inline_threshold)
+        self.assertEqual((pipeline.loop_vectorize, pipeline.slp_vectorize), (True, False))
+        self.assertEqual(OptimizationPipeline(inline_threshold=1000).inline_threshold, 1000)
+        with self.assertRaises(ValueError):
+            OptimizationPipeline(passes=['sroa', 'no_such_pass'])
+
+    def test_stats(self):
+        unoptimized = self.optimize(OptimizationPipeline(opt_level=0))
+        pipeline = OptimizationPipeline(stats=True)
+        optimized = self.optimize(pipeline)
+        self.assertEqual([step for step, _ in pipeline.durations], ['function passes', 'module passes'])
+        self.assertLess(pipeline.after['instructions'], pipeline.before['instructions'])
+        self.assertIn('@square', str(unoptimized))
+        self.assertNotIn('@square', str(optimized))   # inlined
+
+    def test_explicit_passes(self):
+        pipeline = OptimizationPipeline(passes=['sroa', 'function-inlining'], time_passes=True)
+        module = self.optimize(pipeline)
+        self.assertEqual(pipeline.passes, ['sroa', 'function_inlining'])
+        self.assertNotIn('alloca', str(module.get_function('main')))
+        self.assertNotIn('@square', str(module.get_function('main')))
+        self.assertIn('Pass execution timing report', pipeline.timings)
@@ -0,0 +1,115 @@
+import unittest
+from Compiler.Lexer import *
+from Compiler.Parser import *
+from Compiler.Analyzer import *
+from Compiler.MIR import *
+from Compiler.utils import *
+
+def build(source_code):
+    """ Parses, analyzes and builds the MIR of a source string, returning the AST and the builder """
+    ast = Parser(Lexer(source_code)).parse()
+    SemanticAnalyzer(ast).analyze()
+    builder = MIRBuilder(ast)
+    builder.build()
+    return ast, builder
+
+def optimize(source_code):
+    ast, builder = build(source_code)
+    PassManager().run(builder.module)
+    MIRFeedback(ast, builder.module, builder.values).apply()
+    return ast
+
+class TestMIR(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_loops_get_phis(self):
+        _, builder = build('''
+        set i = 0
+        while (i < 10) {
+            i++
+        }
+        print(i)
+        ''')
+        main = builder.module.functions[0]
+        condition = next(block for block in main.blocks if block.name.startswith('while.cond'))
+        self.assertEqual(len(condition.phis), 1)
+        self.assertEqual(condition.phis[0].attr.name, 'i')
+        self.assertEqual(len(condition.phis[0].operands), 2)
+
+        # straight line code needs none
+        _, builder = build('''
+        set x = 1
+        x = x + 1
+        print(x)
+        ''')
+        self.assertEqual(builder.module.functions[0].entry.phis, [])
+
+    def test_constants_propagate_through_loops(self):
+        ast = optimize('''
+        set step = 2
+        set i = 0
+        while (i < 10) {
+            print(i * step)
+            i++
+        }
+        ''')
+        self.assertFalse(has_error_occurred())
+        loop = ast.statements[-1]
+        self.assertIsInstance(loop, While)
+        product = loop.block.statements[0].args[0].value
+        self.assertIsInstance(product.right, Integer)
+        self.assertEqual(product.right.value, 2)
+        self.assertIsInstance(product.left, VariableReference)     # i changes in the loop
+
+    def test_folding_follows_runtime_semantics(self):
+        ast = optimize('''
+        set a = 7
+        set b = 0 - 2
+        print(a / b)
+        print(a % b)
+        print(a / 0)
+        ''')
+        prints = [statement.args[0].value for statement in ast.statements if isinstance(statement, FunctionCall)]
+        self.assertEqual(prints[0].value, -3)
+        self.assertEqual(prints[1].value, 1)
+        self.assertIsInstance(prints[2], BinaryOp)     # division by zero is left to the runtime
+
+    def test_concat_fusion_and_dead_stores(self):
+        ast = optimize('''
+        set name = input()
+        set greeting = "hi " + name
+        set message = greeting + "!"
+        print(message)
+        set unused = 42
+        ''')
+        names = [statement.name for statement in ast.statements if isinstance(statement, VariableDeclaration)]
+        self.assertEqual(names, ['name', 'message'])
+        message = ast.statements[1].value
+        self.assertIsInstance(message, StringCat)
+        self.assertEqual(len(message.strings), 3)
+
+    def test_constant_stores_into_a_merge_are_kept(self):
+        ast = optimize('''
+        set x = input().toInteger()
+        if (x < 3) {
+            x = 10
+        } else {
+            x = x + 1
+        }
+        print(x)
+        ''')
+        branch = ast.statements[1]
+        self.assertEqual(len(branch.block.statements), 1)
+        self.assertEqual(branch.block.statements[0].value.value, 10)
+
+    def test_stores_with_side_effects_are_kept(self):
+        ast = optimize('''
+        set line = input()
+        function int f(n:int) {
+            return n
+        }
+        set unused = f(1)
+        ''')
+        names = [statement.name for statement in ast.statements if isinstance(statement, VariableDeclaration)]
+        self.assertEqual(names, ['line', 'unused'])
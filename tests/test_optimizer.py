@@ -0,0 +1,500 @@
+import unittest
+from Compiler.Lexer import *
+from Compiler.Parser import *
+from Compiler.Analyzer import *
+from Compiler.Optimizer import *
+from Compiler.utils import *
+
+def analyze(source_code):
+    """ Parses and analyzes a source string, returning the analyzed AST """
+    ast = Parser(Lexer(source_code)).parse()
+    SemanticAnalyzer(ast).analyze()
+    return ast
+
+class TestDeadCode(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_statements_after_return(self):
+        ast = analyze('''
+        function int f(n:int) {
+            return n
+            print("unreachable")
+        }
+        print(f(1))
+        ''')
+        removed = DeadCodeEliminator(ast).eliminate()
+        self.assertFalse(error.has_error_occurred())
+        function = ast.statements[0]
+        self.assertEqual(len(function.block.statements), 1)
+        self.assertIsInstance(function.block.statements[0], Return)
+        self.assertEqual(len(removed), 1)
+
+    def test_statements_after_terminating_if(self):
+        ast = analyze('''
+        while (true) {
+            if (true == true) {
+                break
+            } else {
+                break
+            }
+            print("unreachable")
+        }
+        ''')
+        DeadCodeEliminator(ast).eliminate()
+        loop = ast.statements[0]
+        self.assertEqual(len(loop.block.statements), 1)
+
+    def test_constant_branches(self):
+        ast = analyze('''
+        set x = 1
+        if (false) {
+            print("a")
+        } elif (x == 1) {
+            print("b")
+        } elif (2 > 1) {
+            print("c")
+        } else {
+            print("d")
+        }
+        ''')
+        DeadCodeEliminator(ast).eliminate()
+        node = ast.statements[1]
+        self.assertIsInstance(node, If)
+        self.assertEqual(node.block.statements[0].args[0].value.value, "b")
+        self.assertEqual(node.elifNodes, [])
+        self.assertEqual(node.elseBlock.statements[0].args[0].value.value, "c")
+
+    def test_always_true_if_is_replaced_by_its_block(self):
+        ast = analyze('''
+        if (!false) {
+            print("a")
+        } else {
+            print("b")
+        }
+        ''')
+        DeadCodeEliminator(ast).eliminate()
+        self.assertIsInstance(ast.statements[0], Block)
+        self.assertEqual(len(ast.statements[0].statements), 1)
+
+    def test_false_while_and_if_are_removed(self):
+        ast = analyze('''
+        while (1 > 2) {
+            print("loop")
+        }
+        if (false && true) {
+            print("never")
+        }
+        print("done")
+        ''')
+        removed = DeadCodeEliminator(ast).eliminate()
+        self.assertEqual(len(ast.statements), 1)
+        self.assertEqual(len(removed), 2)
+
+    def test_runtime_conditions_are_kept(self):
+        ast = analyze('''
+        set x = input().toInteger()
+        if (x > 2) {
+            print("big")
+        }
+        ''')
+        removed = DeadCodeEliminator(ast).eliminate()
+        self.assertEqual(removed, [])
+        self.assertIsInstance(ast.statements[1], If)
+
+    def test_unused_functions(self):
+        ast = analyze('''
+        function int helper(n:int) {
+            return n + 1
+        }
+        function int used(n:int) {
+            return helper(n)
+        }
+        function int unused(n:int) {
+            return used(n)
+        }
+        print(used(1))
+        ''')
+        removed = DeadCodeEliminator(ast).eliminate()
+        names = [statement.name for statement in ast.statements if isinstance(statement, FunctionDeclaration)]
+        self.assertEqual(names, ['helper', 'used'])
+        self.assertIn("Removed unused function 'unused'", removed)
+
+class TestTailCalls(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_self_tail_recursion(self):
+        ast = analyze('''
+        function int sumTo(n:int, acc:int) {
+            if (n == 0) {
+                return acc
+            }
+            return sumTo(n - 1, acc + n)
+        }
+        print(sumTo(10, 0))
+        ''')
+        TailCallMarker(ast).mark()
+        function = ast.statements[0]
+        self.assertTrue(function.tailRecursive)
+        self.assertEqual(function.block.statements[1].value.tail, 'return')
+
+    def test_void_tail_calls(self):
+        ast = analyze('''
+        function void stateMachine(state:int) {
+            if (state == 0) {
+                print("start")
+                stateMachine(1)
+            } elif (state == 1) {
+                stateMachine(2)
+                return
+            }
+        }
+        stateMachine(0)
+        ''')
+        TailCallMarker(ast).mark()
+        node = ast.statements[0].block.statements[0]
+        self.assertEqual(node.block.statements[1].tail, 'void')
+        self.assertEqual(node.elifNodes[0][1].statements[0].tail, 'void')
+        self.assertIsNone(node.block.statements[0].tail)   # builtins are never marked
+
+    def test_calls_not_in_tail_position(self):
+        ast = analyze('''
+        function int fact(n:int) {
+            if (n <= 1) {
+                return 1
+            }
+            return n * fact(n - 1)
+        }
+        function void hanoi(n:int) {
+            if (n > 0) {
+                hanoi(n - 1)
+                print(n)
+            }
+            while (n > 5) {
+                hanoi(n - 1)
+            }
+        }
+        print(fact(5))
+        hanoi(3)
+        ''')
+        TailCallMarker(ast).mark()
+        self.assertFalse(ast.statements[0].tailRecursive)
+        self.assertFalse(ast.statements[1].tailRecursive)
+
+class TestMemoization(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_purity(self):
+        ast = analyze('''
+        function int square(n:int) {
+            set result = n * n
+            return result
+        }
+        function int loud(n:int) {
+            print(n)
+            return n
+        }
+        function int callsLoud(n:int) {
+            return square(loud(n))
+        }
+        print(callsLoud(2))
+        ''')
+        pure = PurityAnalyzer(ast).analyze()
+        self.assertEqual(pure, {'square': True, 'loud': False, 'callsLoud': False})
+
+    def test_pure_recursive_functions_are_memoized(self):
+        ast = analyze('''
+        function int fib(n:int) {
+            if (n < 2) {
+                return n
+            }
+            return fib(n - 1) + fib(n - 2)
+        }
+        function int fact(n:int) {
+            if (n <= 1) {
+                return 1
+            }
+            return n * fact(n - 1)
+        }
+        function int noisyFib(n:int) {
+            print(n)
+            if (n < 2) {
+                return n
+            }
+            return noisyFib(n - 1) + noisyFib(n - 2)
+        }
+        print(fib(10) + fact(5) + noisyFib(3))
+        ''')
+        memoized = Memoizer(ast).run()
+        fib, fact, noisy_fib = ast.statements[:3]
+        self.assertTrue(fib.memoize)
+        self.assertFalse(fact.memoize)          # a single recursive call never repeats work
+        self.assertFalse(noisy_fib.memoize)
+        self.assertEqual(len(memoized), 1)
+
+    def test_memo_annotation(self):
+        ast = analyze('''
+        @memo
+        function double half(x:double) {
+            return x / 2.0
+        }
+        @memo
+        function string name(n:int) {
+            return "name"
+        }
+        print(half(1.0))
+        print(name(1))
+        ''')
+        half, name = ast.statements[:2]
+        self.assertEqual(half.annotations, ['memo'])
+        Memoizer(ast).run()
+        self.assertFalse(error.has_error_occurred())
+        self.assertTrue(half.memoize)
+        self.assertFalse(name.memoize)          # strings can't be stored in the table
+
+    def test_memoization_can_be_disabled(self):
+        ast = analyze('''
+        @memo
+        function int twice(n:int) {
+            return n * 2
+        }
+        print(twice(1))
+        ''')
+        self.assertEqual(Memoizer(ast, enabled=False).run(), [])
+        self.assertFalse(ast.statements[0].memoize)
+
+    def test_unknown_annotation(self):
+        Parser(Lexer('''
+        @fast
+        function int f(n:int) {
+            return n
+        }
+        ''')).parse()
+        self.assertTrue(error.has_error_occurred())
+
+class TestEffects(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_memory(self):
+        ast = analyze('''
+        function int square(n:int) {
+            return n * n
+        }
+        function int size(s:string) {
+            return s.length() + square(2)
+        }
+        function string greet(s:string) {
+            set greeting = "hi " + s
+            return greeting
+        }
+        function int loud(n:int) {
+            print(n)
+            return n
+        }
+        function int callsLoud(n:int) {
+            return square(loud(n))
+        }
+        print(size(greet("you")) + callsLoud(1))
+        ''')
+        EffectAnalyzer(ast).run()
+        self.assertFalse(error.has_error_occurred())
+        memory = {function.name: function.memory for function in ast.statements[:5]}
+        self.assertEqual(memory, {'square': 'none', 'size': 'read', 'greet': 'any', 'loud': 'any', 'callsLoud': 'any'})
+
+    def test_memoized_functions_write_memory(self):
+        ast = analyze('''
+        @memo
+        function int twice(n:int) {
+            return n * 2
+        }
+        function int callsTwice(n:int) {
+            return twice(n) + 1
+        }
+        print(callsTwice(1))
+        ''')
+        Memoizer(ast).run()
+        EffectAnalyzer(ast).run()
+        self.assertEqual([function.memory for function in ast.statements[:2]], ['any', 'any'])
+
+    def test_recursion_and_termination(self):
+        ast = analyze('''
+        function int fact(n:int) {
+            if (n <= 1) {
+                return 1
+            }
+            return n * fact(n - 1)
+        }
+        function int sum(n:int) {
+            set total = 0
+            for (set i = 0; i < n; i++) {
+                for (set j = 10; j >= 0; j--) {
+                    total = total + i * j
+                }
+            }
+            return total
+        }
+        function int collatz(n:int) {
+            set steps = 0
+            while (n > 1) {
+                if (n % 2 == 0) {
+                    n = n / 2
+                } else {
+                    n = 3 * n + 1
+                }
+                steps = steps + 1
+            }
+            return steps
+        }
+        function int skips(n:int) {
+            set total = 0
+            for (set i = 0; i < n; i++) {
+                i = i * 2
+                total = total + i
+            }
+            return total
+        }
+        function int callsFact(n:int) {
+            return fact(n) + sum(n)
+        }
+        print(callsFact(3) + collatz(7) + skips(5))
+        ''')
+        EffectAnalyzer(ast).run()
+        functions = {function.name: function for function in ast.statements[:5]}
+        self.assertTrue(functions['fact'].recursive)
+        self.assertEqual([name for name, function in functions.items() if function.recursive], ['fact'])
+        self.assertEqual([name for name, function in functions.items() if function.terminates], ['sum'])
+
+class TestCompileTimeEvaluation(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_pure_calls_with_literal_arguments(self):
+        ast = analyze('''
+        function int fib(n:int) {
+            if (n < 2) {
+                return n
+            }
+            return fib(n - 1) + fib(n - 2)
+        }
+        function string label(n:int, big:bool) {
+            if (big) {
+                set text = "big " + n
+                return text
+            }
+            return "small"
+        }
+        print(fib(50))
+        print(label(fib(5), true))
+        ''')
+        evaluator = CompileTimeEvaluator(ast)
+        evaluator.run()
+        self.assertEqual(evaluator.folded, 3)     # fib(5) is folded before label is called
+        first, second = ast.statements[2].args[0].value, ast.statements[3].args[0].value
+        self.assertIsInstance(first, Integer)
+        self.assertEqual(first.value, 12586269025)
+        self.assertIsInstance(second, String)
+        self.assertEqual(second.value, 'big 5')
+
+    def test_calls_left_to_the_runtime(self):
+        ast = analyze('''
+        function int loud(n:int) {
+            print(n)
+            return n
+        }
+        function int divide(n:int) {
+            return 10 / n
+        }
+        function int twice(n:int) {
+            return n * 2
+        }
+        print(loud(1))
+        print(divide(0))
+        print(twice(input().length()))
+        ''')
+        evaluator = CompileTimeEvaluator(ast)
+        evaluator.run()
+        self.assertEqual(evaluator.folded, 0)
+        for statement in ast.statements[3:]:
+            self.assertIsInstance(statement.args[0].value, FunctionCall)
+
+    def test_fuel_limit(self):
+        ast = analyze('''
+        function int spin(n:int) {
+            set i = 0
+            while (n > 0) {
+                i = i + 1
+            }
+            return i
+        }
+        print(spin(1))
+        ''')
+        evaluator = CompileTimeEvaluator(ast, fuel=500)
+        report = evaluator.run()
+        self.assertIsInstance(ast.statements[1].args[0].value, FunctionCall)
+        self.assertIn("gave up on 'spin' after 500 steps", report[0])
+
+        # no fuel turns evaluation off
+        ast = analyze('''
+        function int one() {
+            return 1
+        }
+        print(one())
+        ''')
+        self.assertEqual(CompileTimeEvaluator(ast, fuel=0).run(), [])
+        self.assertIsInstance(ast.statements[1].args[0].value, FunctionCall)
+
+class TestSpecialization(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_calls_with_literal_arguments_get_a_clone(self):
+        ast = analyze('''
+        function void step(state:int, value:int) {
+            if (state == 0) {
+                print("start " + value)
+            } else {
+                print("stop " + value)
+            }
+        }
+        set n = input().length()
+        step(0, n)
+        step(0, n + 1)
+        step(1, n)
+        ''')
+        specializer = FunctionSpecializer(ast)
+        self.assertEqual(specializer.run(), 3)
+        original = ast.statements[0]
+        clones = {clone.block.statements[0].value.value: clone for clone in ast.statements[1:3]}   # right after the original
+        start, stop = clones[0], clones[1]
+        self.assertEqual([param.name for param in start.parameters], ['value'])
+
+        # the constant parameter became a local with its own symbol, on the line the function starts
+        declaration = start.block.statements[0]
+        self.assertIsInstance(declaration, VariableDeclaration)
+        self.assertEqual((original.line, start.line, declaration.line), (2, 2, 2))
+        self.assertIsNot(declaration.symbol, original.parameters[0].symbol)
+        self.assertIsNot(start.parameters[0].symbol, original.parameters[1].symbol)
+
+        calls = [statement for statement in ast.statements if isinstance(statement, FunctionCall)]
+        self.assertEqual([call.name for call in calls], [start.name, start.name, stop.name])
+        self.assertEqual([len(call.args) for call in calls], [1, 1, 1])
+
+    def test_budget(self):
+        source = '''
+        function int scale(factor:int, value:int) {
+            return factor * value
+        }
+        set n = input().length()
+        print(scale(2, n))
+        '''
+        ast = analyze(source)
+        self.assertEqual(FunctionSpecializer(ast, budget=0).run(), 0)
+        ast = analyze(source)
+        self.assertEqual(FunctionSpecializer(ast, budget=5).run(), 0)
+        self.assertEqual(ast.statements[-1].args[0].value.name, 'scale')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from Compiler.Lexer import *
+from Compiler.Parser import *
+from Compiler.Analyzer import *
+from Compiler.utils import *
+
+class TestSymbolTable(unittest.TestCase):
+    def test_innermost_symbol_wins(self):
+        for indexed in [True, False]:
+            table = SymbolTable(indexed=indexed)
+            table.add('x', symbolType='variable', dataType='integer')
+            table.createScope()
+            table.add('x', symbolType='variable', dataType='string')
+            self.assertEqual(table.getType('x'), 'string')
+            self.assertEqual(table.getMangledName('x'), 'x$1')
+            table.exitScope()
+            self.assertEqual(table.getType('x'), 'integer')
+            self.assertEqual(table.getMangledName('x'), 'x$0')
+
+    def test_symbols_leave_with_their_scope(self):
+        table = SymbolTable()
+        table.createScope()
+        table.add('n', symbolType='parameter', dataType='integer', functionName='f')
+        inner = table.current_scope_index
+        table.exitScope()
+        self.assertIsNone(table.lookup('n'))
+        self.assertTrue(table.isDeclared('n'))
+        self.assertEqual(table.lookup('n', inner).function_name, 'f')
+
+        # re-entering a recorded scope brings its symbols back
+        table.pushScope(inner)
+        self.assertEqual(table.scopeOf('n'), inner)
+        table.exitScope()
+        self.assertIsNone(table.scopeOf('n'))
+
+    def test_global_functions(self):
+        table = SymbolTable()
+        table.createScope()
+        table.add('f', symbolType='variable', dataType='integer')
+        table.addGlobalFunction('f', parameters=[], arity=0, returnType='void')
+        self.assertEqual(table.lookup('f').symbol_type, 'variable')
+        table.exitScope()
+        self.assertEqual(table.getFunctionType('f'), 'void')
+
+    def test_duplicate_symbol(self):
+        table = SymbolTable()
+        table.add('x', symbolType='variable', dataType='integer')
+        with self.assertRaises(Exception):
+            table.add('x', symbolType='variable', dataType='integer')
+
+class TestBindings(unittest.TestCase):
+    def setUp(self):
+        error.clear_errors()
+
+    def test_analyzer_binds_variables_to_symbols(self):
+        ast = Parser(Lexer('''
+        set x = 1
+        function int f(x:int) {
+            x = x + 1
+            return x
+        }
+        if (x == 1) {
+            set x = "shadow"
+            print(x)
+        }
+        ''')).parse()
+        SemanticAnalyzer(ast).analyze()
+        self.assertFalse(error.has_error_occurred())
+
+        declaration, function, branch = ast.statements
+        parameter = function.parameters[0].symbol
+        self.assertEqual(parameter.symbol_type, 'parameter')
+        update, ret = function.block.statements
+        self.assertIs(update.symbol, parameter)
+        self.assertIs(update.value.left.symbol, parameter)
+        self.assertIs(ret.value.symbol, parameter)
+
+        self.assertIs(branch.comparison.left.symbol, declaration.symbol)
+        shadow, call = branch.block.statements
+        self.assertEqual(shadow.symbol.data_type, 'string')
+        self.assertIs(call.args[0].value.symbol, shadow.symbol)
+
+if __name__ == '__main__':
+    unittest.main()